@@ -0,0 +1,282 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+'''
+Micro-benchmarks of json_ld_processor.Processor.
+
+Each benchmark is a function returning a Python dictionary of its measurements, with
+times in seconds taken as the best of a number of repeats. Run from the command line,
+the module runs every benchmark and prints its results as JSON.
+'''
+
+import io, os, re, sys, json, time, shutil, sqlite3, httplib, tempfile, threading, subprocess
+import json_ld_processor as jlp, json_ld_serializers as jls, json_ld_sqlite as jlsql, json_ld_server as jlsrv, json_ld_sort as jlsort, json_ld_stats as jlst
+
+def best_time(function, repeat=3):
+    '''
+    Returns a (seconds, result) tuple for the fastest of repeat calls of function.
+    '''
+    best = None
+    for i in range(repeat):
+        start = time.time()
+        result = function()
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return (best, result)
+
+def people(count, friends=5):
+    '''
+    Returns a JSON-LD document string with a top-level array of count people, each with
+    a name, an age and a list of friends with names.
+    '''
+    return json.dumps([ {
+        "@": "<http://example.org/people#p%d>" % i,
+        "a": "foaf:Person",
+        "name": "Person %d" % i,
+        "foaf:age": i,
+        "foaf:knows": [ { "name": "Friend %d of %d" % (j, i) } for j in range(friends) ]
+    } for i in range(count) ])
+
+def atomic_arrays(count=200, length=200, repeat=3):
+    '''
+    Measures the triples per second of a document of count objects, each with arrays of
+    length floats, integers and strings.
+    '''
+    doc = json.dumps([ {
+        "#": { "ex": "http://example.org/" },
+        "@": "<http://example.org/measurements#m%d>" % i,
+        "ex:reading": [ 0.5 * j + 1 for j in range(length) ],
+        "ex:count": range(1, length + 1),
+        "ex:tag": [ "tag %d" % j for j in range(length) ]
+    } for i in range(count) ])
+    processor = jlp.Processor()
+    (elapsed, triples) = best_time(lambda: len([ t for t in processor.triples(doc) ]), repeat)
+    return { "triples": triples, "seconds": elapsed, "triples_per_second": triples / elapsed }
+
+def selective_extraction(count=5000, repeat=3):
+    '''
+    Compares extracting the foaf:age triples of a document by filtering the output of
+    triples() with extracting them with its predicates filter.
+    '''
+    doc = people(count)
+    processor = jlp.Processor()
+    age = "http://xmlns.com/foaf/0.1/age"
+    (full, expected) = best_time(lambda: len([ t for t in processor.triples(doc) if t["prop"] == age ]), repeat)
+    (filtered, found) = best_time(lambda: len([ t for t in processor.triples(doc, predicates=["foaf:age"]) ]), repeat)
+    assert expected == found
+    return { "triples": found, "post_filter": full, "push_down": filtered, "speedup": full / filtered }
+
+STARTUP_SCRIPT = """
+import json, time
+start = time.time()
+import json_ld_processor as jlp
+imported = time.time()
+t = next(jlp.Processor().triples('{ "@": "<http://example.org/people#john>", "name": "John Lennon" }'))
+print(json.dumps({ "import": imported - start, "first_triple": time.time() - imported }))
+"""
+
+def startup(repeat=5, constructions=10000):
+    '''
+    Measures, in fresh interpreters, the time to import json_ld_processor and the latency of
+    the first triple of a small document from a new processor, together with the time to
+    create a processor in an interpreter that has already imported the module.
+    '''
+    directory = os.path.dirname(os.path.abspath(__file__))
+    runs = []
+    for i in range(repeat):
+        output = subprocess.Popen([sys.executable, "-c", STARTUP_SCRIPT], cwd=directory, stdout=subprocess.PIPE).communicate()[0]
+        runs.append(json.loads(output))
+    (construction, result) = best_time(lambda: [ jlp.Processor() for i in range(constructions) ], repeat)
+    return {
+        "import": min([ run["import"] for run in runs ]),
+        "first_triple": min([ run["first_triple"] for run in runs ]),
+        "construction": construction / constructions
+    }
+
+def sqlite_load(count=5000, repeat=3):
+    '''
+    Compares the throughput, in rows per second, of loading the triples of a document into
+    SQLite row by row (looking up or inserting each term, then inserting the triple) with
+    loading them with a json_ld_sqlite.SQLiteWriter.
+    '''
+    triples = [ t for t in jlp.Processor().triples(people(count)) ]
+    directory = tempfile.mkdtemp()
+    try:
+        def row_by_row():
+            path = os.path.join(directory, "rows.db")
+            if os.path.exists(path):
+                os.remove(path)
+            connection = sqlite3.connect(path)
+            for statement in jlsql.SCHEMA:
+                connection.execute(statement)
+            def term(kind, value, datatype=None, lang=None):
+                row = connection.execute("SELECT id FROM terms WHERE kind = ? AND value = ? AND datatype IS ? AND lang IS ?", (kind, value, datatype, lang)).fetchone()
+                if row:
+                    return row[0]
+                return connection.execute("INSERT INTO terms (kind, value, datatype, lang) VALUES (?, ?, ?, ?)", (kind, value, datatype, lang)).lastrowid
+            connection.execute("CREATE INDEX terms_value ON terms (value)")
+            for t in triples:
+                if t["objtype"] == "resource":
+                    obj = term(jlsql.RESOURCE_TERM, t["obj"])
+                else:
+                    obj = term(jlsql.LITERAL_TERM, t["obj"], t.get("datatype"), t.get("lang"))
+                connection.execute("INSERT INTO triples (subj, prop, obj) VALUES (?, ?, ?)", (term(jlsql.RESOURCE_TERM, t["subj"]), term(jlsql.RESOURCE_TERM, t["prop"]), obj))
+            connection.commit()
+            connection.close()
+        def bulk():
+            path = os.path.join(directory, "bulk.db")
+            if os.path.exists(path):
+                os.remove(path)
+            with jlsql.SQLiteWriter(path) as writer:
+                writer.write_all(triples)
+        (rows, result) = best_time(row_by_row, repeat)
+        (loaded, result) = best_time(bulk, repeat)
+    finally:
+        shutil.rmtree(directory)
+    return { "triples": len(triples), "row_by_row": len(triples) / rows, "bulk": len(triples) / loaded, "speedup": rows / loaded }
+
+def http_service(requests=200, concurrency=8, count=100, processes=None):
+    '''
+    Load-tests a json_ld_server.ConversionServer on localhost with concurrent clients, each
+    POSTing documents of count people over a kept-alive connection, and returns the requests
+    per second seen by the clients together with the server's metrics.
+    '''
+    doc = people(count)
+    service = jlsrv.ConversionService(processes=processes, max_queue=concurrency)
+    server = jlsrv.ConversionServer(("127.0.0.1", 0), service, quiet=True)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    statuses = []
+    def client(n):
+        connection = httplib.HTTPConnection("127.0.0.1", server.server_address[1])
+        for i in range(n):
+            connection.request("POST", "/", doc)
+            response = connection.getresponse()
+            response.read()
+            statuses.append(response.status)
+        connection.close()
+    try:
+        clients = [ threading.Thread(target=client, args=(requests // concurrency,)) for i in range(concurrency) ]
+        start = time.time()
+        for c in clients:
+            c.start()
+        for c in clients:
+            c.join()
+        elapsed = time.time() - start
+        metrics = service.metrics.snapshot()
+    finally:
+        server.shutdown()
+        server.server_close()
+        service.close()
+    return { "requests_per_second": len(statuses) / elapsed, "ok": statuses.count(200), "shed": statuses.count(503), "server": metrics }
+
+def external_sort(count=5000, max_buffered=10000, repeat=3):
+    '''
+    Compares the time to sort the triples of a document by subject and property with runs
+    spilled as JSON lines and in the binary encoding.
+    '''
+    triples = [ t for t in jlp.Processor().triples(people(count)) ]
+    triples.reverse()
+    sort = lambda binary_runs: len([ t for t in jlsort.ExternalSorter("SP", max_buffered, binary_runs).sorted(triples) ])
+    (json_runs, result) = best_time(lambda: sort(False), repeat)
+    (binary_runs, result) = best_time(lambda: sort(True), repeat)
+    return { "triples": len(triples), "json_runs": json_runs, "binary_runs": binary_runs, "speedup": json_runs / binary_runs }
+
+def context_memoization(count=5000, prefixes=200, repeat=3):
+    '''
+    Compares the time to deserialize count documents sharing a local context of prefixes
+    prefixes, with merged contexts memoized in a json_ld_processor.ContextTable and with
+    every local context merged afresh.
+    '''
+    context = dict([ ("ns%d" % i, "http://example.org/ns/%d#" % i) for i in range(prefixes) ])
+    context["#base"] = "http://example.org/items/"
+    docs = [ json.dumps({
+        "#": context,
+        "@": "<item%d>" % i,
+        "a": "ns%d:Item" % (i % prefixes),
+        "ns1:label": "Item %d" % i,
+        "ns2:next": "<item%d>" % (i + 1)
+    }) for i in range(count) ]
+    def deserialize(table):
+        processor = jlp.Processor(context_table=table)
+        return len([ t for doc in docs for t in processor.triples(doc) ])
+    (fresh, expected) = best_time(lambda: deserialize(jlp.ContextTable(0)), repeat)
+    table = jlp.ContextTable()
+    (memoized, found) = best_time(lambda: deserialize(table), repeat)
+    assert expected == found
+    return { "triples": found, "fresh": fresh, "memoized": memoized, "speedup": fresh / memoized, "table": table.stats() }
+
+def graph_statistics(count=5000, repeat=3):
+    '''
+    Measures the triples per second summarized by a json_ld_stats.GraphStatistics, the size
+    of its serialized state, and the relative error of its estimate of distinct subjects.
+    '''
+    triples = [ t for t in jlp.Processor().triples(people(count)) ]
+    def summarize():
+        stats = jlst.GraphStatistics()
+        stats.write_all(triples)
+        return stats
+    (elapsed, stats) = best_time(summarize, repeat)
+    subjects = len(set([ t["subj"] for t in triples ]))
+    return {
+        "triples": len(triples),
+        "triples_per_second": len(triples) / elapsed,
+        "state_bytes": len(json.dumps(stats.to_dict())),
+        "subjects_error": abs(stats.report()["distinct_subjects"] - subjects) / float(subjects)
+    }
+
+ntriples_pattern = re.compile(r'^(\S+) <([^>]*)> (?:<([^>]*)>|(_:\w+)|"((?:[^"\\]|\\.)*)"(?:@(\S+)|\^\^<([^>]*)>)?) \.$')
+
+def read_ntriples(stream):
+    '''
+    A generator that yields the triples of an N-Triples stream written by a
+    json_ld_serializers.NTriplesWriter, as a baseline for binary_reload.
+    '''
+    for line in stream:
+        (subj, prop, iri, bnode, literal, lang, datatype) = ntriples_pattern.match(line).groups()
+        subj = subj.strip("<>").decode('utf-8')
+        if literal is None:
+            yield { "subj": subj, "prop": prop.decode('utf-8'), "objtype": "resource", "obj": (iri or bnode).decode('utf-8') }
+            continue
+        triple = { "subj": subj, "prop": prop.decode('utf-8'), "objtype": "literal", "obj": literal.decode('string_escape').decode('utf-8') }
+        if lang:
+            triple["lang"] = lang.decode('utf-8')
+        if datatype:
+            triple["datatype"] = datatype.decode('utf-8')
+        yield triple
+
+def binary_reload(count=5000, repeat=3):
+    '''
+    Compares the time to reload the triples of a document from its binary encoding, from
+    N-Triples and by deserializing the JSON-LD document again, and the sizes of both
+    encodings.
+    '''
+    doc = people(count)
+    triples = [ t for t in jlp.Processor().triples(doc) ]
+    encoded = {}
+    for (name, writer) in (("binary", jls.BinaryWriter), ("ntriples", jls.NTriplesWriter)):
+        output = io.BytesIO()
+        serializer = writer(output)
+        serializer.write_all(triples)
+        serializer.close()
+        encoded[name] = output.getvalue()
+    (binary, found) = best_time(lambda: len([ t for t in jls.read_binary_triples(io.BytesIO(encoded["binary"])) ]), repeat)
+    (ntriples, expected) = best_time(lambda: len([ t for t in read_ntriples(io.BytesIO(encoded["ntriples"])) ]), repeat)
+    (jsonld, result) = best_time(lambda: len([ t for t in jlp.Processor().triples(doc) ]), repeat)
+    assert found == expected == len(triples)
+    return {
+        "triples": len(triples),
+        "binary": binary,
+        "ntriples": ntriples,
+        "jsonld": jsonld,
+        "speedup": ntriples / binary,
+        "binary_bytes": len(encoded["binary"]),
+        "ntriples_bytes": len(encoded["ntriples"])
+    }
+
+BENCHMARKS = [ atomic_arrays, selective_extraction, external_sort, binary_reload, context_memoization, graph_statistics, startup, sqlite_load, http_service ]
+
+if __name__ == "__main__":
+    for benchmark in BENCHMARKS:
+        print json.dumps({ benchmark.__name__: benchmark() }, sort_keys=True)
@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+'''
+A content-addressed, on-disk cache of the triples generated by json_ld_processor.Processor.
+
+Each entry is keyed by a SHA-1 hash of the input document, the processor's default
+context and options, the processor version and the binary format version, and holds
+the triples produced for that document in the binary format of json_ld_serializers.
+Entries are written to a temporary file and renamed into place, so concurrent readers
+and writers in different processes never see a partial entry, and the least recently
+used entries are evicted, under an advisory lock, when the cache grows past its size
+limit. Temporary files count towards that limit, and those left behind by a process
+that died while writing them are removed once they are older than stale_seconds.
+
+A lenient processor only stores the triples of documents it deserialized without errors,
+so that a cache hit never hides the ErrorReport of a skipped node.
+'''
+
+import os, json, time, hashlib, tempfile
+import json_ld_processor as jlp, json_ld_serializers as jls
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+class TripleCache(object):
+    '''
+    Defines a cache layer in front of Processor.triples().
+    '''
+
+    def __init__(self, directory, processor=None, max_bytes=1024 * 1024 * 1024, max_entries=None, stale_seconds=3600):
+        '''
+        Creates a triple cache.
+
+        Arguments:
+        directory -- the directory holding the cache entries; it is created if necessary.
+
+        Keyword arguments:
+        processor -- the json_ld_processor.Processor used on a cache miss.
+        max_bytes -- the maximum total size in bytes of the cache entries.
+        max_entries -- the maximum number of cache entries, or None for no limit.
+        stale_seconds -- the age in seconds after which a temporary file is considered
+                         abandoned by its writer and is removed.
+        '''
+        self.directory = directory
+        self.processor = processor or jlp.Processor()
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.stale_seconds = stale_seconds
+        self.__lenient = self.processor.options()["lenient"]
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        if not os.path.isdir(directory):
+            try:
+                os.makedirs(directory)
+            except OSError:
+                if not os.path.isdir(directory): # another process may have created it
+                    raise
+        context = json.dumps(self.processor.default_context(), sort_keys=True)
+        options = json.dumps(self.processor.options(), sort_keys=True)
+        self.__salt = hashlib.sha1(("%s\n%r\n%s\n%s\n" % (jlp.__version__, jls.BINARY_MAGIC, context, options)).encode('utf-8')).hexdigest()
+        self.__estimated_bytes = None
+        self.__estimated_entries = None
+        self.evict() # removes stale temporary files and estimates the size of the cache
+
+    def key(self, doc):
+        '''
+        Returns the cache key of a JSON-LD document string.
+        '''
+        if type(doc).__name__ == 'unicode':
+            doc = doc.encode('utf-8')
+        return hashlib.sha1(self.__salt + doc).hexdigest()
+
+    def triples(self, doc):
+        '''
+        An iterator that yields the triples of a JSON-LD document, as Processor.triples() does,
+        streaming them from the cache if the document has been seen before.
+        '''
+        key = self.key(doc)
+        path = os.path.join(self.directory, key + ".jldt")
+        try:
+            entry = open(path, 'rb')
+        except (IOError, OSError):
+            entry = None
+        if entry is not None:
+            try:
+                os.utime(path, None) # mark the entry as recently used
+            except OSError:
+                pass # evicted by another process since it was opened, but still readable
+            self.hits += 1
+            if self.__lenient: # only documents without errors are cached
+                self.processor.report = jlp.ErrorReport(self.processor.options()["max_error_records"])
+            return self.__cached_triples(entry)
+        self.misses += 1
+        return self.__caching_triples(doc, path)
+
+    def __cached_triples(self, entry):
+        try:
+            for t in jls.read_binary_triples(entry):
+                yield t
+        finally:
+            entry.close()
+
+    def __caching_triples(self, doc, path):
+        (fd, temp_path) = tempfile.mkstemp(suffix=".tmp", dir=self.directory)
+        stored = False
+        try:
+            with os.fdopen(fd, 'wb') as stream:
+                writer = jls.BinaryWriter(stream)
+                for t in self.processor.triples(doc):
+                    writer.write(t)
+                    yield t
+                writer.close()
+            if self.__lenient and self.processor.report.total() > 0:
+                return # the next call has to deserialize the document again to report its errors
+            os.rename(temp_path, path) # atomic, so readers never see a partial entry
+            stored = True
+            self.stores += 1
+            self.__stored(writer.bytes_written)
+        finally:
+            if not stored: # the consumer stopped early or processing failed
+                try:
+                    os.remove(temp_path)
+                except OSError:
+                    pass
+
+    def __stored(self, size):
+        if self.__estimated_bytes is None:
+            self.evict()
+            return
+        self.__estimated_bytes += size
+        self.__estimated_entries += 1
+        if self.__estimated_bytes > self.max_bytes or (self.max_entries is not None and self.__estimated_entries > self.max_entries):
+            self.evict()
+
+    def __entries(self, suffix=".jldt"):
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(suffix):
+                path = os.path.join(self.directory, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue # evicted by another process
+                entries.append((st.st_mtime, st.st_size, path))
+        return entries
+
+    def __temporary_bytes(self):
+        '''
+        Removes the temporary files older than stale_seconds, and returns the total size of the others.
+        '''
+        stale = time.time() - self.stale_seconds
+        total = 0
+        for (mtime, size, path) in self.__entries(".tmp"):
+            if mtime >= stale:
+                total += size # still being written
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        return total
+
+    def evict(self):
+        '''
+        Removes stale temporary files, then least recently used entries until the cache,
+        temporary files included, is within its limits.
+
+        Returns: the number of entries removed.
+        '''
+        lock = open(os.path.join(self.directory, ".lock"), 'a')
+        try:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            temporary = self.__temporary_bytes()
+            entries = self.__entries()
+            entries.sort()
+            total = temporary + sum([size for (mtime, size, path) in entries])
+            count = len(entries)
+            removed = 0
+            for (mtime, size, path) in entries:
+                if total <= self.max_bytes and (self.max_entries is None or count <= self.max_entries):
+                    break
+                try:
+                    os.remove(path)
+                    removed += 1
+                except OSError:
+                    pass
+                total -= size
+                count -= 1
+            self.evictions += removed
+            self.__estimated_bytes = total
+            self.__estimated_entries = count
+            return removed
+        finally:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+            lock.close()
+
+    def stats(self):
+        '''
+        Returns a Python dictionary of the cache's hit/miss metrics for this process,
+        together with the current number and total size of its entries.
+        '''
+        entries = self.__entries()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": lookups and float(self.hits) / lookups or 0.0,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "entries": len(entries),
+            "bytes": sum([size for (mtime, size, path) in entries])
+        }
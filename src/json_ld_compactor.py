@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+'''
+Compaction of triples into JSON-LD documents.
+
+This module implements the reverse of json_ld_processor.Processor.triples(): given a
+stream of triples, it emits one JSON-LD object per subject, in the dialect read by the
+processor (i.e., using the "#", "@" and "a" keys), shortening IRIs to terms and CURIEs
+with a prefix trie built from a context. Triples are grouped by subject in memory up to
+a limit, beyond which sorted runs are spilled to temporary files and merged (see
+json_ld_sort), so inputs larger than memory can be compacted.
+'''
+
+import re, json, json_ld_processor as jlp, json_ld_sort as jlsort
+
+RDF_TYPE = "http://www.w3.org/1999/02/22-rdf-syntax-ns#type"
+XSD = "http://www.w3.org/2001/XMLSchema#"
+
+term_pattern = re.compile("^\w+$")
+integer_pattern = re.compile("^-?[1-9]\d*$")
+bnode_pattern = jlp.bnode_pattern
+curie_pattern = jlp.curie_pattern
+absolute_iri_pattern = re.compile("^\w+\:/[^>\s]*$")
+wrapped_iri_pattern = re.compile("^<[^>\s]+>$")
+lang_pattern = jlp.lang_pattern
+typed_literal_pattern = jlp.typed_literal_pattern
+datetime_pattern = jlp.datetime_pattern
+
+class PrefixTrie(object):
+    '''
+    A character trie of the IRIs of the terms and prefixes of a context, finding the
+    prefixes an IRI starts with in a single pass over the IRI.
+    '''
+
+    def __init__(self, context):
+        '''
+        Creates a prefix trie.
+
+        Arguments:
+        context -- a Python dictionary providing a JSON-LD context.
+        '''
+        self.__root = {}
+        self.__terms = {}
+        for key in context:
+            iri = context[key]
+            if not term_pattern.match(key) or type(iri).__name__ not in ['str', 'unicode']:
+                continue
+            self.__terms.setdefault(iri, key)
+            node = self.__root
+            for c in iri:
+                node = node.setdefault(c, {})
+            node[None] = key
+
+    def term(self, iri):
+        '''
+        Returns the term of the context whose IRI is iri, or None.
+        '''
+        return self.__terms.get(iri)
+
+    def prefixes(self, iri):
+        '''
+        Returns a list of (prefix, local name) tuples, one for each entry of the context
+        whose IRI is a proper prefix of iri, longest first.
+        '''
+        matches = []
+        node = self.__root
+        for i in range(len(iri)):
+            node = node.get(iri[i])
+            if node is None:
+                break
+            if node.has_key(None) and i + 1 < len(iri):
+                matches.append((node[None], iri[i + 1:]))
+        matches.reverse()
+        return matches
+
+class Compactor(object):
+    '''
+    Defines a class for compacting triples into JSON-LD documents.
+    '''
+
+    def __init__(self, context, embed_context=True, max_buffered=100000):
+        '''
+        Creates a compactor.
+
+        Arguments:
+        context -- a Python dictionary providing the JSON-LD context used to shorten IRIs,
+                   such as the default context of a json_ld_processor.Processor.
+
+        Keyword arguments:
+        embed_context -- if True, each document includes context as its "#" key; otherwise
+                         the documents rely on context being the processor's default context.
+        max_buffered -- the number of triples grouped in memory before a sorted run is
+                        spilled to a temporary file.
+        '''
+        self.context = context
+        self.embed_context = embed_context
+        self.max_buffered = max_buffered
+        self.__trie = PrefixTrie(context)
+        self.__vocab = context.get("#vocab")
+
+    def documents(self, triples):
+        '''
+        A generator that yields one JSON-LD object (a Python dictionary) per subject in an
+        iterable of triples, such as those yielded by Processor.triples(). The objects are
+        yielded in order of subject.
+        '''
+        for (subj, group) in self.__groups(triples):
+            doc = {}
+            if self.embed_context:
+                doc["#"] = self.context
+            doc["@"] = self.__resource(subj)
+            for t in group:
+                if t["prop"] == RDF_TYPE:
+                    key = "a"
+                else:
+                    key = self.compact_property(t["prop"])
+                if t["objtype"] == "resource":
+                    value = self.__resource(t["obj"])
+                else:
+                    value = self.__literal(t)
+                if doc.has_key(key):
+                    if type(doc[key]).__name__ != 'list':
+                        doc[key] = [doc[key]]
+                    doc[key].append(value)
+                else:
+                    doc[key] = value
+            yield doc
+
+    def dumps(self, triples):
+        '''
+        A generator that yields the documents of documents() serialized as JSON, one per line.
+        '''
+        for doc in self.documents(triples):
+            yield json.dumps(doc) + "\n"
+
+    def compact_iri(self, iri):
+        '''
+        Returns the shortest of a term, CURIE or wrapped IRI that a processor using
+        this compactor's context resolves to iri.
+        '''
+        term = self.__trie.term(iri)
+        if term is not None:
+            return term
+        return self.__curie(iri) or "<" + iri + ">"
+
+    def compact_property(self, iri):
+        '''
+        Returns a JSON-LD object key that a processor using this compactor's context
+        resolves to the property iri.
+        '''
+        term = self.__trie.term(iri)
+        if term is not None:
+            return term
+        if self.__vocab and iri.startswith(self.__vocab):
+            local = iri[len(self.__vocab):]
+            if term_pattern.match(local) and not self.context.has_key(local):
+                return local
+        curie = self.__curie(iri)
+        if curie:
+            return curie
+        if absolute_iri_pattern.match(iri):
+            return iri
+        raise Exception("The IRI %s cannot be expressed as a property in the current context" % (iri))
+
+    def __curie(self, iri):
+        for (prefix, local) in self.__trie.prefixes(iri):
+            if term_pattern.match(local):
+                return prefix + ":" + local
+        return None
+
+    def __resource(self, value):
+        if bnode_pattern.match(value):
+            return value
+        return self.compact_iri(value)
+
+    def __datatype(self, iri):
+        return self.__curie(iri) or iri
+
+    def __literal(self, triple):
+        '''
+        Returns a JSON value that a processor reads back as the literal object of triple.
+        '''
+        value = triple["obj"]
+        datatype = triple.get("datatype")
+        if triple.has_key("lang"):
+            if "^^" in value or "\\" in value:
+                raise Exception("The literal '%s' cannot be expressed with a language tag" % (value))
+            return value + "@" + triple["lang"]
+        if datatype == XSD + "boolean" and value == "true":
+            return True
+        if datatype == XSD + "integer" and integer_pattern.match(value):
+            return int(value)
+        if datatype in [None, XSD + "string"] and self.__plain(value):
+            return value
+        if datatype == XSD + "dateTime" and datetime_pattern.match(value) and self.__plain(value, datetime=True):
+            return value
+        if "\\" in value:
+            raise Exception("The literal '%s' cannot be expressed in JSON-LD" % (value))
+        return value + "^^" + self.__datatype(datatype or XSD + "string")
+
+    def __plain(self, value, datetime=False):
+        '''
+        Returns True if a processor reads value back as a plain string literal (or, if
+        datetime is True, as an xsd:dateTime literal).
+        '''
+        if not value or "\\" in value or self.context.has_key(value):
+            return False
+        if bnode_pattern.match(value) or curie_pattern.match(value) or wrapped_iri_pattern.match(value):
+            return False
+        if typed_literal_pattern.match(value) or lang_pattern.match(value):
+            return False
+        return datetime or not datetime_pattern.match(value)
+
+    def __groups(self, triples):
+        '''
+        A generator that yields a (subject, triples) tuple for each subject, in order of subject.
+        '''
+        subj = None
+        group = []
+        for t in jlsort.sorted_triples(triples, "S", self.max_buffered):
+            if t["subj"] != subj and group:
+                yield (subj, group)
+                group = []
+            subj = t["subj"]
+            group.append(t)
+        if group:
+            yield (subj, group)
@@ -0,0 +1,282 @@
+# -*- coding: utf-8 -*-
+'''
+Transparent gzip, bz2 and xz compression of the input and output of the processor.
+
+Compressed input is detected by its magic bytes, not its file name, and decompressed
+incrementally as it is read, so archives never need a decompressed copy on disk.
+Output can be compressed as it is written, with a configurable compression level.
+The xz format needs the lzma module (part of the standard library from Python 3.3,
+or the backports.lzma package); gzip and bz2 are always available.
+'''
+
+import bz2, zlib, collections
+try:
+    import lzma
+except ImportError:
+    try:
+        from backports import lzma
+    except ImportError:
+        lzma = None
+
+MAGIC = [
+    ("gzip", b"\x1f\x8b"),
+    ("bz2", b"BZh"),
+    ("xz", b"\xfd7zXZ\x00")
+]
+
+EXTENSIONS = {
+    ".gz": "gzip",
+    ".bz2": "bz2",
+    ".xz": "xz"
+}
+
+def detect(data):
+    '''
+    Returns the compression format ("gzip", "bz2" or "xz") whose magic bytes data starts with, or None.
+    '''
+    for (format, magic) in MAGIC:
+        if data[:len(magic)] == magic:
+            return format
+    return None
+
+def _decompressor(format):
+    if format == "gzip":
+        return zlib.decompressobj(16 + zlib.MAX_WBITS)
+    elif format == "bz2":
+        return bz2.BZ2Decompressor()
+    elif lzma is None:
+        raise Exception("Reading xz data needs the lzma module")
+    return lzma.LZMADecompressor()
+
+def _compressor(format, level):
+    if format == "gzip":
+        return zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    elif format == "bz2":
+        return bz2.BZ2Compressor(max(1, level))
+    elif format == "xz":
+        if lzma is None:
+            raise Exception("Writing xz data needs the lzma module")
+        return lzma.LZMACompressor(preset=level)
+    raise Exception("Unknown compression format: %s" % (format))
+
+class DecompressingReader(object):
+    '''
+    A read-only file-like object that decompresses a compressed byte stream as it is read.
+    Concatenated gzip members and bz2 or xz streams are read one after the other. Decompressed
+    chunks are queued as they are, and only the bytes returned by read() are copied.
+    '''
+
+    def __init__(self, stream, format, prefix=b"", chunk_size=65536):
+        '''
+        Arguments:
+        stream -- a file-like object opened for reading bytes.
+        format -- "gzip", "bz2" or "xz".
+
+        Keyword arguments:
+        prefix -- bytes already read from the start of stream.
+        chunk_size -- the number of compressed bytes read from stream at a time.
+        '''
+        self.stream = stream
+        self.format = format
+        self.chunk_size = chunk_size
+        self.__decompressor = _decompressor(format)
+        self.__pending = prefix
+        self.__chunks = collections.deque()
+        self.__offset = 0 # the number of bytes of the first chunk already read
+        self.__available = 0 # the number of bytes in the chunks not yet read
+        self.__eof = False
+
+    def read(self, size=-1):
+        '''
+        Returns up to size decompressed bytes, or all the remaining bytes if size is negative.
+        '''
+        while not self.__eof and (size < 0 or self.__available < size):
+            self.__fill()
+        if size < 0 or size >= self.__available:
+            size = self.__available
+        pieces = []
+        needed = size
+        while needed > 0:
+            chunk = self.__chunks[0]
+            piece = chunk[self.__offset:self.__offset + needed]
+            pieces.append(piece)
+            needed -= len(piece)
+            if self.__offset + len(piece) == len(chunk):
+                self.__chunks.popleft()
+                self.__offset = 0
+            else:
+                self.__offset += len(piece)
+        self.__available -= size
+        if len(pieces) == 1:
+            return pieces[0]
+        return b"".join(pieces)
+
+    def __fill(self):
+        data = self.__pending or self.stream.read(self.chunk_size)
+        self.__pending = b""
+        if not data:
+            self.__eof = True
+            return
+        try:
+            self.__append(self.__decompressor.decompress(data))
+        except EOFError: # the previous stream ended exactly at the end of the previous chunk
+            self.__decompressor = _decompressor(self.format)
+            self.__append(self.__decompressor.decompress(data))
+        unused = getattr(self.__decompressor, "unused_data", b"")
+        if unused: # the start of the next gzip member or bz2/xz stream
+            self.__decompressor = _decompressor(self.format)
+            self.__pending = unused
+
+    def __append(self, data):
+        if data:
+            self.__chunks.append(data)
+            self.__available += len(data)
+
+    def close(self):
+        self.stream.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+class CompressingWriter(object):
+    '''
+    A write-only file-like object that compresses the bytes written to it into a byte stream.
+    '''
+
+    def __init__(self, stream, format, level=6, close_stream=False):
+        '''
+        Arguments:
+        stream -- a file-like object opened for writing bytes.
+        format -- "gzip", "bz2" or "xz".
+
+        Keyword arguments:
+        level -- the compression level, from 0 (fastest) to 9 (smallest).
+        close_stream -- if True, close() also closes stream.
+        '''
+        self.stream = stream
+        self.format = format
+        self.level = level
+        self.close_stream = close_stream
+        self.__compressor = _compressor(format, level)
+        self.__closed = False
+
+    def write(self, data):
+        compressed = self.__compressor.compress(data)
+        if compressed:
+            self.stream.write(compressed)
+
+    def flush(self):
+        self.stream.flush()
+
+    def close(self):
+        '''
+        Writes the end of the compressed data, closing the underlying stream if close_stream is True.
+        '''
+        if not self.__closed:
+            self.__closed = True
+            self.stream.write(self.__compressor.flush())
+            self.stream.flush()
+            if self.close_stream:
+                self.stream.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+def open_input(source, chunk_size=65536):
+    '''
+    Returns a file-like object reading the bytes of a file, decompressing them if they are
+    compressed.
+
+    Arguments:
+    source -- a file path, or a file-like object opened for reading bytes.
+    '''
+    if type(source).__name__ in ['str', 'unicode']:
+        stream = open(source, 'rb')
+    else:
+        stream = source
+    prefix = stream.read(6)
+    format = detect(prefix)
+    if format is None:
+        return _PrefixedReader(stream, prefix)
+    return DecompressingReader(stream, format, prefix, chunk_size)
+
+def open_output(target, format=None, level=6):
+    '''
+    Returns a file-like object writing bytes compressed in format ("gzip", "bz2" or "xz") at
+    a compression level, or uncompressed if format is None.
+
+    Arguments:
+    target -- a file path, which is created, or a file-like object opened for writing bytes,
+              which is left open when the returned object is closed.
+    '''
+    if type(target).__name__ in ['str', 'unicode']:
+        stream = open(target, 'wb')
+        if format is None:
+            return stream
+        return CompressingWriter(stream, format, level, close_stream=True)
+    if format is None:
+        return target
+    return CompressingWriter(target, format, level)
+
+def format_for_path(path):
+    '''
+    Returns the compression format implied by the extension of a file path, or None.
+    '''
+    for ext in EXTENSIONS:
+        if path.endswith(ext):
+            return EXTENSIONS[ext]
+    return None
+
+def extension(format):
+    '''
+    Returns the file name extension of a compression format, or "" if format is None.
+    '''
+    for ext in EXTENSIONS:
+        if EXTENSIONS[ext] == format:
+            return ext
+    return ""
+
+def read_document(source):
+    '''
+    Returns the contents of a (possibly compressed) file as a string.
+    '''
+    reader = open_input(source)
+    try:
+        return reader.read()
+    finally:
+        if reader.stream is not source:
+            reader.close()
+
+class _PrefixedReader(object):
+    '''
+    A file-like object reading an uncompressed stream whose first bytes were already read.
+    '''
+
+    def __init__(self, stream, prefix):
+        self.stream = stream
+        self.__prefix = prefix
+
+    def read(self, size=-1):
+        if size < 0:
+            (data, self.__prefix) = (self.__prefix, b"")
+            return data + self.stream.read()
+        data = self.__prefix[:size]
+        self.__prefix = self.__prefix[size:]
+        if len(data) < size:
+            data += self.stream.read(size - len(data))
+        return data
+
+    def close(self):
+        self.stream.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
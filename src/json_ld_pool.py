@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+'''
+A pool of ready json_ld_processor.Processor instances.
+
+Processors are cheap to create, since their compiled patterns and default context are
+shared at module level, but code that handles many short requests can still avoid
+creating one per request by borrowing them from a pool. A borrowed processor is used
+by one thread at a time, and is returned to the pool when the borrower is done with it.
+
+A processor's report attribute belongs to its last call of triples(), whoever made it,
+so once a processor is back in the pool, another thread may replace it at any time. A
+processor borrowed with ProcessorPool.processor() is therefore wrapped in a
+BorrowedProcessor, whose report stays that of the borrower's own calls after release.
+'''
+
+import threading, contextlib, json_ld_processor as jlp
+
+class ProcessorPool(object):
+    '''
+    Defines a thread-safe pool of processors created with the same options.
+    '''
+
+    def __init__(self, size=8, preload=0, **options):
+        '''
+        Creates a processor pool.
+
+        Keyword arguments:
+        size -- the maximum number of idle processors kept by the pool; processors
+                released when it is full are discarded.
+        preload -- the number of processors created up front.
+        options -- the keyword arguments used to create each json_ld_processor.Processor.
+        '''
+        self.size = size
+        self.options = options
+        self.created = 0
+        self.__idle = []
+        self.__lock = threading.Lock()
+        for i in range(min(preload, size)):
+            self.__idle.append(self.__create())
+
+    def acquire(self):
+        '''
+        Returns an idle processor, creating one if there is none. Its report attribute
+        may hold the report of a previous borrower until triples() is called.
+        '''
+        with self.__lock:
+            if self.__idle:
+                return self.__idle.pop()
+        return self.__create()
+
+    def release(self, processor):
+        '''
+        Returns a processor to the pool. The borrower must not use it, or read its report
+        attribute, afterwards.
+        '''
+        with self.__lock:
+            if len(self.__idle) < self.size:
+                self.__idle.append(processor)
+
+    @contextlib.contextmanager
+    def processor(self):
+        '''
+        A context manager that borrows a processor from the pool for the duration of a with
+        block, as a BorrowedProcessor whose report remains readable after the block.
+
+        Usage:
+        with pool.processor() as p:
+            triples = [ t for t in p.triples(doc) ]
+        errors = p.report
+        '''
+        borrowed = BorrowedProcessor(self.acquire())
+        try:
+            yield borrowed
+        finally:
+            self.release(borrowed._return())
+
+    def triples(self, doc, report=None, **kwargs):
+        '''
+        An iterator that yields the triples of a document, as Processor.triples() does, using
+        a processor borrowed from the pool until the iteration ends.
+
+        Keyword arguments:
+        report -- if not None, a json_ld_processor.ErrorReport into which the errors skipped
+                  by a lenient processor are merged when the iteration ends.
+        '''
+        with self.processor() as processor:
+            try:
+                for t in processor.triples(doc, **kwargs):
+                    yield t
+            finally:
+                if report is not None and processor.report is not None:
+                    report.merge(processor.report)
+
+    def idle(self):
+        '''
+        Returns the number of idle processors in the pool.
+        '''
+        with self.__lock:
+            return len(self.__idle)
+
+    def __create(self):
+        with self.__lock:
+            self.created += 1
+        return jlp.Processor(**self.options)
+
+class BorrowedProcessor(object):
+    '''
+    Wraps a processor borrowed with ProcessorPool.processor(), delegating every attribute to it
+    until it is returned to the pool.
+
+    Attributes:
+    report -- the ErrorReport of the borrower's last call of triples() (or None), which, unlike
+              the report attribute of the processor itself, is kept once the processor has
+              been returned.
+    '''
+
+    def __init__(self, processor):
+        self.__processor = processor
+        self.__previous = processor.report # the report of a previous borrower, if any
+        self.__report = None
+
+    def __getattr__(self, name):
+        if self.__processor is None:
+            raise ValueError("The processor has been returned to the pool")
+        return getattr(self.__processor, name)
+
+    @property
+    def report(self):
+        if self.__processor is not None:
+            self.__capture()
+        return self.__report
+
+    def __capture(self):
+        if self.__processor.report is not self.__previous: # replaced by a call of the borrower
+            self.__report = self.__processor.report
+
+    def _return(self):
+        '''
+        Captures the report of the borrower's calls and returns the processor, which must not be
+        used through this object afterwards.
+        '''
+        self.__capture()
+        (processor, self.__processor) = (self.__processor, None)
+        return processor
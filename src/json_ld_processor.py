@@ -22,24 +22,528 @@ __credits__ = "Thanks to Manu Sporny and Mark Birbeck for drafting the JSON-LD s
 import re
 import uuid
 import json
+import hashlib
+import time
+import threading
+import collections
 try:
     import urlparse
 except ImportError:
     import urllib.parse as urlparse
 
+class _ImmutableDict(dict):
+    '''
+    A dictionary that cannot be modified, for state shared by every Processor.
+    '''
+
+    def __readonly(self, *args, **kwargs):
+        raise TypeError("%s is immutable; copy it with dict() to modify it" % (type(self).__name__))
+
+    __setitem__ = __delitem__ = clear = pop = popitem = setdefault = update = __readonly
+
+    def __reduce__(self):
+        return (_ImmutableDict, (dict(self),))
+
+class _Context(_ImmutableDict):
+    '''
+    An active context whose mappings cannot be modified, identified by a digest of its content,
+    with caches of the properties and resources resolved in it. Since the mappings cannot change,
+    the caches stay valid for as long as the context is shared.
+
+    The caches are mutable, and processors sharing the context in different threads read and
+    write them without a lock: each get, set or clear is a single dictionary operation, atomic
+    under the GIL, and a cached value only depends on its key, so a race at worst resolves a
+    value again.
+    '''
+
+    max_cache = 4096
+
+    def __init__(self, mapping, digest=None):
+        dict.__init__(self, mapping)
+        self.__digest = digest
+        self.properties = {}
+        self.resources = {}
+
+    def digest(self):
+        '''
+        Returns the SHA-1 hex digest of the context, computing it on first use.
+        '''
+        if self.__digest is None:
+            self.__digest = hashlib.sha1(json.dumps(self, sort_keys=True)).hexdigest()
+        return self.__digest
+
+    def __reduce__(self):
+        return (_Context, (dict(self), self.__digest))
+
+class ContextTable(object):
+    '''
+    A bounded table of merged contexts, keyed by the content of their active and local contexts,
+    so that documents repeating the same local context share one merged context, whose mappings
+    cannot be modified, with its property and resource caches already warm. A local context is keyed by the set
+    of its (prefix, IRI) pairs, or by its JSON serialization if its values are not hashable,
+    which is cheaper than hashing its serialization. Once the table is full, the contexts
+    added first are evicted first, so that a hit costs no more than a dictionary lookup.
+    '''
+
+    def __init__(self, max_size=1024):
+        '''
+        Keyword arguments:
+        max_size -- the number of merged contexts kept; 0 disables the table.
+        '''
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.__contexts = collections.OrderedDict()
+        self.__lock = threading.Lock()
+
+    def merge(self, local_context, active_context):
+        '''
+        Returns the _Context resulting from merging local_context (a dictionary) into
+        active_context (a _Context), reusing the context in the table if there is one.
+        Active contexts are identified by the digests of their content.
+        '''
+        try:
+            key = (active_context.digest(), frozenset(local_context.iteritems()))
+        except TypeError: # a value is a list or an object
+            key = (active_context.digest(), json.dumps(local_context, sort_keys=True))
+        with self.__lock: # the lookup races with the insertions and evictions of other threads
+            context = self.__contexts.get(key)
+            if context is not None:
+                self.hits += 1
+                return context
+            self.misses += 1
+        merged = dict(active_context)
+        merged.update(local_context)
+        context = _Context(merged)
+        if self.max_size > 0:
+            with self.__lock:
+                context = self.__contexts.setdefault(key, context) # another thread may have won
+                while len(self.__contexts) > self.max_size:
+                    self.__contexts.popitem(last=False)
+                    self.evictions += 1
+        return context
+
+    def clear(self):
+        '''
+        Removes every context from the table, keeping its statistics.
+        '''
+        with self.__lock:
+            self.__contexts.clear()
+
+    def __len__(self):
+        return len(self.__contexts)
+
+    def __reduce__(self):
+        '''
+        Pickles the table (e.g. with a processor sent to a worker process) as an empty table,
+        or, for the shared table, as the shared table of the process it is unpickled in.
+        '''
+        if self is CONTEXT_TABLE:
+            return (_shared_context_table, ())
+        return (ContextTable, (self.max_size,))
+
+    def stats(self):
+        '''
+        Returns the size, hits, misses, evictions and hit rate of the table as a Python dictionary.
+        '''
+        with self.__lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self.__contexts),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": lookups and float(self.hits) / lookups or 0.0
+            }
+
+#
+# The compiled patterns and the default context are shared by every Processor, so that
+# creating a processor does not compile any regular expressions or build any contexts
+#
+curie_pattern = re.compile("^(?P<prefix>\w+)\:(?P<reference>\w+)$")
+bnode_pattern = re.compile("^_\:\w+$")
+iri_pattern = re.compile("^<?(?P<iri>(\w+)\:(/?)(/?)([^>\s]+))>?$")
+absolute_iri_pattern = re.compile("^(?P<iri>(\w+)\:(/?)(/?)([^>\s]+))$")
+wrapped_absolute_iri_pattern = re.compile("^<(?P<iri>(\w+)\:(/?)(/?)([^>\s]+))>$")
+wrapped_relative_iri_pattern = re.compile("^<(?P<iri>[^\:>\s]+)>$")
+lang_pattern = re.compile("^(?P<literal>.+)@(?P<lang>[a-zA-Z][a-zA-Z0-9\-]+)$")
+typed_literal_pattern = re.compile("^(?P<literal>.+)\^\^(?P<datatype>.+)$")
+markup_pattern = re.compile(r"[:@^<\\]") # characters a string needs to be anything but a plain literal
+datetime_pattern = re.compile("^(?P<year>\d\d\d\d)([-])?(?P<month>\d\d)([-])?(?P<day>\d\d)((T|\s+)(?P<hour>\d\d)(([:])?(?P<minute>\d\d)(([:])?(?P<second>\d\d)(([.])?(?P<fraction>\d+))?)?)?)?((?P<tzzulu>Z)|(?P<tzoffset>[-+])(?P<tzhour>\d\d)([:])?(?P<tzminute>\d\d))?$")
+
+DEFAULT_CONTEXT = _Context({
+    "rdf": "http://www.w3.org/1999/02/22-rdf-syntax-ns#",
+    "xsd": "http://www.w3.org/2001/XMLSchema#",
+    "dc": "http://purl.org/dc/terms/",
+    "skos": "http://www.w3.org/2004/02/skos/core#",
+    "foaf": "http://xmlns.com/foaf/0.1/",
+    "sioc": "http://rdfs.org/sioc/ns#",
+    "cc": "http://creativecommons.org/ns#",
+    "geo": "http://www.w3.org/2003/01/geo/wgs84_pos#",
+    "vcard": "http://www.w3.org/2006/vcard/ns#",
+    "cal": "http://www.w3.org/2002/12/cal/ical#",
+    "doap": "http://usefulinc.com/ns/doap#",
+    "Person": "http://xmlns.com/foaf/0.1/Person",
+    "name": "http://xmlns.com/foaf/0.1/name",
+    "homepage": "http://xmlns.com/foaf/0.1/homepage"
+})
+
+DEFAULT_CONTEXT_DIGEST = DEFAULT_CONTEXT.digest()
+
+CONTEXT_TABLE = ContextTable() # shared by every Processor that is not given its own table
+
+def _shared_context_table():
+    return CONTEXT_TABLE
+
+class ProcessingError(Exception):
+    '''
+    Raised when a JSON-LD document contains a node that cannot be deserialized, such as a
+    CURIE with a prefix that is not in the current context.
+
+    Attributes:
+    kind -- a short name for the type of error, e.g. "unknown_prefix".
+    value -- the offending JSON value.
+    '''
+
+    def __init__(self, message, kind, value):
+        Exception.__init__(self, message)
+        self.kind = kind
+        self.value = value
+
+    def __reduce__(self):
+        return (ProcessingError, (str(self), self.kind, self.value))
+
+class LimitExceededError(Exception):
+    '''
+    Raised when deserializing a JSON-LD document exceeds one of the resource limits of a
+    Processor. Unlike a ProcessingError, it is never skipped by a lenient processor.
+
+    Attributes:
+    limit -- the name of the limit, e.g. "max_depth".
+    value -- the value of the limit.
+    '''
+
+    def __init__(self, message, limit, value):
+        Exception.__init__(self, message)
+        self.limit = limit
+        self.value = value
+
+    def __reduce__(self):
+        return (LimitExceededError, (str(self), self.limit, self.value))
+
+class ErrorReport(object):
+    '''
+    Records the errors skipped by a Processor created with lenient=True.
+
+    Attributes:
+    errors -- a list of at most max_records error records, each a Python dictionary with
+              keys "path" (a JSON path to the offending node, e.g. "$.foaf:knows[2].@"),
+              "type", "reason" and "value".
+    counts -- a Python dictionary of the number of errors of each type.
+    '''
+
+    def __init__(self, max_records=1000):
+        self.max_records = max_records
+        self.errors = []
+        self.counts = {}
+
+    def record(self, path, error):
+        '''
+        Records a ProcessingError raised at a path (as built by Processor.__triples()).
+        '''
+        self.counts[error.kind] = self.counts.get(error.kind, 0) + 1
+        if len(self.errors) < self.max_records:
+            self.errors.append({ "path": json_path(path), "type": error.kind, "reason": str(error), "value": error.value })
+
+    def total(self):
+        '''
+        Returns the number of errors recorded.
+        '''
+        return sum(self.counts.values())
+
+    def merge(self, other):
+        '''
+        Adds the errors recorded by another ErrorReport, e.g. one from a worker process.
+        '''
+        for kind in other.counts:
+            self.counts[kind] = self.counts.get(kind, 0) + other.counts[kind]
+        self.errors.extend(other.errors[:max(0, self.max_records - len(self.errors))])
+
+def json_path(path):
+    '''
+    Returns a JSON path string for a path, given as nested (parent path, key or index) tuples
+    starting from None for the document root.
+    '''
+    steps = []
+    while path is not None:
+        (path, step) = path
+        if type(step).__name__ in ['int', 'long']:
+            steps.append("[%d]" % step)
+        else:
+            steps.append("." + step)
+    steps.append("$")
+    steps.reverse()
+    return "".join(steps)
+
+class BaseIRIResolver(object):
+    '''
+    Resolves IRI references against a base IRI, with the same results as urlparse.urljoin().
+
+    The base is split once, by resolving one probe reference of each common form against it:
+    fragment-only ("#top"), query-only ("?page=2"), absolute-path ("/a/b") and path-relative
+    ("a/b") references without dot segments, parameters or a scheme are then resolved by
+    concatenation. Other references are resolved with urljoin(). Resolutions are cached.
+    '''
+
+    simple_path_pattern = re.compile("^[^/?#;:][^?#;:]*$")
+    absolute_path_pattern = re.compile("^/[^/?#;:][^?#;:]*$")
+
+    def __init__(self, base, max_cache=65536):
+        '''
+        Arguments:
+        base -- the base IRI.
+
+        Keyword arguments:
+        max_cache -- the number of resolutions cached; the cache is cleared when it is full.
+        '''
+        self.base = base
+        self.max_cache = max_cache
+        self.__fragment_base = self.__probe("#x")
+        self.__query_base = self.__probe("?x")
+        self.__root = self.__probe("/x")
+        self.__directory = self.__probe("x")
+        self.__cache = {}
+
+    def __probe(self, reference):
+        '''
+        Returns what urljoin() prefixes a reference of the same form as reference with, or None.
+        '''
+        iri = urlparse.urljoin(self.base, reference)
+        if iri.endswith(reference[1:]) and iri[:-1].endswith(reference[:-1]):
+            return iri[:len(iri) - len(reference)]
+        return None
+
+    def resolve(self, reference):
+        '''
+        Returns the absolute IRI of a reference.
+        '''
+        iri = self.__cache.get(reference)
+        if iri is None:
+            iri = self.__resolve(reference)
+            if len(self.__cache) >= self.max_cache:
+                self.__cache.clear()
+            self.__cache[reference] = iri
+        return iri
+
+    def __resolve(self, reference):
+        first = reference[:1]
+        if first == "#":
+            if self.__fragment_base is not None and len(reference) > 1:
+                return self.__fragment_base + reference
+        elif first == "?":
+            if self.__query_base is not None and reference[1:2] not in ["", "#"] and not reference.endswith("#"):
+                return self.__query_base + reference
+        elif first == "/":
+            if self.__root is not None and self.absolute_path_pattern.match(reference) and self.__plain_path(reference):
+                return self.__root + reference
+        elif self.__directory is not None and self.simple_path_pattern.match(reference) and self.__plain_path(reference):
+            return self.__directory + reference
+        return urlparse.urljoin(self.base, reference)
+
+    def __plain_path(self, path):
+        '''
+        Returns True if a path has no dot segments, nor empty segments but the first and last.
+        '''
+        segments = path.split("/")
+        for segment in segments:
+            if segment in [".", ".."]:
+                return False
+        return "" not in segments[1:-1]
+
+class _BlankNodeAllocator(object):
+    '''
+    Numbers the blank nodes of a document from a prefix, so that the numbering can be
+    saved in a checkpoint and restored.
+    '''
+
+    def __init__(self, prefix, next=0):
+        self.prefix = prefix
+        self.next = next
+
+    def __call__(self, item):
+        bnode = "_:%s_%d" % (self.prefix, self.next)
+        self.next += 1
+        return bnode
+
+def _chunk_triples(task):
+    '''
+    Deserializes a chunk of array elements in a worker process of Processor.parallel_triples().
+    '''
+    return task[0]._chunk(*task[1:])
+
+class TripleCursor(object):
+    '''
+    An iterator over the triples of a document, returned by Processor.cursor(), whose
+    position can be saved with checkpoint() and resumed with Processor.cursor(doc, checkpoint).
+
+    A checkpoint is a Python dictionary of JSON values, so it can be stored with json.dumps(),
+    e.g. as a page token when paginating a document across requests. It holds the digests of
+    the document and of the processor's default context (the active context at the top level
+    of the document), the predicates and subjects filters, the index of the top-level array
+    element being deserialized and the number of its triples already yielded, the blank node
+    numbering at the start of that element, and the total number of triples yielded.
+    '''
+
+    version = 2
+
+    def __init__(self, state):
+        self._state = state
+        self._triples = iter(())
+
+    def __iter__(self):
+        return self
+
+    def next(self):
+        return next(self._triples)
+
+    __next__ = next
+
+    def take(self, count):
+        '''
+        Returns a list of the next count triples, or fewer if the document has fewer left.
+        '''
+        page = []
+        while len(page) < count:
+            try:
+                page.append(next(self._triples))
+            except StopIteration:
+                break
+        return page
+
+    def checkpoint(self):
+        '''
+        Returns a checkpoint of the triples yielded so far.
+        '''
+        return dict(self._state)
+
+    def triples_yielded(self):
+        '''
+        Returns the number of triples yielded so far, including those yielded before resuming.
+        '''
+        return self._state["triples"]
+
+class _Traversal(object):
+    '''
+    Holds the state shared by the recursive calls of Processor.__triples() while
+    deserializing a single document.
+    '''
+
+    def __init__(self, bnode=None, skip=None, report=None, max_depth=None, max_context_merges=None, deadline=None):
+        '''
+        Keyword arguments:
+        bnode -- a function returning the blank node for an object without a "@" key;
+                 by default, a random blank node is generated.
+        skip -- a set of ids of objects whose triples are not generated.
+        report -- an ErrorReport recording skipped errors, or None to raise them.
+        max_depth -- the maximum nesting depth of objects and arrays, or None.
+        max_context_merges -- the maximum number of local contexts merged, or None.
+        deadline -- the time.time() by which the traversal must finish, or None.
+        '''
+        self.bnode = bnode or (lambda item: "_:" + uuid.uuid4().hex)
+        self.skip = skip
+        self.report = report
+        self.failed = set()
+        self.max_depth = max_depth
+        self.max_context_merges = max_context_merges
+        self.context_merges = 0
+        self.deadline = deadline
+        self.nodes = 0
+        self.predicates = None
+        self.subjects = None
+        self.skipped = None
+        self.limited = max_depth is not None or deadline is not None
+
+    def enter(self, depth):
+        '''
+        Checks the depth and time limits on entering an object or array at a nesting depth.
+        '''
+        if self.max_depth is not None and depth > self.max_depth:
+            raise LimitExceededError("The document is nested more than %d levels deep" % (self.max_depth), "max_depth", self.max_depth)
+        if self.deadline is not None:
+            self.nodes += 1
+            if self.nodes % 256 == 0:
+                self.check_deadline()
+
+    def check_deadline(self):
+        '''
+        Checks that the time limit has not passed.
+        '''
+        if time.time() > self.deadline:
+            raise LimitExceededError("The document took longer than its time budget to process", "time_budget", self.deadline)
+
+    def merged_context(self):
+        '''
+        Counts a local context merge, checking the limit on merges.
+        '''
+        self.context_merges += 1
+        if self.max_context_merges is not None and self.context_merges > self.max_context_merges:
+            raise LimitExceededError("The document has more than %d local contexts" % (self.max_context_merges), "max_context_merges", self.max_context_merges)
+
 class Processor(object):
     '''
     Defines a class for a JSON-LD processor, as specified in http://json-ld.org/spec/latest/.
     '''
+
+    __curie_pattern = curie_pattern
+    __bnode_pattern = bnode_pattern
+    __iri_pattern = iri_pattern
+    __absolute_iri_pattern = absolute_iri_pattern
+    __wrapped_absolute_iri_pattern = wrapped_absolute_iri_pattern
+    __wrapped_relative_iri_pattern = wrapped_relative_iri_pattern
+    __lang_pattern = lang_pattern
+    __typed_literal_pattern = typed_literal_pattern
+    __datetime_pattern = datetime_pattern
+    __markup_pattern = markup_pattern
     
-    def __init__(self, context=None):
+    def __init__(self, context=None, lazy_literals=False, lenient=False, max_error_records=1000,
+                 max_depth=None, max_bytes=None, max_triples=None, max_context_merges=None, time_budget=None,
+                 context_table=None):
         '''
         Creates a JSON-LD Processor.
 
         Keyword arguments:
         context -- a Python dictionary providing the specification of a default context for the processor. 
+        lazy_literals -- if True, string literals are yielded as LazyLiteralTriple instances, whose
+                         lexical value, datatype and language are only computed (and cached) when
+                         first accessed, so that consumers that only look at the subject or property
+                         of a triple do not pay for literal typing. Errors in a literal, such as an
+                         unknown datatype prefix, are then raised on access rather than during iteration,
+                         so lazy_literals cannot be combined with lenient.
+        lenient -- if True, a node that cannot be deserialized (e.g. because of an unknown prefix) is
+                   skipped, together with its subtree, instead of raising a ProcessingError, and the
+                   error is recorded in the ErrorReport available as the processor's report attribute
+                   after each call to triples().
+        max_error_records -- the maximum number of error records kept by a lenient processor's
+                             ErrorReport; errors beyond it are only counted.
+        context_table -- the ContextTable in which merged local contexts are looked up; by default,
+                         CONTEXT_TABLE, shared by every processor in the process.
+
+        The following keyword arguments limit the resources used to deserialize each document.
+        When a limit is exceeded, a LimitExceededError is raised. By default, there are no limits.
 
-        If context is None, the default context is equivalent to the following JSON-LD context:
+        max_depth -- the maximum nesting depth of objects and arrays.
+        max_bytes -- the maximum size of a document.
+        max_triples -- the maximum number of triples yielded.
+        max_context_merges -- the maximum number of local contexts merged.
+        time_budget -- the maximum number of seconds from the call to triples() until the last
+                       triple is yielded; time the consumer spends between triples counts too.
+
+        A context given to the processor is copied into a dictionary that cannot be modified (apart
+        from its caches of resolved properties and resources). If context is None, the default
+        context is DEFAULT_CONTEXT, such a dictionary shared by every processor,
+        equivalent to the following JSON-LD context:
         
         { 
           "#": {
@@ -63,41 +567,66 @@ class Processor(object):
         Returns: an instance of json_ld_processor.Processor.
 
         '''
-        if context:
+        if lazy_literals and lenient:
+            raise ValueError("A lenient processor cannot defer literal errors to access with lazy_literals")
+        if not context:
+            self.__default_context = DEFAULT_CONTEXT
+        elif type(context).__name__ == '_Context':
             self.__default_context = context
         else:
-            self.__default_context = {
-                                      "rdf": "http://www.w3.org/1999/02/22-rdf-syntax-ns#",
-                                      "xsd": "http://www.w3.org/2001/XMLSchema#",
-                                      "dc": "http://purl.org/dc/terms/",
-                                      "skos": "http://www.w3.org/2004/02/skos/core#",
-                                      "foaf": "http://xmlns.com/foaf/0.1/",
-                                      "sioc": "http://rdfs.org/sioc/ns#",
-                                      "cc": "http://creativecommons.org/ns#",
-                                      "geo": "http://www.w3.org/2003/01/geo/wgs84_pos#",
-                                      "vcard": "http://www.w3.org/2006/vcard/ns#",
-                                      "cal": "http://www.w3.org/2002/12/cal/ical#",
-                                      "doap": "http://usefulinc.com/ns/doap#",
-                                      "Person": "http://xmlns.com/foaf/0.1/Person",
-                                      "name": "http://xmlns.com/foaf/0.1/name",
-                                      "homepage": "http://xmlns.com/foaf/0.1/homepage"
-                                     }
-        self.__curie_pattern = re.compile("^(?P<prefix>\w+)\:(?P<reference>\w+)$")
-        self.__bnode_pattern = re.compile("^_\:\w+$")
-        self.__iri_pattern = re.compile("^<?(?P<iri>(\w+)\:(/?)(/?)([^>\s]+))>?$")
-        self.__absolute_iri_pattern = re.compile("^(?P<iri>(\w+)\:(/?)(/?)([^>\s]+))$")
-        self.__wrapped_absolute_iri_pattern = re.compile("^<(?P<iri>(\w+)\:(/?)(/?)([^>\s]+))>$")
-        self.__wrapped_relative_iri_pattern = re.compile("^<(?P<iri>[^\:>\s]+)>$")
-        self.__lang_pattern = re.compile("^(?P<literal>.+)@(?P<lang>[a-zA-Z][a-zA-Z0-9\-]+)$")
-        self.__typed_literal_pattern = re.compile("^(?P<literal>.+)\^\^(?P<datatype>.+)$")
-        self.__datetime_pattern = re.compile("^(?P<year>\d\d\d\d)([-])?(?P<month>\d\d)([-])?(?P<day>\d\d)((T|\s+)(?P<hour>\d\d)(([:])?(?P<minute>\d\d)(([:])?(?P<second>\d\d)(([.])?(?P<fraction>\d+))?)?)?)?((?P<tzzulu>Z)|(?P<tzoffset>[-+])(?P<tzhour>\d\d)([:])?(?P<tzminute>\d\d))?$")
+            self.__default_context = _Context(context)
+        self.__lazy_literals = lazy_literals
+        self.__lenient = lenient
+        self.__max_error_records = max_error_records
+        self.__max_depth = max_depth
+        self.__max_bytes = max_bytes
+        self.__max_triples = max_triples
+        self.__max_context_merges = max_context_merges
+        self.__time_budget = time_budget
+        self.context_table = CONTEXT_TABLE if context_table is None else context_table
+        self.__resolvers = {}
+        self.report = None
         
-    def triples(self, doc):
+    def default_context(self):
+        '''
+        Returns a copy of the processor's default context, e.g. for use as the
+        prefixes of a json_ld_serializers.TurtleWriter.
+        '''
+        return dict(self.__default_context)
+
+    def options(self):
+        '''
+        Returns a Python dictionary of the keyword arguments, other than context and context_table,
+        that the processor was created with, i.e. the options that can change its output.
+        '''
+        return {
+            "lazy_literals": self.__lazy_literals,
+            "lenient": self.__lenient,
+            "max_error_records": self.__max_error_records,
+            "max_depth": self.__max_depth,
+            "max_bytes": self.__max_bytes,
+            "max_triples": self.__max_triples,
+            "max_context_merges": self.__max_context_merges,
+            "time_budget": self.__time_budget
+        }
+
+    def triples(self, doc, predicates=None, subjects=None):
         '''
         An iterator that yields triples by deserializing a JSON_LD document.
         
         Arguments:
         doc -- a str instance containing a JSON_LD document.
+
+        Keyword arguments:
+        predicates -- if not None, only triples whose property is one of these is yielded. Each
+                      can be an IRI, or a CURIE or term resolved against the default context.
+        subjects -- if not None, only triples whose subject is one of these IRIs or blank nodes
+                    is yielded.
+
+        The filters are applied while the document is traversed, so atomic values of other
+        properties and subjects are never typed, and no triples are built for them. Keys are
+        still resolved, so a document is rejected (or, if lenient, reported) as without filters,
+        and nested objects and arrays are still traversed, since they can describe wanted subjects.
         
         Returns: an iterator.
         
@@ -134,17 +663,381 @@ class Processor(object):
         <http://example.org/people#john> <http://www.w3.org/1999/02/22-rdf-syntax-ns#type> <http://xmlns.com/foaf/0.1/Person> .
         <http://example.org/people#john> <http://xmlns.com/foaf/0.1/name> "John Lennon" .
         '''
-        item = json.loads(doc)
-        return self.__triples(item, context=self.__default_context)
+        traversal = self.__traversal(predicates, subjects)
+        item = self.__load(doc)
+        return self.__checked(self.__triples(item, self.__default_context, traversal), traversal)
+
+    def cursor(self, doc, checkpoint=None, predicates=None, subjects=None):
+        '''
+        Returns a TripleCursor over the triples of a JSON-LD document, which can be checkpointed
+        and later resumed, in this or another process, without yielding any triple twice.
+
+        Arguments:
+        doc -- a str instance containing a JSON-LD document.
+
+        Keyword arguments:
+        checkpoint -- a checkpoint returned by TripleCursor.checkpoint() for the same document,
+                      to resume from, or None to start from the beginning.
+        predicates, subjects -- filters, as for triples(). A checkpoint can only be resumed with
+                                the filters it was created with.
+
+        Blank nodes are numbered from a prefix kept in the checkpoint, so the triples yielded
+        after resuming refer to the same blank nodes as those yielded before.
+
+        A checkpoint records a position as the index of a top-level array element, and the number
+        of its triples already yielded, which are deserialized again and discarded on resuming.
+        Resuming is therefore cheap for a document that is an array of many small elements, but
+        a document that is a single object is deserialized from its start on every resume, so
+        paging through it with take(count) costs time quadratic in its number of pages.
+        '''
+        digest = hashlib.sha1(doc.encode('utf-8') if type(doc).__name__ == 'unicode' else doc).hexdigest()
+        context = self.__default_context_digest()
+        bnode = _BlankNodeAllocator(None)
+        traversal = self.__traversal(predicates, subjects, bnode)
+        # the offsets in a checkpoint count the triples that pass the filters, so the filters
+        # are kept in it (resolved, and sorted to be JSON values independent of their order)
+        if traversal.predicates is not None:
+            predicates = sorted(traversal.predicates)
+        if traversal.subjects is not None:
+            subjects = sorted(traversal.subjects)
+        if checkpoint is None:
+            checkpoint = { "version": TripleCursor.version, "document": digest, "context": context,
+                           "predicates": predicates, "subjects": subjects,
+                           "element": 0, "offset": 0, "triples": 0, "bnode_prefix": uuid.uuid4().hex, "bnode_next": 0 }
+        elif checkpoint.get("version") != TripleCursor.version:
+            raise ValueError("The checkpoint was created by an incompatible version of the processor")
+        elif checkpoint.get("document") != digest:
+            raise ValueError("The checkpoint was created for a different document")
+        elif checkpoint.get("context") != context:
+            raise ValueError("The checkpoint was created by a processor with a different default context")
+        elif checkpoint.get("predicates") != predicates or checkpoint.get("subjects") != subjects:
+            raise ValueError("The checkpoint was created with different predicates or subjects filters")
+        bnode.prefix = checkpoint["bnode_prefix"]
+        bnode.next = checkpoint["bnode_next"]
+        item = self.__load(doc)
+        cursor = TripleCursor(dict(checkpoint))
+        cursor._triples = self.__checked(self.__resumed_triples(item, traversal, cursor), traversal)
+        return cursor
+
+    def __resumed_triples(self, item, traversal, cursor):
+        '''
+        Returns a generator that yields the triples of a document from a cursor's checkpoint,
+        updating the checkpoint as each triple is yielded.
+
+        A document that is an array is resumed from the start of its element holding the
+        checkpoint, with the blank node numbering at that element restored, skipping the
+        triples of the element that were already yielded; any other document is resumed
+        from its start in the same way.
+        '''
+        state = cursor._state
+        if type(item).__name__ == 'list':
+            elements = item
+        else:
+            elements = [item]
+        start = state["element"]
+        for i in range(start, len(elements)):
+            if i == start:
+                skip = state["offset"]
+            else:
+                skip = 0
+            bnode_next = traversal.bnode.next # the blank node numbering at the start of the element
+            if type(item).__name__ == 'list':
+                triples = self.__triples(elements[i], self.__default_context, traversal, (None, i), 1)
+            else:
+                triples = self.__triples(elements[i], self.__default_context, traversal)
+            offset = 0
+            for t in triples:
+                offset += 1
+                if offset <= skip:
+                    continue # already yielded before the checkpoint
+                state["element"] = i
+                state["offset"] = offset
+                state["bnode_next"] = bnode_next
+                state["triples"] += 1
+                yield t
+        state["element"] = len(elements)
+        state["offset"] = 0
+        state["bnode_next"] = traversal.bnode.next
+
+    def parallel_triples(self, doc, processes=None, chunk_size=None, pool=None, predicates=None, subjects=None):
+        '''
+        An iterator that yields the triples of a JSON-LD document, as triples() does, deserializing
+        the elements of a top-level array, or of the "@" array of a top-level object, in chunks
+        in a pool of worker processes. Other documents are deserialized in this process.
+
+        Arguments:
+        doc -- a str instance containing a JSON-LD document.
+
+        Keyword arguments:
+        processes -- the number of worker processes; by default, the number of CPUs.
+        chunk_size -- the number of array elements in each chunk; by default, the elements
+                      are split into four chunks per process.
+        pool -- a multiprocessing.Pool to use instead of creating one for the call.
+        predicates, subjects -- filters, as for triples().
+
+        Each chunk is deserialized with a snapshot of the active context and its own blank node
+        namespace, and the triples of the chunks are yielded in document order. The limits on
+        depth, context merges and time apply to each chunk, and the limits on triples and time
+        to the whole document. Processors with lazy_literals=True yield resolved triples.
+        '''
+        traversal = self.__traversal(predicates, subjects)
+        item = self.__load(doc)
+        (context, elements, path, rest) = (self.__default_context, [], None, None)
+        if type(item).__name__ == 'list':
+            elements = item
+        elif type(item).__name__ == 'dict' and type(item.get("@")).__name__ == 'list':
+            try:
+                if item.has_key("#"):
+                    context = self.__merge_contexts(item["#"], context)
+                (elements, path) = (item["@"], (None, "@"))
+                rest = dict([ (key, item[key]) for key in item if key not in ["#", "@"] ])
+            except ProcessingError:
+                pass # leave reporting the error to __triples() below
+        if processes is None:
+            import multiprocessing # only imported when needed, since it adds to the import time of the module
+            processes = pool and getattr(pool, "_processes", None) or multiprocessing.cpu_count()
+        if len(elements) < 2 or processes < 2:
+            return self.__checked(self.__triples(item, self.__default_context, traversal), traversal)
+        if rest is not None and item.has_key("#"):
+            traversal.merged_context()
+        if not chunk_size:
+            chunk_size = max(1, -(-len(elements) // (processes * 4)))
+        prefix = uuid.uuid4().hex
+        tasks = ((self, context, elements[i:i + chunk_size], i, path, "%sc%d" % (prefix, i), predicates, subjects)
+                 for i in range(0, len(elements), chunk_size))
+        return self.__checked(self.__parallel_triples(tasks, context, rest, traversal, processes, pool), traversal)
+
+    def __parallel_triples(self, tasks, context, rest, traversal, processes, pool):
+        '''
+        Returns a generator that yields the triples of the chunks of an array deserialized by
+        a pool of processes, in order, followed by the triples of the rest of its object, if any.
+        '''
+        own_pool = pool is None
+        if own_pool:
+            import multiprocessing
+            pool = multiprocessing.Pool(processes)
+        try:
+            for (triples, report) in pool.imap(_chunk_triples, tasks):
+                if report:
+                    traversal.report.merge(report)
+                for t in triples:
+                    yield t
+        finally:
+            if own_pool:
+                pool.terminate()
+        if rest is not None: # the rest of an object whose "@" array was chunked, about a new blank node
+            for t in self.__triples(rest, context, traversal):
+                yield t
+
+    def _chunk(self, context, elements, start, path, prefix, predicates, subjects):
+        '''
+        Returns a (triples, ErrorReport or None) tuple for a chunk of the elements of an array
+        at a path, starting at index start, in a worker process of parallel_triples().
+        '''
+        traversal = self.__traversal(predicates, subjects, _BlankNodeAllocator(prefix))
+        triples = []
+        for i, element in enumerate(elements):
+            for t in self.__triples(element, context, traversal, (path, start + i), 1):
+                triples.append(t.copy()) # resolving lazy literals before they are pickled
+        return (triples, traversal.report)
+
+    def __load(self, doc):
+        '''
+        Returns the JSON value of a document, checking the limits on its size and depth.
+        '''
+        if self.__max_bytes is not None:
+            size = len(doc.encode('utf-8')) if type(doc).__name__ == 'unicode' else len(doc)
+            if size > self.__max_bytes:
+                raise LimitExceededError("The document is larger than %d bytes" % (self.__max_bytes), "max_bytes", self.__max_bytes)
+        try:
+            return json.loads(doc)
+        except RuntimeError: # the document is nested too deeply for the JSON parser
+            if self.__max_depth is None:
+                raise
+            raise LimitExceededError("The document is nested more than %d levels deep" % (self.__max_depth), "max_depth", self.__max_depth)
+
+    def __traversal(self, predicates=None, subjects=None, bnode=None):
+        '''
+        Returns the _Traversal holding the state of a call to triples() or cursor(), starting its time budget.
+        '''
+        if self.__time_budget is not None:
+            deadline = time.time() + self.__time_budget
+        else:
+            deadline = None
+        traversal = _Traversal(bnode=bnode, max_depth=self.__max_depth, max_context_merges=self.__max_context_merges, deadline=deadline)
+        if predicates is not None:
+            traversal.predicates = set([self.__predicate(p) for p in predicates])
+        if subjects is not None:
+            traversal.subjects = set(subjects)
+        if self.__lenient:
+            self.report = traversal.report = ErrorReport(self.__max_error_records)
+        return traversal
+
+    def __checked(self, triples, traversal):
+        '''
+        Returns triples, wrapped to check the limits on the number of triples and time if they are set.
+        '''
+        if self.__max_triples is not None or traversal.deadline is not None:
+            return self.__limited(triples, traversal)
+        return triples
+
+    def __default_context_digest(self):
+        '''
+        Returns the SHA-1 hex digest of the default context, computing it on first use.
+        '''
+        return self.__default_context.digest()
+
+    def __predicate(self, value):
+        '''
+        Returns the IRI of a property given to triples() as a filter.
+        '''
+        if value == "a":
+            return "http://www.w3.org/1999/02/22-rdf-syntax-ns#type"
+        return self.__property(value, self.__default_context)
+
+    def __limited(self, triples, traversal):
+        '''
+        Returns a generator that yields triples, checking the limits on the number of triples and time.
+        '''
+        count = 0
+        for t in triples:
+            count += 1
+            if self.__max_triples is not None and count > self.__max_triples:
+                raise LimitExceededError("The document yields more than %d triples" % (self.__max_triples), "max_triples", self.__max_triples)
+            if traversal.deadline is not None and count % 256 == 0:
+                traversal.check_deadline()
+            yield t
+
+    def diff(self, old_doc, new_doc):
+        '''
+        An iterator that yields the triples removed and added when a JSON-LD document changes.
+
+        Arguments:
+        old_doc -- a str instance containing the old version of a JSON_LD document.
+        new_doc -- a str instance containing the new version of the JSON_LD document.
+
+        Returns: an iterator.
+
+        Each item yielded is a tuple ("-", triple) for a triple only in the old version,
+        or ("+", triple) for a triple only in the new version, with the removed triples
+        yielded first.
+
+        Every object in both documents is hashed by its content and active context.
+        Objects that appear unchanged in both versions are not traversed, unless a changed
+        object describes one of their subjects too, so the work done grows with the size of
+        the change rather than the size of the document. Blank nodes are named after the
+        hash of their object, so they keep the same ids in unchanged parts of the document
+        (and identical anonymous objects share a blank node).
+
+        Both documents are loaded and traversed with the processor's limits and, if it is
+        lenient, its errors are recorded in a single ErrorReport.
+        '''
+        old_item = self.__load(old_doc)
+        new_item = self.__load(new_doc)
+        digest = self.__default_context_digest()
+        old_keys = {}
+        new_keys = {}
+        if self.__subtree_hash(old_item, digest, old_keys) == self.__subtree_hash(new_item, digest, new_keys):
+            return
+        shared = set(old_keys.values()) & set(new_keys.values())
+        old_traversal = self.__traversal(bnode=lambda node: "_:" + old_keys[id(node)])
+        (old_graph, old_triples, skipped) = self.__graph(old_item, old_keys, shared, old_traversal)
+        new_traversal = self.__diff_traversal(new_keys, old_traversal)
+        (new_graph, new_triples, ignored) = self.__graph(new_item, new_keys, shared, new_traversal)
+        removed = [ (key, t) for (key, t) in old_triples if key not in new_graph ]
+        added = [ (key, t) for (key, t) in new_triples if key not in old_graph ]
+        if removed or added:
+            #
+            # The unchanged objects are the same in both versions, so a triple that one of
+            # them expresses (about a subject of a removed or added triple) is in both
+            #
+            subjects = set([ t["subj"] for (key, t) in removed + added ])
+            unchanged = self.__unchanged_graph(skipped, old_keys, subjects, self.__diff_traversal(old_keys, old_traversal))
+            removed = [ (key, t) for (key, t) in removed if key not in unchanged ]
+            added = [ (key, t) for (key, t) in added if key not in unchanged ]
+        for (key, t) in removed:
+            yield ("-", t)
+        for (key, t) in added:
+            yield ("+", t)
+
+    def __diff_traversal(self, keys, first):
+        '''
+        Returns another _Traversal of a call to diff(), sharing the ErrorReport and time budget of the first.
+        '''
+        traversal = self.__traversal(bnode=lambda node: "_:" + keys[id(node)])
+        traversal.report = self.report = first.report
+        traversal.deadline = first.deadline
+        return traversal
 
-    def __triples(self, item, context=None):
+    def __graph(self, item, keys, shared, traversal):
+        '''
+        Returns the set of (hashable) keys of the triples expressed by an item, a list of
+        the distinct triples paired with their keys, and a list of the objects skipped,
+        with their active contexts, skipping the objects in item whose hash is in shared.
+        '''
+        traversal.skip = set([i for (i, key) in keys.items() if key in shared])
+        traversal.skipped = []
+        graph = set()
+        triples = []
+        for t in self.__checked(self.__triples(item, self.__default_context, traversal), traversal):
+            key = tuple(sorted(t.items()))
+            if key not in graph:
+                graph.add(key)
+                triples.append((key, t))
+        return (graph, triples, traversal.skipped)
+
+    def __unchanged_graph(self, skipped, keys, subjects, traversal):
+        '''
+        Returns the set of keys of the triples about subjects expressed by the skipped objects,
+        traversing each distinct object (by hash) once.
+        '''
+        traversal.subjects = subjects
+        graph = set()
+        seen = set()
+        for (item, context, path, depth) in skipped:
+            if keys[id(item)] not in seen:
+                seen.add(keys[id(item)])
+                for t in self.__checked(self.__triples(item, context, traversal, path, depth), traversal):
+                    graph.add(tuple(sorted(t.items())))
+        return graph
+
+    def __subtree_hash(self, item, context_digest, keys):
+        '''
+        Returns a hash of the content of an item, recording in keys, for each object in the
+        item, a hash of its content and active context, keyed by the id of the object.
+        '''
+        item_type = type(item).__name__
+        if item_type == 'dict':
+            if item.has_key("#"):
+                context_digest = hashlib.sha1(context_digest + json.dumps(item["#"], sort_keys=True)).hexdigest()
+            h = hashlib.sha1("{")
+            for key in sorted(item.keys()):
+                h.update(json.dumps(key))
+                h.update(self.__subtree_hash(item[key], context_digest, keys))
+            content = h.hexdigest()
+            keys[id(item)] = hashlib.sha1(context_digest + content).hexdigest()
+            return content
+        elif item_type == 'list':
+            h = hashlib.sha1("[")
+            for element in item:
+                h.update(self.__subtree_hash(element, context_digest, keys))
+            return h.hexdigest()
+        else:
+            return hashlib.sha1(json.dumps(item)).hexdigest()
+
+    def __triples(self, item, context, traversal, path=None, depth=0):
         '''
         Returns a generator that yields triples expressed by an item.
         
         An item can be a Python dictionary or list, generated by deserializing a str 
         instance of a JSON_LD document initially supplied in a call to the public 
         function triples().
+
+        The path of the item in the document is given as nested (parent path, key or
+        index) tuples, for reporting errors, and depth is its nesting depth.
         '''
+        if traversal.limited:
+            traversal.enter(depth)
         #
         # Three cases to consider: item is a 1) object, 2) array, or 3) a boolean, integer, 
         # float, string, or null
@@ -152,35 +1045,58 @@ class Processor(object):
         # Case 1: item is an object (i.e., an associative array)
         #
         if type(item).__name__ == 'dict': # if we have an object
+            if traversal.skip and id(item) in traversal.skip: # if we are skipping the object
+                if not item.has_key("@"): # then all we need is its subject
+                    item['@'] = traversal.bnode(item)
+                if traversal.skipped is not None: # and we may need to traverse it later
+                    traversal.skipped.append((item, context, path, depth))
+                return
             #
             # Merge contexts if necessary
             #
             if item.has_key("#"): # if it has a local context
-                context = self.__merge_contexts(item["#"], context) # merge it into context
+                traversal.merged_context()
+                try:
+                    context = self.__merge_contexts(item["#"], context) # merge it into context
+                except ProcessingError as e:
+                    if not traversal.report: raise
+                    traversal.report.record((path, "#"), e) # or, if lenient, skip the object
+                    traversal.failed.add(id(item))
+                    return
             #
             # Determine the subject
             #
             if item.has_key("@"): # if item has a reference to a resource
                 subj = item["@"]  # set subj to the reference
                 if type(subj).__name__ == 'dict': # if subj is an object
-                    for t in self.__triples(subj, context): # recurse
+                    for t in self.__triples(subj, context, traversal, (path, "@"), depth + 1): # recurse
                         yield t # yielding each resulting triple
+                    if id(subj) in traversal.failed or not subj.has_key("@"): # if, leniently, the object was skipped
+                        traversal.failed.add(id(item)) # then skip this object too, its error being recorded
+                        return
                     subj = subj["@"] # and set subj to the resource referenced by the object
                 elif type(subj).__name__ == 'list': # otherwise if subj is an array
-                    for element in subj: # then for each element in the array
-                        for t in self.__triples(element, context): # recurse
+                    for i, element in enumerate(subj): # then for each element in the array
+                        for t in self.__triples(element, context, traversal, ((path, "@"), i), depth + 1): # recurse
                             yield t # yielding each resulting triple
-                    subj = "_:" + uuid.uuid4().hex # and set subj to a auto-generated bnode
+                    subj = traversal.bnode(item) # and set subj to a auto-generated bnode
                 elif subj: # otherwise, subj is a (Unicode) string
-                    subj = self.__resource(subj, context) # so we map subj to an IRI based on context
+                    try:
+                        subj = self.__resource(subj, context) # so we map subj to an IRI based on context
+                    except ProcessingError as e:
+                        if not traversal.report: raise
+                        traversal.report.record((path, "@"), e) # or, if lenient, skip the object
+                        traversal.failed.add(id(item))
+                        return
                 else:
                     pass
             else: # otherwise, we have no reference to a resource
-                subj = "_:" + uuid.uuid4().hex # so we set subj to a auto-generated bnode
+                subj = traversal.bnode(item) # so we set subj to a auto-generated bnode
                 item['@'] = subj # and add that key-value pair to the object (for when a recursion returns)
             #
             # Process the key-value pairs
             #
+            emit_subj = traversal.subjects is None or subj in traversal.subjects # are triples about subj wanted?
             for key in item:
                 if key not in ["#", "@"]: # ignore "#" and "@" since we dealt with them above
                     #
@@ -189,39 +1105,78 @@ class Processor(object):
                     if key == "a": # if we have a type statement
                         prop = "http://www.w3.org/1999/02/22-rdf-syntax-ns#type" # set prop to IRI for rdf:type
                     else: # otherwise key is another property 
-                        prop = self.__property(key, context) # so we map it to an IRI based on context
+                        try:
+                            prop = self.__property(key, context) # so we map it to an IRI based on context
+                        except ProcessingError as e:
+                            if not traversal.report: raise
+                            traversal.report.record((path, key), e) # or, if lenient, skip the key-value pair
+                            continue
+                    if not emit_subj and type(item[key]).__name__ not in ['dict', 'list']:
+                        continue # skip atomic values of unwanted subjects without typing them
+                    emit = emit_subj and (traversal.predicates is None or prop in traversal.predicates) # is <subj, prop, *> wanted?
                     #
                     # Determine the object and yield a triple, recursing if necessary
                     #
                     obj = item[key] # set obj to the key value of the property
                     if type(obj).__name__ == 'dict': # if obj is an object
-                        for t in self.__triples(obj, context): # recurse
+                        for t in self.__triples(obj, context, traversal, (path, key), depth + 1): # recurse
                             yield t # yielding each resulting triple
-                        # and then yield <subj, prop, obj['@']>
-                        yield self.__triple(subj, prop, obj["@"], context)
+                        # and then yield <subj, prop, obj['@']>, if wanted and unless the object was skipped
+                        if emit and id(obj) not in traversal.failed:
+                            try:
+                                t = self.__triple(subj, prop, obj["@"], context)
+                            except ProcessingError as e:
+                                if not traversal.report: raise
+                                traversal.report.record((path, key), e) # or, if lenient, skip the key-value pair
+                                continue
+                            yield t
                     elif type(obj).__name__ == 'list': # otherwise if obj is an array
-                        for element in obj: # then for each element in the array
+                        if emit and len(obj) >= 8: # if it is long, try to convert it in bulk
+                            triples = self.__atomic_array_triples(subj, prop, obj, context, traversal, (path, key))
+                            if triples is not None: # and if all its elements are atomic values of one type
+                                for t in triples:
+                                    yield t # yield the resulting triples
+                                continue
+                        for i, element in enumerate(obj): # otherwise for each element in the array
                             # if the element is an array or object
                             if type(element).__name__ == 'list' or type(element).__name__ == 'dict': 
-                                for t in self.__triples(element, context): # recurse
+                                for t in self.__triples(element, context, traversal, ((path, key), i), depth + 1): # recurse
                                     yield t # yielding each resulting triple
-                                if type(element).__name__ == 'dict': # and if the element is an object
+                                if emit and type(element).__name__ == 'dict' and id(element) not in traversal.failed: # and if the element is an object
                                     # then yield <subj, prop, element['@']>
-                                    yield self.__triple(subj, prop, element["@"], context)
-                            elif element: # otherwise the element is a boolean, integer, float, or string
+                                    try:
+                                        t = self.__triple(subj, prop, element["@"], context)
+                                    except ProcessingError as e:
+                                        if not traversal.report: raise
+                                        traversal.report.record(((path, key), i), e) # or, if lenient, skip the element
+                                        continue
+                                    yield t
+                            elif element and emit: # otherwise the element is a boolean, integer, float, or string
                                 # and we yield <subj, prop, element>
-                                yield self.__triple(subj, prop, element, context)
-                    elif obj: # otherwise obj is a boolean, integer, float, or string
+                                try:
+                                    t = self.__triple(subj, prop, element, context)
+                                except ProcessingError as e:
+                                    if not traversal.report: raise
+                                    traversal.report.record(((path, key), i), e) # or, if lenient, skip the element
+                                    continue
+                                yield t
+                    elif obj and emit: # otherwise obj is a boolean, integer, float, or string
                         # and we yield <subj, prop, obj>
-                        yield self.__triple(subj, prop, obj, context)
+                        try:
+                            t = self.__triple(subj, prop, obj, context)
+                        except ProcessingError as e:
+                            if not traversal.report: raise
+                            traversal.report.record((path, key), e) # or, if lenient, skip the key-value pair
+                            continue
+                        yield t
                     else: # otherwise obj is a null
                         pass # and we yield nothing
         #
         # Case 2: item is an array
         #
         elif type(item).__name__ == 'list':
-            for element in item: # for each element in the array
-                for t in self.__triples(element, context): # recurse
+            for i, element in enumerate(item): # for each element in the array
+                for t in self.__triples(element, context, traversal, (path, i), depth + 1): # recurse
                     yield t # yielding each resulting triple
         #
         # Case 3: item is a boolean, integer, float, string, or null
@@ -229,6 +1184,53 @@ class Processor(object):
         else: # since there are no key-value pairs or elements to iterate over
             pass # we don't yield any triples
         
+    def __atomic_array_triples(self, subj, prop, array, context, traversal, path):
+        '''
+        Returns a list of the triples expressed by an array of atomic values of a single type,
+        converting its values in one pass with a single datatype per array, or None if the
+        array holds values of several types, objects or arrays.
+
+        Like elements of other arrays, false, zero and empty values yield no triples.
+        '''
+        types = set(map(type, array))
+        if len(types) != 1:
+            return None
+        value_type = types.pop().__name__
+        if value_type in ['int', 'long']:
+            datatype = "http://www.w3.org/2001/XMLSchema#integer"
+            values = [ "%d" % value for value in array if value ]
+        elif value_type == 'float':
+            datatype = "http://www.w3.org/2001/XMLSchema#float"
+            values = [ "%f" % value for value in array if value ]
+        elif value_type == 'bool':
+            datatype = "http://www.w3.org/2001/XMLSchema#boolean"
+            values = [ "true" for value in array if value ]
+        elif value_type in ['str', 'unicode'] and not self.__lazy_literals:
+            return self.__string_array_triples(subj, prop, array, context, traversal, path)
+        else:
+            return None
+        return [ { "subj": subj, "prop": prop, "objtype": "literal", "obj": value, "datatype": datatype } for value in values ]
+
+    def __string_array_triples(self, subj, prop, array, context, traversal, path):
+        '''
+        Returns a list of the triples expressed by an array of strings. Strings that can only be
+        plain literals are converted directly; the others go through __triple().
+        '''
+        triples = []
+        markup = self.__markup_pattern
+        for i, value in enumerate(array):
+            if not value:
+                continue
+            if not markup.search(value) and not context.has_key(value) and not (value[0].isdigit() and self.__datetime_pattern.match(value)):
+                triples.append({ "subj": subj, "prop": prop, "objtype": "literal", "obj": value, "datatype": "http://www.w3.org/2001/XMLSchema#string" })
+                continue
+            try:
+                triples.append(self.__triple(subj, prop, value, context))
+            except ProcessingError as e:
+                if not traversal.report: raise
+                traversal.report.record((path, i), e) # or, if lenient, skip the element
+        return triples
+
     def __merge_contexts(self, local_context, active_context):
         '''
         Returns a context that is the result of merging local_context into active_context.
@@ -236,14 +1238,23 @@ class Processor(object):
         Merging is defined as in Step 2.1 of the JSON-LD Processing Algorithm in 
         http://json-ld.org/spec/latest/. 
         '''
-        context = {}
-        for prefix in active_context.keys():
-            context[prefix] = active_context[prefix]
-        for prefix in local_context.keys():
-            context[prefix] = local_context[prefix]
-        return context
+        if type(local_context).__name__ != 'dict':
+            raise ProcessingError("The local context %s is not an object" % (json.dumps(local_context)), "invalid_context", local_context)
+        return self.context_table.merge(local_context, active_context)
 
     def __property(self, key, context):
+        '''
+        Returns an IRI as a property for a triple, given a JSON-LD object key, caching it in the context.
+        '''
+        iri = context.properties.get(key)
+        if iri is None:
+            iri = self.__property_iri(key, context)
+            if len(context.properties) >= context.max_cache:
+                context.properties.clear()
+            context.properties[key] = iri
+        return iri
+
+    def __property_iri(self, key, context):
         '''
         Returns an IRI as a property for a triple, given a JSON-LD object key.
         Specifications referenced in comments: [1] http://www.w3.org/TR/curie, [2] http://www.ietf.org/rfc/rfc3987.txt.
@@ -259,14 +1270,14 @@ class Processor(object):
             elif m.group(2) == '_': # otherwise if this is a blank node
                 return key # we return it directly
             else: # otherwise we have prefix that is not in the context
-                raise Exception('The current context is missing a match for "%s" in "%s"' % (m.group(2), key))
+                raise ProcessingError('The current context is missing a match for "%s" in "%s"' % (m.group(2), key), "unknown_prefix", key)
         else: # otherwise this must be a key or a relative IRI
             if context.has_key(key): # if context contains key as a key
                 return context[key] # return the key value IRI
             elif context.has_key("#vocab"): # otherwise if we have a #vocab IRI
                 return context["#vocab"] + key # we append the key to the #vocab IRI
             else: # otherwise we complain
-                raise Exception("The current context is missing a #vocab prefix")
+                raise ProcessingError("The current context is missing a #vocab prefix", "missing_vocab", key)
             
     def __triple(self, subj, prop, obj, context):
         '''
@@ -284,6 +1295,18 @@ class Processor(object):
         return { "subj": subj, "prop": prop, "objtype": "resource", "obj": self.__resource(obj, context) }
 
     def __resource(self, value, context):
+        '''
+        Returns a resource, which is either an absolute IRI or a blank node, caching it in the context.
+        '''
+        resource = context.resources.get(value)
+        if resource is None:
+            resource = self.__resolved_resource(value, context)
+            if len(context.resources) >= context.max_cache:
+                context.resources.clear()
+            context.resources[value] = resource
+        return resource
+
+    def __resolved_resource(self, value, context):
         '''
         Returns a resource, which is either an absolute IRI or a blank node.
         '''
@@ -301,21 +1324,32 @@ class Processor(object):
             elif context.has_key(curie.group('reference')):
                 return context[curie.group('reference')]
             else:
-                raise Exception('The current context is missing a match for "%s" or "%s" in "%s"' % (curie.group('prefix'), curie.group('reference'), value))
+                raise ProcessingError('The current context is missing a match for "%s" or "%s" in "%s"' % (curie.group('prefix'), curie.group('reference'), value), "unknown_prefix", value)
         elif wrapped_absolute_iri:
             if context.has_key('#base'):
                 base = context['#base']
             else:
                 base = ''
-            return urlparse.urljoin(base, wrapped_absolute_iri.group('iri'))
+            return self.__resolver(base).resolve(wrapped_absolute_iri.group('iri'))
         elif wrapped_relative_iri:
             if context.has_key('#base'):
-                return urlparse.urljoin(context['#base'], wrapped_relative_iri.group('iri'))
+                return self.__resolver(context['#base']).resolve(wrapped_relative_iri.group('iri'))
             else:
-                raise Exception("The current context is missing a #base prefix")
+                raise ProcessingError("The current context is missing a #base prefix", "missing_base", value)
         else:
-            raise Exception("%s is neither a CURIE, blank node nor a wrapped IRI" % (value))
+            raise ProcessingError("%s is neither a CURIE, blank node nor a wrapped IRI" % (value), "invalid_resource", value)
             
+    def __resolver(self, base):
+        '''
+        Returns the BaseIRIResolver of a base IRI, creating it on first use.
+        '''
+        resolver = self.__resolvers.get(base)
+        if resolver is None:
+            if len(self.__resolvers) >= 64:
+                self.__resolvers.clear()
+            resolver = self.__resolvers[base] = BaseIRIResolver(base)
+        return resolver
+
     def __datatype(self, value, context):
         '''
         Returns a resource, which is either an absolute IRI or a blank node.
@@ -328,11 +1362,11 @@ class Processor(object):
             elif context.has_key(curie.group('reference')):
                 return context[curie.group('reference')]
             else:
-                raise Exception('The current context is missing a match for "%s" or "%s" in "%s"' % (curie.group('prefix'), curie.group('reference'), value))
+                raise ProcessingError('The current context is missing a match for "%s" or "%s" in "%s"' % (curie.group('prefix'), curie.group('reference'), value), "unknown_prefix", value)
         elif absolute_iri:
             return absolute_iri.group('iri')
         else:
-            raise Exception("%s is neither a CURIE, blank node nor a wrapped IRI" % (value))
+            raise ProcessingError("%s is neither a CURIE, blank node nor a wrapped IRI" % (value), "invalid_datatype", value)
         
     def __unescape(self, str):
         return str.replace("\\<", "<").replace("\\>", ">").replace("\\@", "@").replace("\\#", "#").replace("\\:", ":").replace("\\^", "^")        
@@ -341,7 +1375,16 @@ class Processor(object):
         '''
         Returns a dict representing a triple with a typed literal as an object.
         '''
+        if self.__lazy_literals and type(value).__name__ in ['str', 'unicode']:
+            return LazyLiteralTriple(subj, prop, value, context, self.__literal)
         triple = { "subj": subj, "prop": prop, "objtype": "literal" }
+        self.__literal(triple, value, context)
+        return triple
+
+    def __literal(self, triple, value, context):
+        '''
+        Sets the "obj", "datatype" and (if any) "lang" of a literal-valued triple, given a JSON-LD value.
+        '''
         value_type = type(value).__name__
         if value_type == 'bool':
             if value:
@@ -373,6 +1416,110 @@ class Processor(object):
                 triple["obj"] = self.__unescape(value)
                 triple["datatype"] = "http://www.w3.org/2001/XMLSchema#string"
         else:
-            raise Exception("Value '%s' has unknown literal type: %s" % (value, value_type))
-        return triple
-    
+            raise ProcessingError("Value '%s' has unknown literal type: %s" % (value, value_type), "unknown_literal_type", value)
+
+class LazyLiteralTriple(object):
+    '''
+    A mapping representing a triple with a literal as an object, whose "obj", "datatype" and
+    "lang" keys are computed on first access, as yielded by a Processor created with
+    lazy_literals=True.
+
+    The "subj", "prop" and "objtype" keys are available immediately. Any other access,
+    including iteration, comparison and membership tests of the lazy keys, resolves the
+    literal once and caches the result. The class is not a dict subclass, since Python 2 copies
+    dict subclasses (e.g. with dict(t), d.update(t) or json.dumps(t)) by reading their storage
+    directly, which would miss the lazy keys; resolve() returns the triple as a plain dict.
+    '''
+
+    __slots__ = ('__triple', '__pending')
+
+    __lazy_keys = frozenset(["obj", "datatype", "lang"])
+
+    def __init__(self, subj, prop, value, context, resolve):
+        self.__triple = { "subj": subj, "prop": prop, "objtype": "literal" }
+        self.__pending = (value, context, resolve)
+
+    def resolve(self):
+        '''
+        Returns the triple as a dict, resolving its literal if it has not been resolved yet.
+        '''
+        if self.__pending is not None:
+            (value, context, resolve) = self.__pending
+            resolve(self.__triple, value, context)
+            self.__pending = None
+        return self.__triple
+
+    def __lookup(self, key):
+        if self.__pending is not None and key in self.__lazy_keys:
+            return self.resolve()
+        return self.__triple
+
+    def __getitem__(self, key):
+        return self.__lookup(key)[key]
+
+    def __contains__(self, key):
+        return key in self.__lookup(key)
+
+    def has_key(self, key):
+        return key in self.__lookup(key)
+
+    def get(self, key, default=None):
+        return self.__lookup(key).get(key, default)
+
+    def __setitem__(self, key, value):
+        self.resolve()[key] = value
+
+    def __delitem__(self, key):
+        del self.resolve()[key]
+
+    def __iter__(self):
+        return iter(self.resolve())
+
+    def __len__(self):
+        return len(self.resolve())
+
+    def __eq__(self, other):
+        if isinstance(other, LazyLiteralTriple):
+            other = other.resolve()
+        return self.resolve() == other
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return repr(self.resolve())
+
+    def __reduce__(self):
+        return (dict, (self.resolve().items(),))
+
+    def keys(self):
+        return self.resolve().keys()
+
+    def values(self):
+        return self.resolve().values()
+
+    def items(self):
+        return self.resolve().items()
+
+    def iterkeys(self):
+        return self.resolve().iterkeys()
+
+    def itervalues(self):
+        return self.resolve().itervalues()
+
+    def iteritems(self):
+        return self.resolve().iteritems()
+
+    def copy(self):
+        return dict(self.resolve())
+
+    def pop(self, *args):
+        return self.resolve().pop(*args)
+
+    def setdefault(self, key, default=None):
+        return self.resolve().setdefault(key, default)
+
+    def update(self, *args, **kwargs):
+        self.resolve().update(*args, **kwargs)
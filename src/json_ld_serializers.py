@@ -0,0 +1,411 @@
+# -*- coding: utf-8 -*-
+'''
+Streaming serializers for triples generated by json_ld_processor.Processor.
+
+All serializers share the TripleWriter interface: triples are written one at a
+time with write() (or in bulk with write_all()), serialized output is buffered
+in memory and flushed to the underlying byte stream whenever the buffer grows
+past buffer_size bytes, and close() flushes any remaining output.
+
+    NTriplesWriter  -- N-Triples
+    NQuadsWriter    -- N-Quads, with a graph name per document
+    TurtleWriter    -- Turtle, compacting IRIs with the prefixes of a context
+                       and grouping consecutive triples by subject
+    BinaryWriter    -- a compact, length-prefixed, dictionary-encoded format
+                       that can be reloaded incrementally with read_binary_triples()
+'''
+
+import re, struct
+
+XSD_STRING = "http://www.w3.org/2001/XMLSchema#string"
+RDF_TYPE = "http://www.w3.org/1999/02/22-rdf-syntax-ns#type"
+
+BINARY_MAGIC = b"JLDT\x02"
+
+# Record tags of the binary format
+TERM_RECORD = 0
+RESOURCE_RECORD = 1
+LITERAL_RECORD = 2
+RESET_RECORD = 3
+
+# Record layouts of the binary format: a tag byte followed by little-endian 32-bit fields
+TERM_HEADER = struct.Struct("<BI") # the length of the term's UTF-8 bytes, which follow
+RESOURCE_TRIPLE = struct.Struct("<BIII") # the ids of the subject, property and object
+LITERAL_TRIPLE = struct.Struct("<BIIIII") # the ids of the subject, property, object, datatype and language
+
+bnode_pattern = re.compile("^_\:\w+$")
+namespace_prefix_pattern = re.compile("^[A-Za-z]\w*$")
+local_name_pattern = re.compile("^\w[\w\-]*$")
+
+def escape_literal(value):
+    '''
+    Returns value escaped for use as a quoted literal in N-Triples, N-Quads or Turtle.
+    '''
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n').replace('\r', '\\r')
+
+def ntriples_resource(value):
+    '''
+    Returns the N-Triples form of a resource, which is either an IRI or a blank node.
+    '''
+    if bnode_pattern.match(value):
+        return value.encode('utf-8')
+    else:
+        return "<" + value.encode('utf-8') + ">"
+
+def ntriples_object(triple):
+    '''
+    Returns the N-Triples form of the object of a triple.
+    '''
+    if triple["objtype"] == "resource":
+        return ntriples_resource(triple["obj"])
+    literal = '"%s"' % escape_literal(triple["obj"]).encode('utf-8')
+    if triple.has_key("lang"):
+        return literal + "@" + triple["lang"].encode('utf-8')
+    elif triple.has_key("datatype") and triple["datatype"] != XSD_STRING:
+        return literal + "^^<" + triple["datatype"].encode('utf-8') + ">"
+    else:
+        return literal
+
+class TripleWriter(object):
+    '''
+    Defines the interface shared by all triple serializers.
+
+    Subclasses implement serialize(), and optionally header() and footer(),
+    each returning a byte string.
+    '''
+
+    def __init__(self, stream, buffer_size=65536):
+        '''
+        Creates a writer.
+
+        Arguments:
+        stream -- a file-like object opened for writing bytes.
+
+        Keyword arguments:
+        buffer_size -- the number of bytes buffered before output is written to stream.
+        '''
+        self.stream = stream
+        self.buffer_size = buffer_size
+        self.bytes_written = 0
+        self.triples_written = 0
+        self.__buffer = []
+        self.__buffered = 0
+        self.__started = False
+        self.__closed = False
+
+    def header(self):
+        '''
+        Returns the bytes written before the first triple.
+        '''
+        return ""
+
+    def footer(self):
+        '''
+        Returns the bytes written when the writer is closed.
+        '''
+        return ""
+
+    def serialize(self, triple):
+        '''
+        Returns the bytes that represent a triple.
+        '''
+        raise NotImplementedError
+
+    def write(self, triple):
+        '''
+        Serializes a triple, writing buffered output to the stream as needed.
+        '''
+        if not self.__started:
+            self.__started = True
+            self._append(self.header())
+        self._append(self.serialize(triple))
+        self.triples_written += 1
+
+    def write_all(self, triples):
+        '''
+        Serializes each triple in an iterable of triples.
+
+        Returns: the number of triples written.
+        '''
+        count = 0
+        for t in triples:
+            self.write(t)
+            count += 1
+        return count
+
+    def flush(self):
+        '''
+        Writes any buffered output to the stream.
+        '''
+        if self.__buffer:
+            self.stream.write("".join(self.__buffer))
+            self.__buffer = []
+            self.__buffered = 0
+        if hasattr(self.stream, 'flush'):
+            self.stream.flush()
+
+    def close(self):
+        '''
+        Writes the footer and any buffered output to the stream. The stream itself is left open.
+        '''
+        if self.__closed:
+            return
+        if not self.__started:
+            self.__started = True
+            self._append(self.header())
+        self._append(self.footer())
+        self.flush()
+        self.__closed = True
+
+    def _append(self, data):
+        if data:
+            self.__buffer.append(data)
+            self.__buffered += len(data)
+            self.bytes_written += len(data)
+            if self.__buffered >= self.buffer_size:
+                self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+class NTriplesWriter(TripleWriter):
+    '''
+    Serializes triples in N-Triples format.
+    '''
+
+    def serialize(self, triple):
+        return "%s <%s> %s .\n" % (ntriples_resource(triple["subj"]), triple["prop"].encode('utf-8'), ntriples_object(triple))
+
+class NQuadsWriter(TripleWriter):
+    '''
+    Serializes triples in N-Quads format, naming the graph of each document.
+    '''
+
+    def __init__(self, stream, graph=None, buffer_size=65536):
+        '''
+        Creates an N-Quads writer.
+
+        Arguments:
+        stream -- a file-like object opened for writing bytes.
+
+        Keyword arguments:
+        graph -- the IRI (or blank node) naming the graph triples are written to, or
+                 None for the default graph.
+        buffer_size -- the number of bytes buffered before output is written to stream.
+        '''
+        TripleWriter.__init__(self, stream, buffer_size)
+        self.set_graph(graph)
+
+    def set_graph(self, graph):
+        '''
+        Sets the graph name used for subsequently written triples, e.g. when
+        starting on the next document.
+        '''
+        if graph:
+            self.__graph = " " + ntriples_resource(graph)
+        else:
+            self.__graph = ""
+
+    def serialize(self, triple):
+        return "%s <%s> %s%s .\n" % (ntriples_resource(triple["subj"]), triple["prop"].encode('utf-8'), ntriples_object(triple), self.__graph)
+
+class TurtleWriter(TripleWriter):
+    '''
+    Serializes triples in Turtle format.
+
+    IRIs are compacted using the namespace prefixes of a JSON-LD context (i.e.,
+    the entries whose IRIs end in "/" or "#"), and consecutive triples with the
+    same subject (and property) are grouped together.
+    '''
+
+    def __init__(self, stream, prefixes=None, buffer_size=65536):
+        '''
+        Creates a Turtle writer.
+
+        Arguments:
+        stream -- a file-like object opened for writing bytes.
+
+        Keyword arguments:
+        prefixes -- a Python dictionary providing a JSON-LD context, such as the
+                    default context of a json_ld_processor.Processor.
+        buffer_size -- the number of bytes buffered before output is written to stream.
+        '''
+        TripleWriter.__init__(self, stream, buffer_size)
+        self.__namespaces = []
+        if prefixes:
+            for prefix in sorted(prefixes.keys()):
+                iri = prefixes[prefix]
+                if namespace_prefix_pattern.match(prefix) and type(iri).__name__ in ['str', 'unicode'] and iri[-1:] in ['/', '#']:
+                    self.__namespaces.append((prefix, iri))
+        # longest namespace IRIs first, so that the most specific prefix wins
+        self.__by_length = sorted(self.__namespaces, key=lambda ns: len(ns[1]), reverse=True)
+        self.__subj = None
+        self.__prop = None
+
+    def header(self):
+        return "".join(["@prefix %s: <%s> .\n" % (prefix, iri.encode('utf-8')) for (prefix, iri) in self.__namespaces]) + (self.__namespaces and "\n" or "")
+
+    def footer(self):
+        if self.__subj is not None:
+            return " .\n"
+        return ""
+
+    def compact(self, iri):
+        '''
+        Returns the Turtle form of an IRI, as a prefixed name where possible.
+        '''
+        for (prefix, namespace) in self.__by_length:
+            if iri.startswith(namespace) and local_name_pattern.match(iri[len(namespace):]):
+                return (prefix + ":" + iri[len(namespace):]).encode('utf-8')
+        return "<" + iri.encode('utf-8') + ">"
+
+    def __resource(self, value):
+        if bnode_pattern.match(value):
+            return value.encode('utf-8')
+        return self.compact(value)
+
+    def __object(self, triple):
+        if triple["objtype"] == "resource":
+            return self.__resource(triple["obj"])
+        literal = '"%s"' % escape_literal(triple["obj"]).encode('utf-8')
+        if triple.has_key("lang"):
+            return literal + "@" + triple["lang"].encode('utf-8')
+        elif triple.has_key("datatype") and triple["datatype"] != XSD_STRING:
+            return literal + "^^" + self.compact(triple["datatype"])
+        else:
+            return literal
+
+    def serialize(self, triple):
+        subj = triple["subj"]
+        prop = triple["prop"]
+        obj = self.__object(triple)
+        if subj == self.__subj and prop == self.__prop:
+            return " ,\n        " + obj
+        if prop == RDF_TYPE:
+            predicate = "a"
+        else:
+            predicate = self.compact(prop)
+        self.__prop = prop
+        if subj == self.__subj:
+            return " ;\n    " + predicate + " " + obj
+        if self.__subj is None:
+            separator = ""
+        else:
+            separator = " .\n"
+        self.__subj = subj
+        return separator + self.__resource(subj) + " " + predicate + " " + obj
+
+class BinaryWriter(TripleWriter):
+    '''
+    Serializes triples in a compact binary format.
+
+    The format starts with a magic number and is followed by a sequence of records,
+    each starting with a one-byte tag. Every distinct term (IRI, blank node, literal
+    value, datatype or language tag) is written once, as a term record holding its
+    length-prefixed UTF-8 bytes, and is thereafter referenced by its id. Triple records
+    hold the ids of the subject, property and object and, for literals, of the datatype
+    and language tag (0 if absent). Lengths and ids are fixed-width 32-bit integers, so
+    that records are decoded with a single struct.unpack_from() call. Before the term
+    dictionary could exceed max_terms entries, a reset record is written and the
+    dictionary starts over, bounding the memory needed by both writer and reader.
+    '''
+
+    def __init__(self, stream, buffer_size=65536, max_terms=1000000):
+        TripleWriter.__init__(self, stream, buffer_size)
+        self.max_terms = max_terms
+        self.__terms = {}
+
+    def header(self):
+        return BINARY_MAGIC
+
+    def __term(self, term, out):
+        if term is None:
+            return 0
+        id = self.__terms.get(term)
+        if id is None:
+            id = len(self.__terms) + 1
+            self.__terms[term] = id
+            data = term.encode('utf-8')
+            out.append(TERM_HEADER.pack(TERM_RECORD, len(data)))
+            out.append(data)
+        return id
+
+    def serialize(self, triple):
+        out = []
+        if len(self.__terms) + 5 > self.max_terms: # a triple may add up to five terms
+            self.__terms = {}
+            out.append(chr(RESET_RECORD))
+        s = self.__term(triple["subj"], out)
+        p = self.__term(triple["prop"], out)
+        o = self.__term(triple["obj"], out)
+        if triple["objtype"] == "resource":
+            out.append(RESOURCE_TRIPLE.pack(RESOURCE_RECORD, s, p, o))
+        else:
+            d = self.__term(triple.get("datatype"), out)
+            l = self.__term(triple.get("lang"), out)
+            out.append(LITERAL_TRIPLE.pack(LITERAL_RECORD, s, p, o, d, l))
+        return b"".join(out)
+
+def read_binary_triples(stream, block_size=1048576):
+    '''
+    A generator that yields the triples serialized by a BinaryWriter to stream, reading
+    it block_size bytes at a time, so that memory use does not grow with its size.
+    '''
+    if stream.read(len(BINARY_MAGIC)) != BINARY_MAGIC:
+        raise Exception("Not a binary triple stream")
+    (term_header, resource_triple, literal_triple) = (TERM_HEADER, RESOURCE_TRIPLE, LITERAL_TRIPLE)
+    (term_tag, resource_tag, literal_tag, reset_tag) = [ chr(tag) for tag in (TERM_RECORD, RESOURCE_RECORD, LITERAL_RECORD, RESET_RECORD) ]
+    terms = [None]
+    data = b""
+    i = 0
+    while True:
+        block = stream.read(block_size)
+        if not block:
+            if i < len(data):
+                raise Exception("Truncated binary triple stream")
+            return
+        data = data[i:] + block # the start of a record split between blocks, and the next block
+        i = 0
+        end = len(data)
+        while i < end:
+            tag = data[i]
+            if tag == resource_tag:
+                if i + 13 > end:
+                    break # read the rest of the record
+                (t, s, p, o) = resource_triple.unpack_from(data, i)
+                i += 13
+                yield { "subj": terms[s], "prop": terms[p], "objtype": "resource", "obj": terms[o] }
+            elif tag == literal_tag:
+                if i + 21 > end:
+                    break
+                (t, s, p, o, d, l) = literal_triple.unpack_from(data, i)
+                i += 21
+                triple = { "subj": terms[s], "prop": terms[p], "objtype": "literal", "obj": terms[o] }
+                if d:
+                    triple["datatype"] = terms[d]
+                if l:
+                    triple["lang"] = terms[l]
+                yield triple
+            elif tag == term_tag:
+                if i + 5 > end:
+                    break
+                n = term_header.unpack_from(data, i)[1]
+                if i + 5 + n > end:
+                    break
+                terms.append(data[i + 5:i + 5 + n].decode('utf-8'))
+                i += 5 + n
+            elif tag == reset_tag:
+                terms = [None]
+                i += 1
+            else:
+                raise Exception("Unknown record tag %d at offset %d" % (ord(tag), i))
+
+WRITERS = {
+    "ntriples": NTriplesWriter,
+    "nquads": NQuadsWriter,
+    "turtle": TurtleWriter,
+    "binary": BinaryWriter
+}
@@ -0,0 +1,343 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+'''
+A local HTTP service converting JSON-LD documents to triples.
+
+A JSON-LD document POSTed to the service is deserialized in a pool of worker processes,
+each with its own json_ld_processor.Processor, and the triples, serialized by the worker
+in the format given by the "format" query parameter (ntriples by default, or nquads,
+turtle or binary), are sent back with chunked transfer encoding. Connections are kept
+alive between requests. At most processes + max_queue conversions are admitted at a
+time, each until its worker has finished, even if the response has already timed out;
+further requests are shed with a 503 response before their body is read. GET /metrics
+reports request counts, latency percentiles and triples per second as JSON.
+
+Usage:
+$ ./json_ld_server.py --port 8080 --processes 4
+$ curl --data-binary @../test/json_ld_org_landing_page_example.json http://localhost:8080/
+<http://example.org/people#john> <http://www.w3.org/1999/02/22-rdf-syntax-ns#type> <http://xmlns.com/foaf/0.1/Person> .
+<http://example.org/people#john> <http://xmlns.com/foaf/0.1/name> "John Lennon" .
+'''
+
+import io, json, time, pickle, threading, collections, multiprocessing
+import json_ld_processor as jlp, json_ld_to_ntriples as jlt
+try:
+    import BaseHTTPServer, SocketServer, urlparse
+except ImportError:
+    import http.server as BaseHTTPServer, socketserver as SocketServer, urllib.parse as urlparse
+
+CONTENT_TYPES = {
+    "ntriples": "application/n-triples",
+    "nquads": "application/n-quads",
+    "turtle": "text/turtle",
+    "binary": "application/octet-stream"
+}
+
+_processor = None
+
+def _initialize(options):
+    '''
+    Creates the processor of a worker process.
+    '''
+    global _processor
+    _processor = jlp.Processor(**options)
+
+def _convert(doc, format):
+    '''
+    Returns a (serialized triples, number of triples, exception or None) tuple for a document,
+    in a worker process. Exceptions are returned rather than raised, so that the service is
+    notified of the end of every conversion; one that cannot be pickled back to the service
+    is replaced by an Exception with the same message.
+    '''
+    try:
+        output = io.BytesIO()
+        count = jlt.json_ld_to_writer(doc, format=format, stream=output, processor=_processor)
+        return (output.getvalue(), count, None)
+    except Exception as e:
+        try:
+            pickle.loads(pickle.dumps(e, pickle.HIGHEST_PROTOCOL))
+        except Exception:
+            e = Exception("%s: %s" % (type(e).__name__, e))
+        return (None, 0, e)
+
+class Metrics(object):
+    '''
+    Collects the request counts, latencies and triples of a service.
+    '''
+
+    def __init__(self, max_samples=10000):
+        '''
+        Keyword arguments:
+        max_samples -- the number of most recent latencies the percentiles are computed from.
+        '''
+        self.started = time.time()
+        self.requests = 0
+        self.rejected = 0
+        self.errors = 0
+        self.triples = 0
+        self.__latencies = collections.deque(maxlen=max_samples)
+        self.__lock = threading.Lock()
+
+    def record(self, latency, triples=0, error=False):
+        '''
+        Records a completed conversion, its latency in seconds and the number of triples it yielded.
+        '''
+        with self.__lock:
+            self.requests += 1
+            self.triples += triples
+            if error:
+                self.errors += 1
+            self.__latencies.append(latency)
+
+    def reject(self):
+        '''
+        Records a request shed because the queue was full.
+        '''
+        with self.__lock:
+            self.rejected += 1
+
+    def snapshot(self):
+        '''
+        Returns the metrics as a Python dictionary.
+        '''
+        with self.__lock:
+            latencies = sorted(self.__latencies)
+            uptime = time.time() - self.started
+            metrics = {
+                "requests": self.requests,
+                "rejected": self.rejected,
+                "errors": self.errors,
+                "triples": self.triples,
+                "uptime": uptime,
+                "triples_per_second": uptime and self.triples / uptime or 0.0
+            }
+        for (name, q) in [("p50", 0.5), ("p90", 0.9), ("p99", 0.99), ("max", 1.0)]:
+            if latencies:
+                metrics["latency_" + name] = latencies[min(len(latencies) - 1, int(q * len(latencies)))]
+            else:
+                metrics["latency_" + name] = None
+        return metrics
+
+class ConversionService(object):
+    '''
+    Defines the conversion service behind the HTTP server: a process pool, its admission
+    control and its metrics.
+    '''
+
+    def __init__(self, processes=None, max_queue=16, timeout=60, chunk_size=65536, max_request_bytes=64 * 1024 * 1024, **options):
+        '''
+        Creates a conversion service.
+
+        Keyword arguments:
+        processes -- the number of worker processes; by default, the number of CPUs.
+        max_queue -- the number of conversions admitted beyond those running in the workers.
+        timeout -- the number of seconds a conversion may take before a 504 response is sent.
+        chunk_size -- the size in bytes of the chunks of a response.
+        max_request_bytes -- the maximum size of a request body; larger requests get a 413 response.
+        options -- the keyword arguments used to create the processor of each worker. Unless
+                   a time_budget is given, it is timeout, so that a worker stops converting a
+                   document whose response has timed out.
+        '''
+        self.processes = processes or multiprocessing.cpu_count()
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.chunk_size = chunk_size
+        self.max_request_bytes = max_request_bytes
+        if timeout is not None:
+            options.setdefault("time_budget", timeout)
+        self.metrics = Metrics()
+        self.pool = multiprocessing.Pool(self.processes, _initialize, (options,))
+        self.__admitted = 0
+        self.__lock = threading.Lock()
+
+    def admit(self):
+        '''
+        Returns True if a conversion can be admitted, counting it until release() is called,
+        or until its worker finishes if it is passed to convert().
+        '''
+        with self.__lock:
+            if self.__admitted >= self.processes + self.max_queue:
+                return False
+            self.__admitted += 1
+            return True
+
+    def release(self):
+        with self.__lock:
+            self.__admitted -= 1
+
+    def convert(self, doc, format):
+        '''
+        Returns a (serialized triples, number of triples) tuple for a document admitted by admit(),
+        converted by a worker, raising the worker's exception if the conversion failed, or a
+        multiprocessing.TimeoutError if it took longer than timeout. The admission is released
+        when the worker finishes.
+        '''
+        try:
+            result = self.pool.apply_async(_convert, (doc, format), callback=lambda result: self.release())
+        except:
+            self.release()
+            raise
+        try:
+            (output, count, error) = result.get(self.timeout)
+        except multiprocessing.TimeoutError:
+            raise # the worker is still converting, and releases the admission when it finishes
+        except:
+            self.release() # the worker failed to return a result, so the callback was not called
+            raise
+        if error is not None:
+            raise error
+        return (output, count)
+
+    def close(self):
+        self.pool.terminate()
+        self.pool.join()
+
+class ConversionRequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    '''
+    Handles the requests of a ConversionServer.
+    '''
+
+    protocol_version = "HTTP/1.1" # keeps connections alive between requests
+
+    def do_GET(self):
+        path = urlparse.urlparse(self.path).path
+        if path == "/metrics":
+            self.__send(200, json.dumps(self.server.service.metrics.snapshot(), sort_keys=True), "application/json")
+        elif path == "/health":
+            self.__send(200, "ok\n", "text/plain")
+        else:
+            self.__send(404, "Not found\n", "text/plain")
+
+    def do_POST(self):
+        query = urlparse.parse_qs(urlparse.urlparse(self.path).query)
+        format = query.get("format", ["ntriples"])[0]
+        service = self.server.service
+        #
+        # Requests are rejected before their body is read, closing the connection since the
+        # unread body would otherwise be taken for the next request
+        #
+        if format not in CONTENT_TYPES:
+            self.__send(400, "Unknown output format: %s\n" % (format), "text/plain", close=True)
+            return
+        length = self.headers.get("Content-Length")
+        if length is None:
+            self.__send(411, "A Content-Length is required\n", "text/plain", close=True)
+            return
+        try:
+            length = int(length)
+        except ValueError:
+            length = -1
+        if length < 0:
+            self.__send(400, "Invalid Content-Length\n", "text/plain", close=True)
+            return
+        if length > service.max_request_bytes:
+            self.__send(413, "The document is larger than %d bytes\n" % (service.max_request_bytes), "text/plain", close=True)
+            return
+        if not service.admit():
+            service.metrics.reject()
+            self.__send(503, "The service is overloaded\n", "text/plain", { "Retry-After": "1" }, close=True)
+            return
+        converting = False # until then, the admission is released here
+        start = time.time()
+        try:
+            doc = self.rfile.read(length)
+            converting = True
+            (output, count) = service.convert(doc, format)
+        except multiprocessing.TimeoutError:
+            service.metrics.record(time.time() - start, error=True)
+            self.__send(504, "The conversion timed out\n", "text/plain")
+            return
+        except jlp.LimitExceededError as e:
+            service.metrics.record(time.time() - start, error=True)
+            if e.limit == "time_budget": # the worker gave up as the response timed out
+                self.__send(504, "The conversion timed out\n", "text/plain")
+            else:
+                self.__send(413, json.dumps({ "error": str(e), "limit": e.limit }), "application/json")
+            return
+        except (jlp.ProcessingError, ValueError) as e:
+            service.metrics.record(time.time() - start, error=True)
+            self.__send(400, json.dumps({ "error": str(e) }), "application/json")
+            return
+        except Exception as e:
+            service.metrics.record(time.time() - start, error=True)
+            self.__send(500, json.dumps({ "error": str(e) }), "application/json")
+            return
+        finally:
+            if not converting:
+                service.release()
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPES[format])
+        self.send_header("Transfer-Encoding", "chunked")
+        self.send_header("X-Triples", str(count))
+        self.end_headers()
+        for i in range(0, len(output), service.chunk_size):
+            chunk = output[i:i + service.chunk_size]
+            self.wfile.write(("%x\r\n" % len(chunk)).encode('ascii') + chunk + b"\r\n")
+        self.wfile.write(b"0\r\n\r\n")
+        service.metrics.record(time.time() - start, count)
+
+    def __send(self, status, body, content_type, headers=None, close=False):
+        if type(body).__name__ == 'unicode':
+            body = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name in (headers or {}):
+            self.send_header(name, headers[name])
+        if close:
+            self.send_header("Connection", "close")
+            self.close_connection = 1
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            BaseHTTPServer.BaseHTTPRequestHandler.log_message(self, format, *args)
+
+class ConversionServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    '''
+    Defines a threaded HTTP server in front of a ConversionService; each connection is
+    handled by its own thread, and conversions by the service's worker processes.
+    '''
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, service, quiet=False):
+        '''
+        Creates a conversion server.
+
+        Arguments:
+        address -- a (host, port) tuple; port 0 binds to a free port.
+        service -- the ConversionService handling conversions.
+
+        Keyword arguments:
+        quiet -- if True, requests are not logged.
+        '''
+        BaseHTTPServer.HTTPServer.__init__(self, address, ConversionRequestHandler)
+        self.service = service
+        self.quiet = quiet
+
+if __name__ == "__main__":
+    from optparse import OptionParser
+    parser = OptionParser(usage="usage: %prog [options]")
+    parser.add_option("-H", "--host", dest="host", default="127.0.0.1",
+                      help="address to listen on (default: 127.0.0.1)")
+    parser.add_option("-p", "--port", dest="port", type="int", default=8080,
+                      help="port to listen on (default: 8080)")
+    parser.add_option("-j", "--processes", dest="processes", type="int", default=None,
+                      help="number of worker processes (default: number of CPUs)")
+    parser.add_option("-q", "--max-queue", dest="max_queue", type="int", default=16,
+                      help="number of requests queued before requests are shed (default: 16)")
+    parser.add_option("--lenient", dest="lenient", action="store_true", default=False,
+                      help="skip nodes that cannot be deserialized")
+    (options, args) = parser.parse_args()
+    service = ConversionService(processes=options.processes, max_queue=options.max_queue, lenient=options.lenient)
+    server = ConversionServer((options.host, options.port), service)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+'''
+Hash-sharded N-Triples output for parallel loading.
+
+Triples are partitioned into a fixed number of shards by a stable hash (CRC-32) of a
+key, by default the subject, so that all triples for a subject land in the same shard
+and downstream loaders can process the shards independently. Each shard has its own
+buffered json_ld_serializers.NTriplesWriter, and its output can be rotated into
+numbered part files once it grows past a size limit. A JSON manifest records the files
+and triple counts of each shard.
+'''
+
+import os, json, zlib, json_ld_serializers as jls, json_ld_compression as jlz
+
+class ShardedNTriplesWriter(object):
+    '''
+    Defines a writer that partitions triples into N-Triples shard files.
+    '''
+
+    def __init__(self, directory, shards, key="subj", max_bytes=None, prefix="shard", buffer_size=65536,
+                 compression=None, level=6):
+        '''
+        Creates a sharded writer.
+
+        Arguments:
+        directory -- the directory the shard files and manifest are written to; it is
+                     created if necessary.
+        shards -- the number of shards.
+
+        Keyword arguments:
+        key -- the triple key ("subj", "prop" or "obj") whose value is hashed to choose
+               a shard, or a function returning the value to hash, given a triple.
+        max_bytes -- the size in bytes after which a shard is rotated to a new part file,
+                     or None to write each shard to a single file.
+        prefix -- the prefix of the shard file names.
+        buffer_size -- the number of bytes buffered by each shard before it is written.
+        compression -- "gzip", "bz2" or "xz" to compress the shard files, or None.
+        level -- the compression level, from 0 (fastest) to 9 (smallest).
+
+        The sizes in max_bytes and the manifest are those of the uncompressed N-Triples.
+        '''
+        if shards < 1:
+            raise ValueError("The number of shards must be at least 1")
+        self.directory = directory
+        self.shards = shards
+        if type(key).__name__ in ['str', 'unicode']:
+            self.key = lambda t: t[key]
+            self.__key_name = key
+        else:
+            self.key = key
+            self.__key_name = getattr(key, '__name__', 'custom')
+        self.max_bytes = max_bytes
+        self.prefix = prefix
+        self.buffer_size = buffer_size
+        self.compression = compression
+        self.level = level
+        self.__writers = [None] * shards
+        self.__files = [[] for i in range(shards)]
+        self.__counts = [0] * shards
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def shard(self, triple):
+        '''
+        Returns the shard number of a triple.
+        '''
+        value = self.key(triple)
+        if type(value).__name__ == 'unicode':
+            value = value.encode('utf-8')
+        return (zlib.crc32(value) & 0xffffffff) % self.shards
+
+    def write(self, triple):
+        '''
+        Writes a triple to its shard, rotating the shard's file if it has grown past max_bytes.
+        '''
+        shard = self.shard(triple)
+        writer = self.__writers[shard]
+        if writer is None:
+            writer = self.__open(shard)
+        writer.write(triple)
+        self.__counts[shard] += 1
+        self.__files[shard][-1]["triples"] += 1
+        if self.max_bytes and writer.bytes_written >= self.max_bytes:
+            self.__close(shard)
+
+    def write_all(self, triples):
+        '''
+        Writes each triple in an iterable of triples.
+
+        Returns: the number of triples written.
+        '''
+        count = 0
+        for t in triples:
+            self.write(t)
+            count += 1
+        return count
+
+    def close(self):
+        '''
+        Closes every shard file and writes the manifest.
+
+        Returns: the manifest, as a Python dictionary.
+        '''
+        for shard in range(self.shards):
+            if self.__writers[shard] is not None:
+                self.__close(shard)
+        manifest = {
+            "shards": self.shards,
+            "key": self.__key_name,
+            "triples": sum(self.__counts),
+            "shard_triples": list(self.__counts),
+            "files": [f for files in self.__files for f in files]
+        }
+        with open(os.path.join(self.directory, self.prefix + "-manifest.json"), 'w') as stream:
+            json.dump(manifest, stream, indent=2, sort_keys=True)
+        return manifest
+
+    def __open(self, shard):
+        name = "%s-%05d-%04d.nt%s" % (self.prefix, shard, len(self.__files[shard]), jlz.extension(self.compression))
+        stream = jlz.open_output(os.path.join(self.directory, name), self.compression, self.level)
+        writer = jls.NTriplesWriter(stream, buffer_size=self.buffer_size)
+        self.__writers[shard] = writer
+        self.__files[shard].append({ "shard": shard, "path": name, "triples": 0, "bytes": 0 })
+        return writer
+
+    def __close(self, shard):
+        writer = self.__writers[shard]
+        writer.close()
+        writer.stream.close()
+        self.__files[shard][-1]["bytes"] = writer.bytes_written
+        self.__writers[shard] = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
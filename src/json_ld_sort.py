@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+'''
+Sorting of triples by subject, subject and property, or subject, property and object,
+in bounded memory.
+
+Triples are buffered and sorted in memory up to a limit, beyond which sorted runs are
+spilled to temporary files, either as JSON lines or in a binary encoding (batches of
+triples serialized with the marshal module, which is several times faster to read back),
+and merged with a k-way merge. When there are more runs than can be merged at once,
+runs are merged into longer runs first. The sort is stable: triples with equal keys keep their input order.
+'''
+
+import json, heapq, marshal, tempfile
+
+ORDERS = {
+    "S": lambda t: (t["subj"],),
+    "SP": lambda t: (t["subj"], t["prop"]),
+    "SPO": lambda t: (t["subj"], t["prop"], t["obj"], t.get("datatype") or "", t.get("lang") or "")
+}
+
+class ExternalSorter(object):
+    '''
+    Defines a bounded-memory sort of triples.
+    '''
+
+    def __init__(self, order="S", max_buffered=100000, binary_runs=False, max_runs=64, directory=None):
+        '''
+        Creates a sorter.
+
+        Keyword arguments:
+        order -- "S", "SP" or "SPO", the parts of a triple it is sorted by.
+        max_buffered -- the number of triples sorted in memory before a run is spilled.
+        binary_runs -- if True, runs are spilled in a binary encoding instead of as JSON lines;
+                       it is specific to the version of Python, which is fine for temporary files.
+        max_runs -- the number of runs merged at once.
+        directory -- the directory of the temporary run files, or None for the default.
+        '''
+        if order not in ORDERS:
+            raise ValueError("Unknown sort order: %s" % (order))
+        self.order = order
+        self.key = ORDERS[order]
+        self.max_buffered = max_buffered
+        self.binary_runs = binary_runs
+        self.max_runs = max(2, max_runs)
+        self.directory = directory
+        self.runs_spilled = 0
+
+    def sorted(self, triples):
+        '''
+        A generator that yields an iterable of triples in sorted order.
+        '''
+        key = self.key
+        buffer = []
+        runs = []
+        for t in triples:
+            buffer.append((key(t), len(buffer), t))
+            if len(buffer) >= self.max_buffered:
+                buffer.sort()
+                runs.append(self.__spill(entry[2] for entry in buffer))
+                buffer = []
+                if len(runs) >= self.max_runs: # merge the runs into one longer run
+                    runs = [ self.__spill(self.__merge(runs)) ]
+        buffer.sort()
+        if not runs:
+            for entry in buffer:
+                yield entry[2]
+            return
+        runs.append(self.__spill(entry[2] for entry in buffer))
+        for t in self.__merge(runs):
+            yield t
+
+    def __merge(self, runs):
+        '''
+        A generator that yields the triples of sorted runs in sorted order, closing the runs.
+        Ties are broken by run, then by position in the run, so the merge is stable.
+        '''
+        for entry in heapq.merge(*[ self.__entries(run, n) for (n, run) in enumerate(runs) ]):
+            yield entry[3]
+
+    def __entries(self, run, n):
+        key = self.key
+        try:
+            if self.binary_runs:
+                triples = self.__binary_triples(run)
+            else:
+                triples = (json.loads(line) for line in run)
+            for (seq, t) in enumerate(triples):
+                yield (key(t), n, seq, t)
+        finally:
+            run.close()
+
+    def __binary_triples(self, run):
+        while True:
+            try:
+                batch = marshal.load(run)
+            except EOFError:
+                return
+            for t in batch:
+                yield t
+
+    def __spill(self, triples):
+        run = tempfile.TemporaryFile(dir=self.directory)
+        if self.binary_runs:
+            batch = []
+            for t in triples:
+                if type(t).__name__ != 'dict':
+                    t = t.copy() # e.g. a LazyLiteralTriple, which marshal cannot serialize
+                batch.append(t)
+                if len(batch) >= 1024:
+                    marshal.dump(batch, run)
+                    batch = []
+            if batch:
+                marshal.dump(batch, run)
+        else:
+            for t in triples:
+                if type(t).__name__ != 'dict':
+                    t = t.copy()
+                run.write(json.dumps(t) + "\n")
+        run.seek(0)
+        self.runs_spilled += 1
+        return run
+
+def sorted_triples(triples, order="S", max_buffered=100000, binary_runs=False, directory=None):
+    '''
+    A generator that yields an iterable of triples sorted by order ("S", "SP" or "SPO"),
+    using an ExternalSorter.
+    '''
+    return ExternalSorter(order, max_buffered, binary_runs, directory=directory).sorted(triples)
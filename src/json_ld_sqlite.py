@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+'''
+A bulk loader of triples generated by json_ld_processor.Processor into SQLite.
+
+Triples are stored in a normalized schema:
+
+    terms   (id INTEGER PRIMARY KEY, kind INTEGER, value TEXT, datatype TEXT, lang TEXT)
+    triples (subj INTEGER, prop INTEGER, obj INTEGER)
+
+where kind is RESOURCE_TERM for IRIs and blank nodes, and LITERAL_TERM for literals,
+and the columns of triples are ids of terms. Term ids are assigned in memory, new terms
+and triples are inserted in executemany() batches inside large transactions, with
+pragmas that trade durability for speed while loading (the connection's journal_mode
+and synchronous settings are restored afterwards), and the indexes are only built
+when the loader is closed. If loading fails inside a with block, the current transaction
+is rolled back instead of committed.
+'''
+
+import sqlite3
+
+RESOURCE_TERM = 1
+LITERAL_TERM = 2
+
+SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS terms (id INTEGER PRIMARY KEY, kind INTEGER NOT NULL, value TEXT NOT NULL, datatype TEXT, lang TEXT)",
+    "CREATE TABLE IF NOT EXISTS triples (subj INTEGER NOT NULL, prop INTEGER NOT NULL, obj INTEGER NOT NULL)"
+]
+
+INDEXES = {
+    "terms_value": "CREATE INDEX terms_value ON terms (value)",
+    "triples_spo": "CREATE INDEX triples_spo ON triples (subj, prop, obj)",
+    "triples_po": "CREATE INDEX triples_po ON triples (prop, obj)",
+    "triples_o": "CREATE INDEX triples_o ON triples (obj)"
+}
+
+LOAD_PRAGMAS = [
+    "PRAGMA synchronous = OFF",
+    "PRAGMA journal_mode = MEMORY",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -65536"
+]
+
+class SQLiteWriter(object):
+    '''
+    Defines a sink that loads triples into a SQLite database.
+    '''
+
+    def __init__(self, database, batch_size=10000, transaction_size=500000, indexes=True):
+        '''
+        Creates a SQLite loader, creating the schema if necessary. Loading into a database
+        that already holds triples appends to them.
+
+        Arguments:
+        database -- the path of a SQLite database, or an open sqlite3.Connection, whose
+                    isolation_level, journal_mode and synchronous settings are restored
+                    when the loader is closed.
+
+        Keyword arguments:
+        batch_size -- the number of triples inserted by each executemany() batch.
+        transaction_size -- the number of triples inserted by each transaction.
+        indexes -- if True, the indexes are dropped while loading and built on close().
+        '''
+        if type(database).__name__ in ['str', 'unicode']:
+            self.connection = sqlite3.connect(database)
+            self.__own_connection = True
+        else:
+            self.connection = database
+            self.__own_connection = False
+        self.__isolation_level = self.connection.isolation_level
+        self.connection.isolation_level = None # transactions are begun and committed explicitly
+        self.batch_size = batch_size
+        self.transaction_size = transaction_size
+        self.indexes = indexes
+        self.triples_written = 0
+        self.terms_written = 0
+        self.__terms = {}
+        self.__new_terms = []
+        self.__triples = []
+        self.__uncommitted = 0
+        self.__closed = False
+        cursor = self.connection.cursor()
+        self.__pragmas = [ "PRAGMA %s = %s" % (name, cursor.execute("PRAGMA " + name).fetchone()[0]) for name in ["journal_mode", "synchronous"] ]
+        for pragma in LOAD_PRAGMAS:
+            cursor.execute(pragma)
+        for statement in SCHEMA:
+            cursor.execute(statement)
+        if indexes:
+            for name in INDEXES:
+                cursor.execute("DROP INDEX IF EXISTS " + name)
+        for (id, kind, value, datatype, lang) in cursor.execute("SELECT id, kind, value, datatype, lang FROM terms"):
+            self.__terms[(kind, value, datatype, lang)] = id
+        self.__next_id = cursor.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM terms").fetchone()[0]
+        cursor.execute("BEGIN")
+
+    def write(self, triple):
+        '''
+        Adds a triple to the current batch, inserting the batch once it is full.
+        '''
+        subj = self.__term((RESOURCE_TERM, triple["subj"], None, None))
+        prop = self.__term((RESOURCE_TERM, triple["prop"], None, None))
+        if triple["objtype"] == "resource":
+            obj = self.__term((RESOURCE_TERM, triple["obj"], None, None))
+        else:
+            obj = self.__term((LITERAL_TERM, triple["obj"], triple.get("datatype"), triple.get("lang")))
+        self.__triples.append((subj, prop, obj))
+        if len(self.__triples) >= self.batch_size:
+            self.flush()
+
+    def write_all(self, triples):
+        '''
+        Writes each triple in an iterable of triples.
+
+        Returns: the number of triples written.
+        '''
+        count = 0
+        for t in triples:
+            self.write(t)
+            count += 1
+        return count
+
+    def flush(self):
+        '''
+        Inserts the current batch, committing the transaction once it has grown past transaction_size.
+        '''
+        if self.__new_terms:
+            self.connection.executemany("INSERT INTO terms (id, kind, value, datatype, lang) VALUES (?, ?, ?, ?, ?)", self.__new_terms)
+            self.terms_written += len(self.__new_terms)
+            self.__new_terms = []
+        if self.__triples:
+            self.connection.executemany("INSERT INTO triples (subj, prop, obj) VALUES (?, ?, ?)", self.__triples)
+            self.triples_written += len(self.__triples)
+            self.__uncommitted += len(self.__triples)
+            self.__triples = []
+        if self.__uncommitted >= self.transaction_size:
+            self.connection.execute("COMMIT")
+            self.connection.execute("BEGIN")
+            self.__uncommitted = 0
+
+    def close(self):
+        '''
+        Inserts the last batch, commits it, builds the indexes and, if the loader opened the
+        database, closes it.
+        '''
+        if self.__closed:
+            return
+        self.flush()
+        self.__finish("COMMIT")
+
+    def rollback(self):
+        '''
+        Discards the current batch and rolls back the current transaction, then builds the
+        indexes and, if the loader opened the database, closes it. Transactions already
+        committed because they grew past transaction_size are kept.
+        '''
+        if self.__closed:
+            return
+        self.__new_terms = []
+        self.__triples = []
+        self.__finish("ROLLBACK")
+
+    def __finish(self, statement):
+        self.__closed = True
+        self.connection.execute(statement)
+        if self.indexes:
+            for name in sorted(INDEXES):
+                self.connection.execute(INDEXES[name])
+        for pragma in self.__pragmas:
+            self.connection.execute(pragma)
+        if self.__own_connection:
+            self.connection.close()
+        else:
+            self.connection.isolation_level = self.__isolation_level
+
+    def __term(self, key):
+        id = self.__terms.get(key)
+        if id is None:
+            id = self.__next_id
+            self.__next_id += 1
+            self.__terms[key] = id
+            self.__new_terms.append((id,) + key)
+        return id
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.rollback()
+
+def read_sqlite_triples(database):
+    '''
+    A generator that yields the triples loaded into a SQLite database by a SQLiteWriter.
+
+    Arguments:
+    database -- the path of a SQLite database, or an open sqlite3.Connection.
+    '''
+    if type(database).__name__ in ['str', 'unicode']:
+        connection = sqlite3.connect(database)
+    else:
+        connection = database
+    try:
+        rows = connection.execute("SELECT s.value, p.value, o.kind, o.value, o.datatype, o.lang FROM triples "
+                                  "JOIN terms s ON s.id = triples.subj JOIN terms p ON p.id = triples.prop "
+                                  "JOIN terms o ON o.id = triples.obj ORDER BY triples.rowid")
+        for (subj, prop, kind, obj, datatype, lang) in rows:
+            if kind == RESOURCE_TERM:
+                yield { "subj": subj, "prop": prop, "objtype": "resource", "obj": obj }
+            else:
+                triple = { "subj": subj, "prop": prop, "objtype": "literal", "obj": obj }
+                if datatype is not None:
+                    triple["datatype"] = datatype
+                if lang is not None:
+                    triple["lang"] = lang
+                yield triple
+    finally:
+        if connection is not database:
+            connection.close()
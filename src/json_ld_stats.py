@@ -0,0 +1,446 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+'''
+One-pass summary statistics of the triples generated by json_ld_processor.Processor,
+in bounded memory.
+
+A GraphStatistics consumes a stream of triples and keeps fixed-size sketches rather than
+sets of terms: HyperLogLog estimates of the numbers of distinct subjects, predicates and
+objects, a count-min sketch of the number of triples of each predicate, and SpaceSaving
+summaries of the most frequent predicates, datatypes and languages, together with exact
+counts of triples, literals and blank nodes. Sketches with the same dimensions merge
+exactly, so the statistics of a corpus can be computed in several processes and combined,
+and they serialize to JSON for storage or transport.
+
+Usage:
+$ ./json_ld_stats.py -t 1 ../test/json_ld_org_landing_page_example.json
+{"blank_node_ratio": 0.0, "datatypes": [{"error": 0, "iri": "http://www.w3.org/2001/XMLSchema#string", "literals": 1}], "distinct_objects": 2, "distinct_predicates": 2, "distinct_subjects": 1, "languages": [], "literals": 1, "predicates": [{"iri": "http://www.w3.org/1999/02/22-rdf-syntax-ns#type", "triples": 1}], "triples": 2}
+'''
+
+import json, math, base64, struct, hashlib, multiprocessing
+import json_ld_processor as jlp, json_ld_compression as jlz
+
+def _hash(value):
+    '''
+    Returns a 64-bit hash of a string, the same in every process and on every platform.
+    '''
+    if type(value).__name__ == 'unicode':
+        value = value.encode('utf-8')
+    return struct.unpack(">Q", hashlib.md5(value).digest()[:8])[0]
+
+class HyperLogLog(object):
+    '''
+    Estimates the number of distinct values added to it, with a relative standard error of
+    about 1.04 / sqrt(2 ** precision), in 2 ** precision bytes.
+    '''
+
+    def __init__(self, precision=12, registers=None):
+        '''
+        Keyword arguments:
+        precision -- the number of bits of a hash that choose a register, from 4 to 16.
+        registers -- a bytearray of 2 ** precision registers to start from.
+        '''
+        if precision < 4 or precision > 16:
+            raise ValueError("The precision of a HyperLogLog must be from 4 to 16")
+        self.precision = precision
+        self.registers = registers or bytearray(1 << precision)
+        self.__shift = 64 - precision
+        self.__mask = (1 << self.__shift) - 1
+
+    def add(self, value):
+        '''
+        Adds a string value.
+        '''
+        self.add_hash(_hash(value))
+
+    def add_hash(self, h):
+        '''
+        Adds a value by its 64-bit hash.
+        '''
+        index = h >> self.__shift
+        rank = self.__shift - (h & self.__mask).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def estimate(self):
+        '''
+        Returns the estimated number of distinct values added.
+        '''
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum([ 2.0 ** -r for r in self.registers ])
+        zeros = self.registers.count(b"\x00")
+        if estimate <= 2.5 * m and zeros: # small cardinalities are counted by the empty registers
+            estimate = m * math.log(float(m) / zeros)
+        return int(round(estimate))
+
+    def merge(self, other):
+        '''
+        Adds the values added to another HyperLogLog of the same precision.
+        '''
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge HyperLogLogs of precisions %d and %d" % (self.precision, other.precision))
+        self.registers = bytearray([ max(a, b) for (a, b) in zip(self.registers, other.registers) ])
+
+    def to_dict(self):
+        return { "precision": self.precision, "registers": base64.b64encode(bytes(self.registers)) }
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(d["precision"], bytearray(base64.b64decode(d["registers"])))
+
+class CountMinSketch(object):
+    '''
+    Estimates how many times each value was added to it, never underestimating, and
+    overestimating by at most e / width of the total count with probability 1 - exp(-depth).
+    '''
+
+    def __init__(self, width=2048, depth=4, table=None, total=0):
+        '''
+        Keyword arguments:
+        width -- the number of counters in each row.
+        depth -- the number of rows, each with its own hash function.
+        table -- a list of depth lists of width counters to start from.
+        total -- the total count of the values in table.
+        '''
+        self.width = width
+        self.depth = depth
+        self.table = table or [ [0] * width for i in range(depth) ]
+        self.total = total
+
+    def indexes(self, h):
+        '''
+        Returns the counter of each row for a value, by its 64-bit hash.
+        '''
+        (h1, h2) = (h >> 32, (h & 0xffffffff) | 1)
+        return [ (h1 + i * h2) % self.width for i in range(self.depth) ]
+
+    def add(self, value, count=1):
+        self.add_indexes(self.indexes(_hash(value)), count)
+
+    def add_indexes(self, indexes, count=1):
+        '''
+        Adds count to a value, by its counters as returned by indexes().
+        '''
+        for (row, index) in zip(self.table, indexes):
+            row[index] += count
+        self.total += count
+
+    def estimate(self, value):
+        '''
+        Returns the estimated count of a string value.
+        '''
+        return min([ row[index] for (row, index) in zip(self.table, self.indexes(_hash(value))) ])
+
+    def merge(self, other):
+        '''
+        Adds the counts of another CountMinSketch of the same width and depth.
+        '''
+        if (other.width, other.depth) != (self.width, self.depth):
+            raise ValueError("Cannot merge count-min sketches of different dimensions")
+        self.table = [ [ a + b for (a, b) in zip(mine, theirs) ] for (mine, theirs) in zip(self.table, other.table) ]
+        self.total += other.total
+
+    def to_dict(self):
+        return { "width": self.width, "depth": self.depth, "table": self.table, "total": self.total }
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(d["width"], d["depth"], d["table"], d["total"])
+
+class HeavyHitters(object):
+    '''
+    Finds the most frequent values of a stream with the SpaceSaving algorithm, keeping at
+    most size counters. Counts are exact while there are fewer distinct values than counters;
+    otherwise, the count of a value overestimates it by at most its recorded error.
+    '''
+
+    def __init__(self, size=100, counts=None, errors=None):
+        '''
+        Keyword arguments:
+        size -- the number of values counted.
+        counts, errors -- dictionaries of the counts and errors of values to start from.
+        '''
+        self.size = size
+        self.counts = counts or {}
+        self.errors = errors or {}
+
+    def add(self, value, count=1):
+        if value in self.counts:
+            self.counts[value] += count
+        elif len(self.counts) < self.size:
+            self.counts[value] = count
+            self.errors[value] = 0
+        else: # the value replaces the least frequent one, inheriting its count as an error
+            least = min(self.counts, key=self.counts.get)
+            minimum = self.counts.pop(least)
+            del self.errors[least]
+            self.counts[value] = minimum + count
+            self.errors[value] = minimum
+
+    def top(self, count=None):
+        '''
+        Returns a list of (value, count, error) tuples for the most frequent values, most frequent first.
+        '''
+        ranked = sorted(self.counts.items(), key=lambda item: (-item[1], item[0]))[:count]
+        return [ (value, n, self.errors[value]) for (value, n) in ranked ]
+
+    def merge(self, other):
+        '''
+        Adds the values counted by another HeavyHitters, keeping the size most frequent. A value
+        missing from a full summary is assumed to have had the least count in that summary.
+        '''
+        mine = self.__floor()
+        theirs = other.__floor()
+        counts = {}
+        errors = {}
+        for value in set(self.counts) | set(other.counts):
+            counts[value] = self.counts.get(value, mine) + other.counts.get(value, theirs)
+            errors[value] = self.errors.get(value, mine) + other.errors.get(value, theirs)
+        kept = sorted(counts, key=lambda value: (-counts[value], value))[:self.size]
+        self.counts = dict([ (value, counts[value]) for value in kept ])
+        self.errors = dict([ (value, errors[value]) for value in kept ])
+
+    def __floor(self):
+        if len(self.counts) < self.size:
+            return 0
+        return min(self.counts.values())
+
+    def to_dict(self):
+        return { "size": self.size, "top": self.top() }
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(d["size"], dict([ (value, n) for (value, n, error) in d["top"] ]),
+                   dict([ (value, error) for (value, n, error) in d["top"] ]))
+
+class GraphStatistics(object):
+    '''
+    Defines a sink that summarizes the triples written to it in bounded memory.
+    '''
+
+    def __init__(self, precision=12, width=2048, depth=4, size=100):
+        '''
+        Creates empty statistics.
+
+        Keyword arguments:
+        precision -- the precision of the HyperLogLogs of distinct subjects, predicates and objects.
+        width, depth -- the dimensions of the count-min sketch of triples per predicate.
+        size -- the number of predicates, datatypes and languages whose counts are kept.
+
+        Only statistics created with the same arguments can be merged.
+        '''
+        self.triples = 0
+        self.literals = 0
+        self.blank_subjects = 0
+        self.blank_objects = 0
+        self.subjects = HyperLogLog(precision)
+        self.predicates = HyperLogLog(precision)
+        self.objects = HyperLogLog(precision)
+        self.predicate_counts = CountMinSketch(width, depth)
+        self.top_predicates = HeavyHitters(size)
+        self.datatypes = HeavyHitters(size)
+        self.languages = HeavyHitters(size)
+        self.__pending = {} # exact counts of the predicates written since the sketches were last updated
+        self.__last_subject = None
+        self.__last_blank = False
+
+    def write(self, triple):
+        '''
+        Adds a triple to the statistics.
+        '''
+        self.triples += 1
+        subj = triple["subj"]
+        if subj != self.__last_subject: # the triples of a subject are usually consecutive
+            self.__last_subject = subj
+            self.__last_blank = subj.startswith("_:")
+            self.subjects.add(subj)
+        if self.__last_blank:
+            self.blank_subjects += 1
+        prop = triple["prop"]
+        self.__pending[prop] = self.__pending.get(prop, 0) + 1
+        if len(self.__pending) >= 4096:
+            self.__flush()
+        if triple["objtype"] == "resource":
+            obj = triple["obj"]
+            if obj.startswith("_:"):
+                self.blank_objects += 1
+            self.objects.add(u"<%s>" % (obj))
+        else:
+            self.literals += 1
+            datatype = triple.get("datatype")
+            lang = triple.get("lang")
+            if datatype is not None:
+                self.datatypes.add(datatype)
+            if lang is not None:
+                self.languages.add(lang)
+            self.objects.add(u'"%s"^^%s@%s' % (triple["obj"], datatype or "", lang or ""))
+
+    def write_all(self, triples):
+        '''
+        Adds each triple in an iterable of triples.
+
+        Returns: the number of triples added.
+        '''
+        count = 0
+        for t in triples:
+            self.write(t)
+            count += 1
+        return count
+
+    def __flush(self):
+        '''
+        Adds the pending predicate counts to the sketches.
+        '''
+        for (prop, count) in self.__pending.items():
+            h = _hash(prop)
+            self.predicates.add_hash(h)
+            self.predicate_counts.add_indexes(self.predicate_counts.indexes(h), count)
+            self.top_predicates.add(prop, count)
+        self.__pending.clear()
+
+    def predicate_count(self, prop):
+        '''
+        Returns the estimated number of triples with the property prop, an IRI.
+        '''
+        self.__flush()
+        return self.predicate_counts.estimate(prop)
+
+    def merge(self, other):
+        '''
+        Adds the statistics of another GraphStatistics created with the same arguments, e.g.
+        one computed in another process.
+        '''
+        self.__flush()
+        other.__flush()
+        self.triples += other.triples
+        self.literals += other.literals
+        self.blank_subjects += other.blank_subjects
+        self.blank_objects += other.blank_objects
+        for name in ["subjects", "predicates", "objects", "predicate_counts", "top_predicates", "datatypes", "languages"]:
+            getattr(self, name).merge(getattr(other, name))
+
+    def report(self, top=20):
+        '''
+        Returns the statistics as a Python dictionary, with the top most frequent predicates,
+        datatypes and languages.
+        '''
+        self.__flush()
+        resources = 2 * self.triples - self.literals # subjects and resource objects
+        return {
+            "triples": self.triples,
+            "literals": self.literals,
+            "distinct_subjects": self.subjects.estimate(),
+            "distinct_predicates": self.predicates.estimate(),
+            "distinct_objects": self.objects.estimate(),
+            "blank_node_ratio": resources and float(self.blank_subjects + self.blank_objects) / resources or 0.0,
+            "predicates": [ { "iri": value, "triples": self.predicate_counts.estimate(value) }
+                            for (value, n, error) in self.top_predicates.top(top) ],
+            "datatypes": [ { "iri": value, "literals": n, "error": error } for (value, n, error) in self.datatypes.top(top) ],
+            "languages": [ { "lang": value, "literals": n, "error": error } for (value, n, error) in self.languages.top(top) ]
+        }
+
+    def to_dict(self):
+        '''
+        Returns the state of the statistics as a JSON-serializable Python dictionary.
+        '''
+        self.__flush()
+        d = dict([ (name, getattr(self, name)) for name in ["triples", "literals", "blank_subjects", "blank_objects"] ])
+        for name in ["subjects", "predicates", "objects", "predicate_counts", "top_predicates", "datatypes", "languages"]:
+            d[name] = getattr(self, name).to_dict()
+        return d
+
+    @classmethod
+    def from_dict(cls, d):
+        '''
+        Returns the GraphStatistics whose state was returned by to_dict().
+        '''
+        stats = cls(d["subjects"]["precision"], d["predicate_counts"]["width"], d["predicate_counts"]["depth"], d["top_predicates"]["size"])
+        for name in ["triples", "literals", "blank_subjects", "blank_objects"]:
+            setattr(stats, name, d[name])
+        for name in ["subjects", "predicates", "objects"]:
+            setattr(stats, name, HyperLogLog.from_dict(d[name]))
+        stats.predicate_counts = CountMinSketch.from_dict(d["predicate_counts"])
+        for name in ["top_predicates", "datatypes", "languages"]:
+            setattr(stats, name, HeavyHitters.from_dict(d[name]))
+        return stats
+
+    def __getstate__(self):
+        return self.to_dict()
+
+    def __setstate__(self, state):
+        self.__dict__.update(GraphStatistics.from_dict(state).__dict__)
+
+_processor = None
+
+def _initialize(options):
+    '''
+    Creates the processor of a worker process.
+    '''
+    global _processor
+    _processor = jlp.Processor(**options)
+
+def _file_statistics(task):
+    '''
+    Returns the GraphStatistics of the JSON-LD documents in a list of files, in a worker process.
+    '''
+    (paths, sketch) = task
+    stats = GraphStatistics(**sketch)
+    for path in paths:
+        stats.write_all(_processor.triples(jlz.read_document(path)))
+    return stats
+
+def corpus_statistics(paths, processes=None, files_per_task=16, sketch=None, **options):
+    '''
+    Returns the GraphStatistics of the triples of a corpus of (possibly compressed) JSON-LD
+    files, computed in a pool of worker processes and merged.
+
+    Arguments:
+    paths -- an iterable of file paths.
+
+    Keyword arguments:
+    processes -- the number of worker processes; by default, the number of CPUs.
+    files_per_task -- the number of files summarized by each task given to a worker.
+    sketch -- the keyword arguments used to create each GraphStatistics.
+    options -- the keyword arguments used to create the processor of each worker.
+    '''
+    sketch = sketch or {}
+    stats = GraphStatistics(**sketch)
+    pool = multiprocessing.Pool(processes or multiprocessing.cpu_count(), _initialize, (options,))
+    try:
+        for partial in pool.imap_unordered(_file_statistics, _tasks(paths, files_per_task, sketch)):
+            stats.merge(partial)
+    finally:
+        pool.terminate()
+        pool.join()
+    return stats
+
+def _tasks(paths, files_per_task, sketch):
+    batch = []
+    for path in paths:
+        batch.append(path)
+        if len(batch) >= files_per_task:
+            yield (batch, sketch)
+            batch = []
+    if batch:
+        yield (batch, sketch)
+
+if __name__ == "__main__":
+    from optparse import OptionParser
+    parser = OptionParser(usage="usage: %prog [options] FILE...")
+    parser.add_option("-j", "--processes", dest="processes", type="int", default=None,
+                      help="number of worker processes (default: number of CPUs)")
+    parser.add_option("-t", "--top", dest="top", type="int", default=20,
+                      help="number of most frequent predicates, datatypes and languages reported (default: 20)")
+    parser.add_option("--lenient", dest="lenient", action="store_true", default=False,
+                      help="skip nodes that cannot be deserialized")
+    parser.add_option("--state", dest="state", action="store_true", default=False,
+                      help="print the mergeable state of the sketches instead of a report")
+    (options, args) = parser.parse_args()
+    if not args:
+        parser.error("no input files")
+    stats = corpus_statistics(args, processes=options.processes, lenient=options.lenient)
+    if options.state:
+        print json.dumps(stats.to_dict(), sort_keys=True)
+    else:
+        print json.dumps(stats.report(options.top), sort_keys=True)
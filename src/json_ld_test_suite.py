@@ -1,7 +1,8 @@
 #!/usr/bin/python
 # -*- coding: utf-8 -*-
 
-import unittest, json_ld_processor as jlp
+import unittest, io, os, sys, json, time, zlib, pickle, random, shutil, sqlite3, tempfile, threading, subprocess, multiprocessing, httplib, urlparse
+import json_ld_processor as jlp, json_ld_serializers as jls, json_ld_cache as jlc, json_ld_compactor as jlcomp, json_ld_sharding as jlsh, json_ld_pool as jlpool, json_ld_sqlite as jlsql, json_ld_server as jlsrv, json_ld_to_ntriples as jlt, json_ld_compression as jlz, json_ld_sort as jlsort, json_ld_stats as jlst
 from json_ld_test_utilities import graph_equal
 
 class TestProcessor(unittest.TestCase):
@@ -653,5 +654,1004 @@ class TestProcessor(unittest.TestCase):
         self.assertTrue(graph_equal(target_graph, generated_graph))
 
 
+class TestLazyLiterals(unittest.TestCase):
+    '''
+    Defines unit tests for processors created with lazy_literals=True.
+    '''
+
+    doc = '{ "#": {"#base": "http://www.t4gm.info/concept/"}, "@": "<t4gm-4-dash-h-clubs>", "skos:prefLabel": "4-H clubs@en", "dc:created": "2010-10-18T12:00:00Z", "dc:extent": "42^^xsd:integer", "skos:note": "escaped \\\\:colon", "foaf:age": [40, 2.5, true], "skos:related": ["<t4gm-children>"] }'
+
+    def test_same_triples_as_eager(self):
+        eager_graph = [ t for t in jlp.Processor().triples(self.doc) ]
+        lazy_graph = [ t for t in jlp.Processor(lazy_literals=True).triples(self.doc) ]
+        self.assertEqual(eager_graph, lazy_graph)
+        self.assertEqual([ t.has_key("lang") for t in eager_graph ], [ t.has_key("lang") for t in lazy_graph ])
+
+    def test_literal_errors_are_deferred(self):
+        doc = '{ "@": "<http://example.org/people#john>", "foaf:age": "40^^unknown:integer", "name": "John Lennon" }'
+        graph = [ t for t in jlp.Processor(lazy_literals=True).triples(doc) ]
+        self.assertEqual(2, len(graph))
+        names = [ t for t in graph if t["prop"] == "http://xmlns.com/foaf/0.1/name" ]
+        self.assertEqual(u"John Lennon", names[0]["obj"])
+        ages = [ t for t in graph if t["prop"] == "http://xmlns.com/foaf/0.1/age" ]
+        self.assertRaises(Exception, lambda: ages[0]["datatype"])
+
+    def test_copies_match_eager(self):
+        eager_graph = [ t for t in jlp.Processor().triples(self.doc) ]
+        lazy_graph = [ t for t in jlp.Processor(lazy_literals=True).triples(self.doc) ]
+        copies = [ dict(t) for t in lazy_graph ]
+        updated = []
+        for t in jlp.Processor(lazy_literals=True).triples(self.doc):
+            d = {}
+            d.update(t)
+            updated.append(d)
+        for graph in (copies, updated, [ json.loads(json.dumps(t.copy())) for t in lazy_graph ], [ pickle.loads(pickle.dumps(t)) for t in lazy_graph ]):
+            self.assertEqual(eager_graph, graph)
+            self.assertTrue(all([ type(t).__name__ == 'dict' for t in graph ]))
+        self.assertEqual(eager_graph, [ t.resolve() if isinstance(t, jlp.LazyLiteralTriple) else t for t in lazy_graph ])
+
+    def test_lenient_is_rejected(self):
+        self.assertRaises(ValueError, jlp.Processor, lazy_literals=True, lenient=True)
+
+class TestLenientMode(unittest.TestCase):
+    '''
+    Defines unit tests for processors created with lenient=True.
+    '''
+
+    doc = '[ { "@": "<http://example.org/people#john>", "name": "John Lennon", "bad:nick": "Johnny", "foaf:knows": [ { "@": "bad:paul", "name": "Paul" }, "<http://example.org/people#ringo>", "bad:george" ] }, { "#": "not a context", "name": "Yoko" }, { "@": "<http://example.org/people#ringo>", "foaf:age": "40^^bad:integer" } ]'
+
+    def test_strict_mode_raises(self):
+        self.assertRaises(jlp.ProcessingError, lambda: [ t for t in jlp.Processor().triples(self.doc) ])
+
+    def test_bad_nodes_are_skipped_and_reported(self):
+        p = jlp.Processor(lenient=True)
+        generated_graph = [ t for t in p.triples(self.doc) ]
+        target_graph = [{'objtype': 'literal', 'datatype': 'http://www.w3.org/2001/XMLSchema#string', 'obj': u'John Lennon', 'subj': u'http://example.org/people#john', 'prop': 'http://xmlns.com/foaf/0.1/name'}, {'objtype': 'resource', 'subj': u'http://example.org/people#john', 'obj': u'http://example.org/people#ringo', 'prop': u'http://xmlns.com/foaf/0.1/knows'}]
+        self.assertTrue(graph_equal(target_graph, generated_graph))
+        self.assertEqual({"unknown_prefix": 4, "invalid_context": 1}, p.report.counts)
+        errors = dict([ (e["path"], e) for e in p.report.errors ])
+        self.assertEqual(set(["$[0].bad:nick", "$[0].foaf:knows[0].@", "$[0].foaf:knows[2]", "$[1].#", "$[2].foaf:age"]), set(errors.keys()))
+        self.assertEqual(u"bad:george", errors["$[0].foaf:knows[2]"]["value"])
+
+    def test_error_records_are_bounded(self):
+        p = jlp.Processor(lenient=True, max_error_records=2)
+        [ t for t in p.triples(self.doc) ]
+        self.assertEqual(2, len(p.report.errors))
+        self.assertEqual(5, p.report.total())
+
+    def test_skipped_subject_objects(self):
+        p = jlp.Processor(lenient=True)
+        doc = '[ { "@": { "#": "bad", "name": "x" }, "name": "y" }, { "@": { "@": "bad:x" }, "name": "y" }, { "@": "<http://example.org/people#john>", "foaf:knows": { "@": { "@": "bad:x" } } } ]'
+        self.assertEqual([], [ t for t in p.triples(doc) ])
+        self.assertEqual({"invalid_context": 1, "unknown_prefix": 2}, p.report.counts)
+        self.assertEqual(set(["$[0].@.#", "$[1].@.@", "$[2].foaf:knows.@.@"]), set([ e["path"] for e in p.report.errors ]))
+
+class TestResourceLimits(unittest.TestCase):
+    '''
+    Defines unit tests for the resource limits of a Processor.
+    '''
+
+    doc = '{ "#": {"ex": "http://example.org/"}, "@": "<http://example.org/people#john>", "foaf:knows": { "#": {"ex2": "http://example.org/2/"}, "name": "Paul", "foaf:knows": { "name": "George" } }, "foaf:nick": ["Johnny", "J"] }'
+
+    def assertLimitExceeded(self, limit, p, doc):
+        try:
+            [ t for t in p.triples(doc) ]
+        except jlp.LimitExceededError as e:
+            self.assertEqual(limit, e.limit)
+        else:
+            self.fail("%s was not exceeded" % (limit))
+
+    def test_within_limits(self):
+        p = jlp.Processor(max_depth=2, max_bytes=len(self.doc), max_triples=6, max_context_merges=2, time_budget=60)
+        self.assertEqual(6, len([ t for t in p.triples(self.doc) ]))
+
+    def test_limits_exceeded(self):
+        self.assertLimitExceeded("max_depth", jlp.Processor(max_depth=1), self.doc)
+        self.assertLimitExceeded("max_bytes", jlp.Processor(max_bytes=100), self.doc)
+        self.assertLimitExceeded("max_triples", jlp.Processor(max_triples=5), self.doc)
+        self.assertLimitExceeded("max_context_merges", jlp.Processor(max_context_merges=1), self.doc)
+        self.assertLimitExceeded("time_budget", jlp.Processor(time_budget=0.0001), '[' + ', '.join([ '{ "name": "Person %d" }' % i for i in range(5000) ]) + ']')
+
+    def test_limits_are_not_skipped_by_lenient_processors(self):
+        self.assertLimitExceeded("max_depth", jlp.Processor(max_depth=1, lenient=True), self.doc)
+
+    def test_deep_document(self):
+        self.assertLimitExceeded("max_depth", jlp.Processor(max_depth=100), '[' * 100000 + ']' * 100000)
+
+class TestFilters(unittest.TestCase):
+    '''
+    Defines unit tests for the predicate and subject filters of Processor.triples().
+    '''
+
+    doc = '{ "@": "<http://example.org/people#john>", "a": "foaf:Person", "name": "John Lennon", "foaf:knows": { "@": "<http://example.org/people#paul>", "name": "Paul McCartney", "foaf:knows": ["<http://example.org/people#ringo>", { "name": "George Harrison" }] } }'
+
+    def filtered(self, triples, predicates=None, subjects=None):
+        return [ t for t in triples if (predicates is None or t["prop"] in predicates) and (subjects is None or t["subj"] in subjects) ]
+
+    def test_predicates(self):
+        p = jlp.Processor()
+        names = [ t for t in p.triples(self.doc, predicates=["name"]) ]
+        self.assertEqual(3, len(names))
+        self.assertTrue(graph_equal(names, self.filtered(p.triples(self.doc), ["http://xmlns.com/foaf/0.1/name"])))
+        knows = [ t for t in p.triples(self.doc, predicates=["foaf:knows", "http://www.w3.org/1999/02/22-rdf-syntax-ns#type"]) ]
+        self.assertTrue(graph_equal(knows, self.filtered(p.triples(self.doc), ["http://xmlns.com/foaf/0.1/knows", "http://www.w3.org/1999/02/22-rdf-syntax-ns#type"])))
+        self.assertEqual(4, len(knows))
+        self.assertEqual([ t for t in p.triples(self.doc, predicates=["a"]) ], [ t for t in p.triples(self.doc, predicates=["http://www.w3.org/1999/02/22-rdf-syntax-ns#type"]) ])
+
+    def test_subjects(self):
+        p = jlp.Processor()
+        paul = [ t for t in p.triples(self.doc, subjects=["http://example.org/people#paul"]) ]
+        self.assertEqual(3, len(paul))
+        self.assertTrue(graph_equal(paul, self.filtered(p.triples(self.doc), subjects=["http://example.org/people#paul"])))
+        both = [ t for t in p.triples(self.doc, predicates=["name"], subjects=["http://example.org/people#john"]) ]
+        self.assertEqual([("http://example.org/people#john", "John Lennon")], [ (t["subj"], t["obj"]) for t in both ])
+        self.assertEqual([], [ t for t in p.triples(self.doc, subjects=[]) ])
+
+    def test_filtered_subjects_are_validated(self):
+        doc = '[ { "@": "<http://example.org/people#john>", "bad:nick": "Johnny" }, { "@": "<http://example.org/people#paul>", "name": "Paul" } ]'
+        paul = ["http://example.org/people#paul"]
+        self.assertRaises(jlp.ProcessingError, lambda: [ t for t in jlp.Processor().triples(doc) ])
+        self.assertRaises(jlp.ProcessingError, lambda: [ t for t in jlp.Processor().triples(doc, subjects=paul) ])
+        p = jlp.Processor(lenient=True)
+        self.assertEqual(1, len([ t for t in p.triples(doc, subjects=paul) ]))
+        self.assertEqual({ "unknown_prefix": 1 }, p.report.counts)
+
+class TestCursor(unittest.TestCase):
+    '''
+    Defines unit tests for resuming the triples of a document from a TripleCursor checkpoint.
+    '''
+
+    doc = '[' + ', '.join([ '{ "name": "Person %d", "foaf:knows": [{ "name": "Friend %d" }, "<http://example.org/people#p%d>"] }' % (i, i, i) for i in range(10) ]) + ']'
+
+    def test_pagination(self):
+        p = jlp.Processor()
+        expected = [ t for t in p.cursor(self.doc) ]
+        self.assertEqual(40, len(expected))
+        checkpoint = None
+        pages = []
+        while True:
+            cursor = p.cursor(self.doc, json.loads(json.dumps(checkpoint)))
+            page = cursor.take(7)
+            if not page:
+                break
+            pages.extend(page)
+            checkpoint = cursor.checkpoint()
+        self.assertEqual(40, len(pages))
+        self.assertEqual(40, checkpoint["triples"])
+        self.assertEqual(20, len(set([ t["subj"] for t in pages ])))
+        self.assertEqual(sorted([ t["obj"] for t in expected if not t["obj"].startswith("_:") ]), sorted([ t["obj"] for t in pages if not t["obj"].startswith("_:") ]))
+        # blank nodes stay consistent across pages: each friend is known by exactly one subject
+        friends = dict([ (t["subj"], t["obj"]) for t in pages if t["prop"] == "http://xmlns.com/foaf/0.1/name" ])
+        knows = [ t["obj"] for t in pages if t["prop"] == "http://xmlns.com/foaf/0.1/knows" and t["objtype"] == "resource" and t["obj"].startswith("_:") ]
+        self.assertEqual(10, len(knows))
+        self.assertTrue(all([ friends[bnode].startswith("Friend") for bnode in knows ]))
+
+    def test_resume_object(self):
+        p = jlp.Processor()
+        doc = '{ "@": "<http://example.org/people#john>", "name": "John Lennon", "foaf:knows": { "name": "Paul" } }'
+        cursor = p.cursor(doc)
+        first = cursor.take(2)
+        rest = [ t for t in p.cursor(doc, cursor.checkpoint()) ]
+        self.assertEqual(1, len(rest))
+        self.assertEqual(3, len(set([ (t["subj"], t["prop"], t["obj"]) for t in first + rest ])))
+
+    def test_paginate_object(self):
+        p = jlp.Processor()
+        doc = json.dumps({ "@": "<http://example.org/people#john>", "foaf:knows": json.loads(self.doc) })
+        start = p.cursor(doc).checkpoint()
+        expected = [ t for t in p.cursor(doc, start) ]
+        checkpoint = start
+        pages = []
+        while True:
+            cursor = p.cursor(doc, json.loads(json.dumps(checkpoint)))
+            page = cursor.take(3)
+            if not page:
+                break
+            pages.extend(page)
+            checkpoint = cursor.checkpoint()
+            if len(pages) < 50: # the position is inside the single top-level element
+                self.assertEqual((0, len(pages)), (checkpoint["element"], checkpoint["offset"]))
+        self.assertEqual(50, len(pages))
+        self.assertEqual(expected, pages)
+
+    def test_invalid_checkpoints(self):
+        p = jlp.Processor()
+        checkpoint = p.cursor(self.doc).checkpoint()
+        self.assertRaises(ValueError, p.cursor, '{ "name": "John Lennon" }', checkpoint)
+        self.assertRaises(ValueError, jlp.Processor(context={ "name": "http://xmlns.com/foaf/0.1/name" }).cursor, self.doc, checkpoint)
+
+    def test_filters_are_checkpointed(self):
+        p = jlp.Processor()
+        cursor = p.cursor(self.doc, predicates=["name"])
+        first = cursor.take(3)
+        checkpoint = json.loads(json.dumps(cursor.checkpoint()))
+        self.assertEqual(["http://xmlns.com/foaf/0.1/name"], checkpoint["predicates"])
+        self.assertRaises(ValueError, p.cursor, self.doc, checkpoint)
+        self.assertRaises(ValueError, p.cursor, self.doc, checkpoint, ["foaf:knows"])
+        self.assertRaises(ValueError, p.cursor, self.doc, checkpoint, ["name"], ["_:b0"])
+        self.assertRaises(ValueError, p.cursor, self.doc, p.cursor(self.doc).checkpoint(), ["name"])
+        rest = [ t for t in p.cursor(self.doc, checkpoint, ["foaf:name"]) ]
+        self.assertEqual(20, len(first + rest))
+        self.assertEqual(20, len(set([ t["obj"] for t in first + rest ])))
+
+class TestProcessorPool(unittest.TestCase):
+    '''
+    Defines unit tests for the shared state of processors and the ProcessorPool.
+    '''
+
+    def test_lazy_imports(self):
+        modules = subprocess.check_output([sys.executable, "-c", "import sys, json_ld_processor; print(' '.join(sys.modules))"]).split()
+        self.assertTrue("json_ld_processor" in modules)
+        self.assertFalse("multiprocessing" in modules)
+
+    def test_shared_default_context(self):
+        self.assertTrue(jlp.Processor().default_context() == jlp.DEFAULT_CONTEXT)
+        self.assertRaises(TypeError, jlp.DEFAULT_CONTEXT.__setitem__, "ex", "http://example.org/")
+        self.assertRaises(TypeError, jlp.DEFAULT_CONTEXT.update, { "ex": "http://example.org/" })
+        context = jlp.Processor().default_context()
+        context["ex"] = "http://example.org/"
+        self.assertFalse(jlp.DEFAULT_CONTEXT.has_key("ex"))
+        self.assertEqual(jlp.DEFAULT_CONTEXT, pickle.loads(pickle.dumps(jlp.DEFAULT_CONTEXT)))
+        self.assertRaises(TypeError, pickle.loads(pickle.dumps(jlp.DEFAULT_CONTEXT)).clear)
+
+    def test_pool(self):
+        pool = jlpool.ProcessorPool(size=2, preload=1, lenient=True)
+        self.assertEqual(1, pool.created)
+        with pool.processor() as p:
+            self.assertEqual(0, pool.idle())
+            [ t for t in p.triples('{ "name": "John Lennon", "ex:name": "John" }') ]
+            self.assertEqual(1, p.report.total())
+        self.assertEqual(1, pool.idle())
+        self.assertEqual(1, p.report.total())
+        self.assertRaises(ValueError, getattr, p, "triples")
+        # the next borrower's calls do not change the report of the previous one
+        q = pool.acquire()
+        [ t for t in q.triples('{ "name": "Paul" }') ]
+        self.assertEqual((0, 1), (q.report.total(), p.report.total()))
+        pool.release(q)
+        with pool.processor() as r:
+            self.assertEqual(None, r.report)
+        processors = [ pool.acquire() for i in range(4) ]
+        self.assertEqual(4, pool.created)
+        for p in processors:
+            pool.release(p)
+        self.assertEqual(2, pool.idle())
+        self.assertEqual(1, len([ t for t in pool.triples('{ "name": "John Lennon" }') ]))
+        self.assertEqual(2, pool.idle())
+        report = jlp.ErrorReport()
+        self.assertEqual(1, len([ t for t in pool.triples('{ "name": "John Lennon", "ex:name": "John" }', report=report) ]))
+        self.assertEqual({ "unknown_prefix": 1 }, report.counts)
+
+class TestParallelTriples(unittest.TestCase):
+    '''
+    Defines unit tests for deserializing chunks of a document in worker processes.
+    '''
+
+    people = [ { "name": "Person %d" % i, "foaf:knows": { "name": "Friend %d" % i } } for i in range(7) ]
+
+    def names(self, triples):
+        return [ t["obj"] for t in triples if t["prop"] == "http://xmlns.com/foaf/0.1/name" ]
+
+    def test_top_level_array(self):
+        p = jlp.Processor()
+        doc = json.dumps(self.people)
+        expected = [ t for t in p.triples(doc) ]
+        found = [ t for t in p.parallel_triples(doc, processes=2, chunk_size=2) ]
+        self.assertTrue(graph_equal(expected, found))
+        self.assertEqual(self.names(expected), self.names(found))
+        self.assertEqual(14, len(set([ t["subj"] for t in found ])))
+        self.assertEqual(7, len([ t for t in p.parallel_triples(doc, processes=2, chunk_size=3, predicates=["foaf:knows"]) ]))
+
+    def test_subject_array(self):
+        p = jlp.Processor()
+        doc = json.dumps({ "#": { "ex": "http://example.org/" }, "@": self.people + [ { "@": "ex:john", "ex:sings": "ex:imagine" } ], "ex:size": 8 })
+        expected = [ t for t in p.triples(doc) ]
+        found = [ t for t in p.parallel_triples(doc, processes=2, chunk_size=3) ]
+        self.assertEqual(23, len(found))
+        self.assertTrue(graph_equal(expected, found))
+        self.assertEqual(self.names(expected), self.names(found))
+        self.assertEqual("http://example.org/size", found[-1]["prop"])
+
+    def test_lenient_errors(self):
+        p = jlp.Processor(lenient=True)
+        doc = json.dumps(self.people + [ { "name": "John Lennon", "ex:name": "John" } ])
+        found = [ t for t in p.parallel_triples(doc, processes=2, chunk_size=2) ]
+        self.assertEqual(22, len(found))
+        self.assertEqual(1, p.report.total())
+        self.assertEqual("$[7].ex:name", p.report.errors[0]["path"])
+        p = jlp.Processor()
+        self.assertRaises(jlp.ProcessingError, list, p.parallel_triples(doc, processes=2, chunk_size=2))
+
+class TestSQLiteWriter(unittest.TestCase):
+    '''
+    Defines unit tests for loading triples into SQLite.
+    '''
+
+    doc = '{ "@": "<http://example.org/people#john>", "a": "foaf:Person", "name": ["John Lennon", "John@en"], "foaf:age": 40, "foaf:knows": { "name": "Paul" } }'
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "triples.db")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_round_trip(self):
+        triples = [ t for t in jlp.Processor().triples(self.doc) ]
+        with jlsql.SQLiteWriter(self.path, batch_size=2, transaction_size=3) as writer:
+            self.assertEqual(6, writer.write_all(triples))
+        self.assertEqual(6, writer.triples_written)
+        self.assertEqual(11, writer.terms_written)
+        loaded = [ t for t in jlsql.read_sqlite_triples(self.path) ]
+        self.assertEqual(triples, loaded)
+        connection = sqlite3.connect(self.path)
+        indexes = [ row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type = 'index'") ]
+        self.assertEqual(sorted(jlsql.INDEXES.keys()), sorted(indexes))
+        connection.close()
+
+    def test_append(self):
+        p = jlp.Processor()
+        with jlsql.SQLiteWriter(self.path) as writer:
+            writer.write_all(p.triples(self.doc))
+        with jlsql.SQLiteWriter(self.path) as writer:
+            writer.write_all(p.triples('{ "@": "<http://example.org/people#john>", "name": "John Lennon", "foaf:age": 41 }'))
+        self.assertEqual(1, writer.terms_written)
+        self.assertEqual(8, len([ t for t in jlsql.read_sqlite_triples(self.path) ]))
+
+    def test_rollback_on_error(self):
+        triples = [ t for t in jlp.Processor().triples(self.doc) ]
+        def load():
+            with jlsql.SQLiteWriter(self.path, batch_size=2, transaction_size=4) as writer:
+                writer.write_all(triples)
+                raise ValueError("failed")
+        self.assertRaises(ValueError, load)
+        self.assertEqual(triples[:4], [ t for t in jlsql.read_sqlite_triples(self.path) ])
+        connection = sqlite3.connect(self.path)
+        self.assertEqual(len(jlsql.INDEXES), connection.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'index'").fetchone()[0])
+        connection.close()
+
+    def test_caller_connection(self):
+        connection = sqlite3.connect(self.path)
+        connection.execute("PRAGMA journal_mode = WAL")
+        connection.execute("PRAGMA synchronous = NORMAL")
+        with jlsql.SQLiteWriter(connection) as writer:
+            writer.write_all(jlp.Processor().triples(self.doc))
+        self.assertEqual("", connection.isolation_level)
+        self.assertEqual("wal", connection.execute("PRAGMA journal_mode").fetchone()[0])
+        self.assertEqual(1, connection.execute("PRAGMA synchronous").fetchone()[0])
+        self.assertEqual(6, len([ t for t in jlsql.read_sqlite_triples(connection) ]))
+        connection.close()
+
+class TestConversionServer(unittest.TestCase):
+    '''
+    Defines unit tests for the HTTP conversion service, on localhost.
+    '''
+
+    doc = '{ "@": "<http://example.org/people#john>", "a": "foaf:Person", "name": "John Lennon" }'
+
+    def setUp(self):
+        self.service = jlsrv.ConversionService(processes=1, max_queue=0)
+        self.server = jlsrv.ConversionServer(("127.0.0.1", 0), self.service, quiet=True)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        self.connection = httplib.HTTPConnection("127.0.0.1", self.server.server_address[1])
+
+    def tearDown(self):
+        self.connection.close()
+        self.server.shutdown()
+        self.server.server_close()
+        self.service.close()
+
+    def request(self, method, path, body=None):
+        self.connection.request(method, path, body)
+        response = self.connection.getresponse()
+        return (response.status, response.getheader("Transfer-Encoding"), response.read())
+
+    def test_conversion(self):
+        (status, encoding, body) = self.request("POST", "/", self.doc)
+        self.assertEqual(200, status)
+        self.assertEqual("chunked", encoding)
+        self.assertEqual(jlt.json_ld_to_ntriples(self.doc), body)
+        (status, encoding, body) = self.request("POST", "/?format=nquads", self.doc) # on the same connection
+        self.assertEqual(200, status)
+        self.assertEqual(2, body.count(" .\n"))
+        (status, encoding, body) = self.request("POST", "/", '{ "ex:name": "John" }')
+        self.assertEqual(400, status)
+        metrics = json.loads(self.request("GET", "/metrics")[2])
+        self.assertEqual(3, metrics["requests"])
+        self.assertEqual(1, metrics["errors"])
+        self.assertEqual(4, metrics["triples"])
+        self.assertTrue(metrics["latency_p50"] <= metrics["latency_max"])
+
+    def test_load_shedding(self):
+        self.assertTrue(self.service.admit()) # fill the only slot
+        (status, encoding, body) = self.request("POST", "/", self.doc)
+        self.assertEqual(503, status)
+        self.service.release()
+        self.assertEqual(200, self.request("POST", "/", self.doc)[0])
+        self.assertEqual(1, json.loads(self.request("GET", "/metrics")[2])["rejected"])
+
+    def test_invalid_requests(self):
+        for (length, status) in [("abc", 400), ("-1", 400), (str(64 * 1024 * 1024 + 1), 413)]:
+            self.connection.putrequest("POST", "/")
+            self.connection.putheader("Content-Length", length)
+            self.connection.endheaders()
+            response = self.connection.getresponse()
+            response.read()
+            self.assertEqual(status, response.status)
+            self.assertEqual("close", response.getheader("Connection"))
+        self.assertEqual(200, self.request("POST", "/", self.doc)[0])
+
+    def test_failed_conversions_are_released(self):
+        for i in range(3):
+            self.assertEqual(400, self.request("POST", "/", "{ not json")[0])
+            self.assertEqual(400, self.request("POST", "/", '{ "bad:name": "John" }')[0])
+        self.assertEqual(200, self.request("POST", "/", self.doc)[0])
+        class Unpicklable(Exception):
+            pass
+        def fail(*args, **kwargs):
+            raise Unpicklable("unpicklable")
+        convert = jlt.json_ld_to_writer
+        jlt.json_ld_to_writer = fail # in the workers forked by the service below
+        try:
+            service = jlsrv.ConversionService(processes=1, max_queue=0)
+        finally:
+            jlt.json_ld_to_writer = convert
+        try:
+            for i in range(3):
+                self.assertTrue(service.admit())
+                self.assertRaises(Exception, service.convert, self.doc, "ntriples")
+        finally:
+            service.close()
+
+    def test_admission_is_held_until_the_worker_finishes(self):
+        doc = json.dumps([ { "name": "Person %d" % i, "foaf:nick": [ "P%d" % i ] * 3 } for i in range(5000) ])
+        service = jlsrv.ConversionService(processes=1, max_queue=0, timeout=0.01, time_budget=None)
+        try:
+            self.assertTrue(service.admit())
+            self.assertRaises(multiprocessing.TimeoutError, service.convert, doc, "ntriples")
+            self.assertFalse(service.admit()) # the worker is still converting the document
+            deadline = time.time() + 60
+            while not service.admit() and time.time() < deadline:
+                time.sleep(0.01)
+            service.release()
+            self.assertTrue(time.time() < deadline)
+        finally:
+            service.close()
+        service = jlsrv.ConversionService(processes=1, max_queue=0, timeout=0.01)
+        try:
+            self.assertTrue(service.admit())
+            self.assertRaises((multiprocessing.TimeoutError, jlp.LimitExceededError), service.convert, doc, "ntriples")
+            deadline = time.time() + 5 # the worker gives up once its time budget has passed
+            while not service.admit() and time.time() < deadline:
+                time.sleep(0.01)
+            self.assertTrue(time.time() < deadline)
+        finally:
+            service.close()
+
+class TestCompression(unittest.TestCase):
+    '''
+    Defines unit tests for compressed input and output.
+    '''
+
+    doc = '{ "@": "<http://example.org/people#john>", "a": "foaf:Person", "name": "John Lennon" }'
+
+    def compressed(self, data, format, level=6):
+        output = io.BytesIO()
+        with jlz.open_output(output, format, level) as writer:
+            writer.write(data)
+        return output.getvalue()
+
+    def test_round_trip(self):
+        for format in ["gzip", "bz2"]:
+            data = self.compressed(self.doc, format)
+            self.assertEqual(format, jlz.detect(data))
+            self.assertEqual(self.doc, jlz.read_document(io.BytesIO(data)))
+            self.assertEqual(self.doc * 2, jlz.read_document(io.BytesIO(data + self.compressed(self.doc, format, 1))))
+            reader = jlz.open_input(io.BytesIO(data), chunk_size=4)
+            self.assertEqual(self.doc[:10], reader.read(10))
+            self.assertEqual(self.doc[10:], reader.read())
+        self.assertEqual(None, jlz.detect(self.doc))
+        self.assertEqual(self.doc, jlz.read_document(io.BytesIO(self.doc)))
+        self.assertEqual("gzip", jlz.format_for_path("triples.nt.gz"))
+
+    def test_large_stream(self):
+        data = os.urandom(8 * 1024 * 1024) # incompressible, so that each small chunk read decompresses to little
+        compressed = self.compressed(data, "gzip", 1)
+        start = time.time()
+        zlib.decompress(compressed, 16 + zlib.MAX_WBITS)
+        baseline = time.time() - start
+        start = time.time()
+        self.assertEqual(data, jlz.open_input(io.BytesIO(compressed), chunk_size=4096).read())
+        reader = jlz.open_input(io.BytesIO(compressed), chunk_size=4096)
+        self.assertEqual(data, "".join([ chunk for chunk in iter(lambda: reader.read(65536), "") ]))
+        # reading stays linear in the size of the stream (it was quadratic, taking seconds)
+        self.assertTrue(time.time() - start < 20 * baseline + 0.5)
+
+    def test_compressed_shards(self):
+        directory = tempfile.mkdtemp()
+        try:
+            writer = jlsh.ShardedNTriplesWriter(directory, 2, compression="gzip")
+            writer.write_all(jlp.Processor().triples(self.doc))
+            manifest = writer.close()
+            data = "".join([ jlz.read_document(os.path.join(directory, f["path"])) for f in manifest["files"] ])
+            self.assertEqual(sorted(jlt.json_ld_to_ntriples(self.doc).splitlines()), sorted(data.splitlines()))
+            self.assertTrue(all([ f["path"].endswith(".nt.gz") for f in manifest["files"] ]))
+        finally:
+            shutil.rmtree(directory)
+
+class TestAtomicArrays(unittest.TestCase):
+    '''
+    Defines unit tests for the bulk conversion of long arrays of atomic values, checking that
+    each element yields the same triple as it does on its own.
+    '''
+
+    arrays = [
+        range(-5, 20),
+        [ 0.5 * i for i in range(-4, 12) ],
+        [ True, False ] * 6,
+        [ "tag %d" % i for i in range(10) ] + [ "", "name", "foaf:Person", "<http://example.org/>", "_:b1", "2010-10-18T12:00:00Z", "Paris@fr", "1^^xsd:integer", "a\\:b", "12 monkeys" ],
+        [ 1, 2, "three", 4.0, True, None, [5, 6], "<http://example.org/seven>", 8 ]
+    ]
+
+    def test_arrays(self):
+        p = jlp.Processor()
+        for array in self.arrays:
+            doc = { "@": "<http://example.org/data>", "ex:value": array, "#": { "ex": "http://example.org/" } }
+            expected = []
+            for value in array:
+                doc["ex:value"] = [value]
+                expected.extend([ t for t in p.triples(json.dumps(doc)) ])
+            doc["ex:value"] = array
+            self.assertEqual(expected, [ t for t in p.triples(json.dumps(doc)) ])
+
+    def test_lenient_arrays(self):
+        p = jlp.Processor(lenient=True)
+        doc = json.dumps({ "@": "<http://example.org/data>", "foaf:nick": [ "J%d" % i for i in range(10) ] + [ "ex:J" ] })
+        self.assertEqual(10, len([ t for t in p.triples(doc) ]))
+        self.assertEqual("$.foaf:nick[10]", p.report.errors[0]["path"])
+
+class TestBaseIRIResolver(unittest.TestCase):
+    '''
+    Defines property-based unit tests checking BaseIRIResolver against urlparse.urljoin(), over
+    bases and references generated from a fixed random seed.
+    '''
+
+    segments = [ "a", "b", "c.html", ".", "..", "", "x y", "%20", "~u" ]
+
+    def path(self, rng):
+        return "/".join([ rng.choice(self.segments) for i in range(rng.randint(0, 4)) ])
+
+    def base(self, rng):
+        base = rng.choice([ "http", "https", "HTTP", "file", "ftp", "urn", "tag" ]) + ":"
+        netloc = rng.choice([ "", "example.org", "user@example.org:8080" ])
+        if netloc or rng.random() < 0.5:
+            base += "//" + netloc
+        base += rng.choice([ "", "/" ]) + self.path(rng)
+        if rng.random() < 0.3:
+            base += ";p=1"
+        if rng.random() < 0.4:
+            base += "?" + rng.choice([ "", "q=1", "a=b&c" ])
+        if rng.random() < 0.4:
+            base += "#" + rng.choice([ "", "f", "g?h" ])
+        return base
+
+    def reference(self, rng):
+        reference = rng.choice([ "", "", "/", "//example.com", "?", "#", "./", "../" ]) + self.path(rng)
+        if rng.random() < 0.2:
+            reference += ";p"
+        if rng.random() < 0.3:
+            reference += "?" + rng.choice([ "", "q", "q#x" ])
+        if rng.random() < 0.3:
+            reference += "#" + rng.choice([ "", "frag", "f?g" ])
+        return reference
+
+    def test_against_urljoin(self):
+        rng = random.Random(20101018)
+        for i in range(200):
+            base = self.base(rng)
+            resolver = jlp.BaseIRIResolver(base, max_cache=50)
+            for j in range(100):
+                reference = self.reference(rng)
+                self.assertEqual(urlparse.urljoin(base, reference), resolver.resolve(reference), "%s against %s" % (reference, base))
+                self.assertEqual(urlparse.urljoin(base, reference), resolver.resolve(reference)) # from the cache
+
+    def test_processor(self):
+        doc = '{ "#": { "#base": "http://example.org/people/index.html?page=1" }, "@": "<#john>", "foaf:knows": ["<paul>", "<../bands/beatles>", "<?page=2>", "<http://example.com/ringo>"] }'
+        self.assertEqual([ "http://example.org/people/paul", "http://example.org/bands/beatles", "http://example.org/people/index.html?page=2", "http://example.com/ringo" ],
+                         [ t["obj"] for t in jlp.Processor().triples(doc) ])
+
+class TestExternalSort(unittest.TestCase):
+    '''
+    Defines unit tests for sorting triples in bounded memory.
+    '''
+
+    doc = json.dumps([ { "@": "<http://example.org/people#p%d>" % (i % 7), "foaf:nick": "Nick %d" % (i % 3), "name": "Person %d" % i } for i in range(40) ])
+
+    def test_orders(self):
+        triples = [ t for t in jlp.Processor().triples(self.doc) ]
+        for order in ["S", "SP", "SPO"]:
+            key = jlsort.ORDERS[order]
+            expected = sorted(triples, key=key) # sorted() is stable too
+            for binary_runs in [False, True]:
+                sorter = jlsort.ExternalSorter(order, max_buffered=7, binary_runs=binary_runs, max_runs=3)
+                found = [ t for t in sorter.sorted(triples) ]
+                self.assertEqual(expected, found)
+                self.assertTrue(sorter.runs_spilled > 12)
+            self.assertEqual(expected, [ t for t in jlsort.sorted_triples(triples, order) ])
+
+    def test_unknown_order(self):
+        self.assertRaises(ValueError, jlsort.ExternalSorter, "PO")
+
+class TestContextTable(unittest.TestCase):
+    '''
+    Defines unit tests for the memoization of merged local contexts.
+    '''
+
+    def doc(self, i, context):
+        return json.dumps({ "#": context, "@": "<item%d>" % i, "ex:label": "Item %d" % i, "ex:next": "<item%d>" % (i + 1) })
+
+    def test_shared_merged_contexts(self):
+        table = jlp.ContextTable()
+        context = { "ex": "http://example.org/vocab#", "#base": "http://example.org/items/" }
+        first = table.merge(context, jlp.DEFAULT_CONTEXT)
+        self.assertTrue(first is table.merge(dict(context), jlp.DEFAULT_CONTEXT))
+        self.assertEqual("http://example.org/vocab#", first["ex"])
+        self.assertEqual(jlp.DEFAULT_CONTEXT["foaf"], first["foaf"])
+        self.assertRaises(TypeError, first.__setitem__, "ex", "http://example.org/")
+        self.assertFalse(first is table.merge(context, table.merge({ "dc": "http://example.org/dc#" }, jlp.DEFAULT_CONTEXT)))
+        self.assertEqual({ "size": 3, "max_size": 1024, "hits": 1, "misses": 3, "evictions": 0, "hit_rate": 0.25 }, table.stats())
+
+    def test_memoized_triples(self):
+        table = jlp.ContextTable()
+        context = { "ex": "http://example.org/vocab#", "#base": "http://example.org/items/" }
+        memoized = jlp.Processor(context_table=table)
+        fresh = jlp.Processor(context_table=jlp.ContextTable(0))
+        for i in range(10):
+            doc = self.doc(i, context)
+            self.assertEqual([ t for t in fresh.triples(doc) ], [ t for t in memoized.triples(doc) ])
+        self.assertEqual(1, len(table))
+        self.assertEqual(9, table.stats()["hits"])
+        self.assertEqual(0, len(fresh.context_table))
+        self.assertEqual("http://example.org/vocab#label", table.merge(context, jlp.DEFAULT_CONTEXT).properties["ex:label"])
+
+    def test_eviction(self):
+        table = jlp.ContextTable(max_size=2)
+        p = jlp.Processor(context_table=table)
+        for i in range(3):
+            self.assertEqual(2, len([ t for t in p.triples(self.doc(i, { "ex": "http://example.org/%d#" % i, "#base": "http://example.org/" })) ]))
+        self.assertEqual(2, len(table))
+        self.assertEqual(1, table.stats()["evictions"])
+        self.assertEqual(p.context_table.max_size, pickle.loads(pickle.dumps(p)).context_table.max_size)
+
+    def test_concurrent_merges(self):
+        table = jlp.ContextTable(max_size=4)
+        errors = []
+        def merge(n):
+            try:
+                p = jlp.Processor(context_table=table)
+                for i in range(200):
+                    j = (i + n) % 8
+                    graph = [ t for t in p.triples(self.doc(j, { "ex": "http://example.org/%d#" % j, "#base": "http://example.org/" })) ]
+                    assert sorted([ t["prop"] for t in graph ]) == [ "http://example.org/%d#%s" % (j, name) for name in ("label", "next") ], graph
+            except Exception as e:
+                errors.append(e)
+        threads = [ threading.Thread(target=merge, args=(n,)) for n in range(8) ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual([], errors)
+        stats = table.stats()
+        self.assertEqual(1600, stats["hits"] + stats["misses"])
+        self.assertTrue(len(table) <= 4)
+
+class TestGraphStatistics(unittest.TestCase):
+    '''
+    Defines unit tests for the one-pass statistics sketches.
+    '''
+
+    doc = json.dumps([ {
+        "#": { "ex": "http://example.org/vocab#" },
+        "@": "<http://example.org/items#i%d>" % i,
+        "a": "ex:Item",
+        "ex:label": [ "Item %d@en" % i, "Objet %d@fr" % i ],
+        "ex:size": i,
+        "ex:part": { "ex:label": "Part of %d" % i }
+    } for i in range(1, 51) ])
+
+    def test_hyperloglog(self):
+        (a, b) = (jlst.HyperLogLog(), jlst.HyperLogLog())
+        for i in range(20000):
+            a.add("value %d" % i)
+            b.add("value %d" % (i + 10000))
+        self.assertTrue(abs(a.estimate() - 20000) < 1000)
+        self.assertEqual(0, jlst.HyperLogLog().estimate())
+        a.merge(b)
+        self.assertTrue(abs(a.estimate() - 30000) < 1500)
+        self.assertEqual(a.registers, jlst.HyperLogLog.from_dict(json.loads(json.dumps(a.to_dict()))).registers)
+        self.assertRaises(ValueError, a.merge, jlst.HyperLogLog(10))
+
+    def test_count_min_and_heavy_hitters(self):
+        (sketch, hitters) = (jlst.CountMinSketch(width=64), jlst.HeavyHitters(size=5))
+        for i in range(1000):
+            value = "v%d" % (i % 7 if i % 2 else 0)
+            sketch.add(value)
+            hitters.add(value)
+        self.assertTrue(sketch.estimate("v0") >= 571)
+        self.assertEqual("v0", hitters.top(1)[0][0])
+        self.assertEqual(571, hitters.top(1)[0][1])
+        other = jlst.CountMinSketch(width=64)
+        other.add("v0", 29)
+        sketch.merge(other)
+        self.assertTrue(sketch.estimate("v0") >= 600)
+        self.assertEqual(1029, sketch.total)
+
+    def test_graph_statistics(self):
+        stats = jlst.GraphStatistics()
+        self.assertEqual(300, stats.write_all(jlp.Processor().triples(self.doc)))
+        report = stats.report()
+        self.assertEqual(300, report["triples"])
+        self.assertEqual(200, report["literals"])
+        self.assertTrue(abs(report["distinct_subjects"] - 100) <= 3) # an estimate, with random blank nodes
+        self.assertEqual(4, report["distinct_predicates"])
+        self.assertEqual(150, stats.predicate_count("http://example.org/vocab#label"))
+        self.assertEqual(0.25, report["blank_node_ratio"])
+        self.assertEqual([ { "lang": "en", "literals": 50, "error": 0 }, { "lang": "fr", "literals": 50, "error": 0 } ], report["languages"])
+        self.assertEqual([ "http://www.w3.org/2001/XMLSchema#string", "http://www.w3.org/2001/XMLSchema#integer" ], [ d["iri"] for d in report["datatypes"] ])
+
+    def test_merged_statistics(self):
+        triples = [ t for t in jlp.Processor().triples(self.doc) ]
+        whole = jlst.GraphStatistics()
+        whole.write_all(triples)
+        (first, second) = (jlst.GraphStatistics(), jlst.GraphStatistics())
+        first.write_all(triples[:120])
+        second.write_all(triples[120:])
+        second = pickle.loads(pickle.dumps(second))
+        first.merge(jlst.GraphStatistics.from_dict(json.loads(json.dumps(second.to_dict()))))
+        self.assertEqual(whole.report(), first.report())
+
+    def test_corpus_statistics(self):
+        directory = tempfile.mkdtemp()
+        try:
+            paths = []
+            for i in range(4):
+                paths.append(os.path.join(directory, "doc%d.json" % i))
+                with open(paths[-1], 'w') as f:
+                    f.write(json.dumps({ "@": "<http://example.org/people#p%d>" % i, "a": "foaf:Person", "name": "Person %d" % i }))
+            stats = jlst.corpus_statistics(paths, processes=2, files_per_task=1)
+            report = stats.report()
+            self.assertEqual(8, report["triples"])
+            self.assertEqual(4, report["distinct_subjects"])
+            self.assertEqual([ { "iri": "http://www.w3.org/1999/02/22-rdf-syntax-ns#type", "triples": 4 }, { "iri": "http://xmlns.com/foaf/0.1/name", "triples": 4 } ], report["predicates"])
+        finally:
+            shutil.rmtree(directory)
+
+class TestDiff(unittest.TestCase):
+    '''
+    Defines unit tests for Processor.diff().
+    '''
+
+    old_doc = '[ { "@": "<http://example.org/people#john>", "name": "John Lennon", "foaf:knows": { "name": "Paul" } }, { "a": "Person", "name": "Ringo", "foaf:knows": { "name": "George" } } ]'
+
+    def test_unchanged(self):
+        self.assertEqual([], [ d for d in jlp.Processor().diff(self.old_doc, self.old_doc) ])
+
+    def test_changed_literal(self):
+        new_doc = self.old_doc.replace('"John Lennon"', '"John Winston Lennon"')
+        diff = [ (op, t['subj'], t['prop'], t['obj']) for (op, t) in jlp.Processor().diff(self.old_doc, new_doc) ]
+        self.assertEqual([('-', u'http://example.org/people#john', u'http://xmlns.com/foaf/0.1/name', u'John Lennon'), ('+', u'http://example.org/people#john', u'http://xmlns.com/foaf/0.1/name', u'John Winston Lennon')], diff)
+
+    def test_added_node(self):
+        new_doc = self.old_doc[:-1] + ', { "@": "<http://example.org/people#paul>", "name": "Paul McCartney" } ]'
+        diff = [ (op, t['subj'], t['obj']) for (op, t) in jlp.Processor().diff(self.old_doc, new_doc) ]
+        self.assertEqual([('+', u'http://example.org/people#paul', u'Paul McCartney')], diff)
+
+    def test_triple_of_unchanged_node(self):
+        old_doc = '[ { "@": "<http://example.org/a>", "name": "x" }, { "@": "<http://example.org/a>", "name": "x", "foaf:nick": "y" } ]'
+        new_doc = '[ { "@": "<http://example.org/a>", "name": "x" } ]'
+        diff = [ (op, t['prop'], t['obj']) for (op, t) in jlp.Processor().diff(old_doc, new_doc) ]
+        self.assertEqual([('-', u'http://xmlns.com/foaf/0.1/nick', u'y')], diff)
+        diff = [ (op, t['prop'], t['obj']) for (op, t) in jlp.Processor().diff(new_doc, old_doc) ]
+        self.assertEqual([('+', u'http://xmlns.com/foaf/0.1/nick', u'y')], diff)
+
+    def test_limits_and_lenient(self):
+        new_doc = self.old_doc[:-1] + ', { "@": "<http://example.org/people#paul>", "bad:name": "Paul McCartney" } ]'
+        self.assertRaises(jlp.LimitExceededError, lambda: [ d for d in jlp.Processor(max_bytes=100).diff(self.old_doc, new_doc) ])
+        self.assertRaises(jlp.LimitExceededError, lambda: [ d for d in jlp.Processor(max_depth=1).diff(self.old_doc, self.old_doc.replace('"Paul"', '"Paul M"')) ])
+        self.assertRaises(jlp.ProcessingError, lambda: [ d for d in jlp.Processor().diff(self.old_doc, new_doc) ])
+        p = jlp.Processor(lenient=True)
+        self.assertEqual([], [ d for d in p.diff(self.old_doc, new_doc) ])
+        self.assertEqual(1, p.report.counts["unknown_prefix"])
+
+class TestCompactor(unittest.TestCase):
+    '''
+    Defines unit tests for the compaction of triples into JSON-LD in json_ld_compactor.
+    '''
+
+    doc = '{ "#": {"ex": "http://example.org/vocab#"}, "@": "<http://example.org/people#john>", "a": "Person", "name": ["John Lennon", "Person", "foaf:Person", "Johnny@en", "1940-10-09"], "foaf:age": [40, 0, false, true, 2.5], "ex:born": "1940-10-09T06:30:00Z", "ex:not-a-curie": "x^^xsd:token", "homepage": "<http://example.org/john>", "foaf:knows": [{ "name": "Paul" }, { "@": "<http://example.org/people#ringo>", "a": "<http://example.org/vocab#Drummer>" }] }'
+
+    def round_trip(self, compactor):
+        p = jlp.Processor()
+        generated_graph = [ t for t in p.triples(self.doc) ]
+        compacted_graph = []
+        for line in compactor.dumps(generated_graph):
+            compacted_graph.extend(p.triples(line))
+        self.assertTrue(graph_equal(generated_graph, compacted_graph))
+
+    def test_round_trip(self):
+        self.round_trip(jlcomp.Compactor(jlp.Processor().default_context()))
+
+    def test_round_trip_with_spilled_runs(self):
+        self.round_trip(jlcomp.Compactor(jlp.Processor().default_context(), max_buffered=3))
+
+    def test_compaction(self):
+        compactor = jlcomp.Compactor({"foaf": "http://xmlns.com/foaf/0.1/", "foafname": "http://xmlns.com/foaf/0.1/name", "ex": "http://example.org/", "exv": "http://example.org/vocab#"}, embed_context=False)
+        self.assertEqual("foafname", compactor.compact_iri("http://xmlns.com/foaf/0.1/name"))
+        self.assertEqual("foaf:Person", compactor.compact_iri("http://xmlns.com/foaf/0.1/Person"))
+        self.assertEqual("exv:Drummer", compactor.compact_iri("http://example.org/vocab#Drummer"))
+        self.assertEqual("<http://example.org/people/john>", compactor.compact_iri("http://example.org/people/john"))
+        self.assertEqual("http://example.org/people/knows", compactor.compact_property("http://example.org/people/knows"))
+        docs = [ d for d in compactor.documents([{'objtype': 'resource', 'subj': u'_:b1', 'obj': u'http://xmlns.com/foaf/0.1/Person', 'prop': 'http://www.w3.org/1999/02/22-rdf-syntax-ns#type'}]) ]
+        self.assertEqual([{"@": "_:b1", "a": "foaf:Person"}], docs)
+
+class TestShardedWriter(unittest.TestCase):
+    '''
+    Defines unit tests for the hash-sharded N-Triples output in json_ld_sharding.
+    '''
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_subjects_stay_in_one_shard(self):
+        doc = '[' + ', '.join([ '{ "@": "<http://example.org/people#p%d>", "name": "Person %d", "foaf:knows": ["<http://example.org/people#p%d>"] }' % (i, i, i + 1) for i in range(50) ]) + ']'
+        writer = jlsh.ShardedNTriplesWriter(self.directory, 4, max_bytes=512)
+        writer.write_all(jlp.Processor().triples(doc))
+        manifest = writer.close()
+        self.assertEqual(100, manifest["triples"])
+        self.assertEqual(manifest["shard_triples"], [ sum([ f["triples"] for f in manifest["files"] if f["shard"] == i ]) for i in range(4) ])
+        shard_of_subject = {}
+        for f in manifest["files"]:
+            lines = open(os.path.join(self.directory, f["path"]), 'rb').read().splitlines()
+            self.assertEqual(f["triples"], len(lines))
+            for line in lines:
+                subj = line.split(" ")[0]
+                self.assertEqual(f["shard"], shard_of_subject.setdefault(subj, f["shard"]))
+        self.assertEqual(50, len(shard_of_subject))
+        self.assertTrue(len(manifest["files"]) > 4)
+
+class TestSerializers(unittest.TestCase):
+    '''
+    Defines unit tests for the triple writers in json_ld_serializers.
+    '''
+
+    doc = '{  "#": {"foaf": "http://xmlns.com/foaf/0.1/"},  "@": "<http://example.org/people#john>",  "a": "foaf:Person",  "foaf:name" : "John \\"Lennon\\"@en", "foaf:age": 40, "foaf:knows": { "foaf:name": "Paul" } }'
+
+    def test_nquads(self):
+        output = io.BytesIO()
+        writer = jls.NQuadsWriter(output, graph="http://example.org/graph")
+        writer.write_all(jlp.Processor().triples(self.doc))
+        writer.close()
+        lines = output.getvalue().splitlines()
+        self.assertEqual(5, len(lines))
+        self.assertTrue('<http://example.org/people#john> <http://xmlns.com/foaf/0.1/name> "John \\"Lennon\\""@en <http://example.org/graph> .' in lines)
+        self.assertTrue('<http://example.org/people#john> <http://xmlns.com/foaf/0.1/age> "40"^^<http://www.w3.org/2001/XMLSchema#integer> <http://example.org/graph> .' in lines)
+
+    def test_turtle(self):
+        doc = '{  "#": {"foaf": "http://xmlns.com/foaf/0.1/"},  "@": "<http://example.org/people#john>",  "a": "foaf:Person",  "foaf:name" : "John \\"Lennon\\"@en", "foaf:age": 40, "foaf:nick": ["Johnny", "Lennon"] }'
+        output = io.BytesIO()
+        writer = jls.TurtleWriter(output, prefixes={"foaf": "http://xmlns.com/foaf/0.1/", "xsd": "http://www.w3.org/2001/XMLSchema#", "name": "http://xmlns.com/foaf/0.1/name"})
+        writer.write_all(jlp.Processor().triples(doc))
+        writer.close()
+        turtle = output.getvalue()
+        self.assertTrue(turtle.startswith('@prefix foaf: <http://xmlns.com/foaf/0.1/> .\n@prefix xsd: <http://www.w3.org/2001/XMLSchema#> .\n\n<http://example.org/people#john> '))
+        self.assertEqual(1, turtle.count('<http://example.org/people#john>'))
+        self.assertTrue('a foaf:Person' in turtle)
+        self.assertTrue('foaf:name "John \\"Lennon\\""@en' in turtle)
+        self.assertTrue('foaf:age "40"^^xsd:integer' in turtle)
+        self.assertTrue('foaf:nick "Johnny" ,\n        "Lennon"' in turtle)
+        self.assertTrue(turtle.endswith(' .\n'))
+
+    def test_binary_round_trip(self):
+        generated_graph = [ t for t in jlp.Processor().triples(self.doc) ]
+        output = io.BytesIO()
+        writer = jls.BinaryWriter(output, buffer_size=16, max_terms=4)
+        writer.write_all(generated_graph)
+        writer.close()
+        self.assertEqual(generated_graph, [ t for t in jls.read_binary_triples(io.BytesIO(output.getvalue())) ])
+
+    def test_binary_blocks(self):
+        generated_graph = [ t for t in jlp.Processor().triples(self.doc) ]
+        output = io.BytesIO()
+        writer = jls.BinaryWriter(output, max_terms=6)
+        writer.write_all(generated_graph)
+        writer.close()
+        data = output.getvalue()
+        for block_size in (1, 2, 3, 7, 64):
+            self.assertEqual(generated_graph, [ t for t in jls.read_binary_triples(io.BytesIO(data), block_size) ])
+        self.assertRaises(Exception, lambda: [ t for t in jls.read_binary_triples(io.BytesIO(data[:-1]), 5) ])
+        self.assertRaises(Exception, lambda: [ t for t in jls.read_binary_triples(io.BytesIO(b"JLDT\x01" + data[5:])) ])
+
+
+class TestTripleCache(unittest.TestCase):
+    '''
+    Defines unit tests for the on-disk triple cache in json_ld_cache.
+    '''
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_hit_and_miss(self):
+        cache = jlc.TripleCache(self.directory)
+        doc = '{  "#": {"foaf": "http://xmlns.com/foaf/0.1/"},  "@": "<http://example.org/people#john>",  "a": "foaf:Person",  "foaf:name" : "John Lennon", "foaf:knows": { "foaf:name": "Paul" } }'
+        generated_graph = [ t for t in cache.triples(doc) ]
+        cached_graph = [ t for t in cache.triples(doc) ]
+        self.assertEqual(generated_graph, cached_graph)
+        self.assertTrue(graph_equal([ t for t in jlp.Processor().triples(doc) ], cached_graph))
+        stats = cache.stats()
+        self.assertEqual((1, 1, 1), (stats["hits"], stats["misses"], stats["entries"]))
+
+    def test_partial_iteration_is_not_cached(self):
+        cache = jlc.TripleCache(self.directory)
+        doc = '{ "@": "<http://example.org/people#john>", "name": "John Lennon", "homepage": "<http://example.org/john>" }'
+        iter(cache.triples(doc)).next()
+        self.assertEqual(0, cache.stats()["entries"])
+        self.assertEqual([], [ name for name in os.listdir(self.directory) if name.endswith(".tmp") ])
+
+    def test_lru_eviction(self):
+        cache = jlc.TripleCache(self.directory, max_entries=1)
+        doc1 = '{ "@": "<http://example.org/people#john>", "name": "John Lennon" }'
+        doc2 = '{ "@": "<http://example.org/people#paul>", "name": "Paul McCartney" }'
+        list(cache.triples(doc1))
+        os.utime(os.path.join(self.directory, cache.key(doc1) + ".jldt"), (0, 0))
+        list(cache.triples(doc2))
+        self.assertEqual(1, cache.evictions)
+        list(cache.triples(doc2))
+        self.assertEqual(1, cache.hits)
+        list(cache.triples(doc1))
+        self.assertEqual(3, cache.misses)
+
+    def test_options_are_part_of_the_key(self):
+        doc = '{ "@": "<http://example.org/people#john>", "name": "John Lennon", "foaf:age": 40 }'
+        cache = jlc.TripleCache(self.directory)
+        limited = jlc.TripleCache(self.directory, jlp.Processor(max_triples=1))
+        self.assertNotEqual(cache.key(doc), limited.key(doc))
+        self.assertEqual(2, len(list(cache.triples(doc))))
+        self.assertRaises(jlp.LimitExceededError, lambda: list(limited.triples(doc)))
+
+    def test_lenient_runs_with_errors_are_not_cached(self):
+        doc = '{ "@": "<http://example.org/people#john>", "name": "John Lennon", "foaf:knows": { "bad:name": "Paul" } }'
+        cache = jlc.TripleCache(self.directory, jlp.Processor(lenient=True))
+        for i in range(2):
+            self.assertEqual(2, len(list(cache.triples(doc))))
+            self.assertEqual(1, cache.processor.report.total())
+        self.assertEqual((0, 2, 0), (cache.hits, cache.misses, cache.stats()["entries"]))
+        clean = '{ "@": "<http://example.org/people#john>", "name": "John Lennon" }'
+        list(cache.triples(clean))
+        self.assertEqual(1, len(list(cache.triples(clean))))
+        self.assertEqual((1, 0), (cache.hits, cache.processor.report.total()))
+
+    def test_stale_temporary_files(self):
+        stale = os.path.join(self.directory, "stale.tmp")
+        live = os.path.join(self.directory, "live.tmp")
+        for path in (stale, live):
+            with open(path, 'wb') as f:
+                f.write(b"x" * 100)
+        os.utime(stale, (0, 0))
+        cache = jlc.TripleCache(self.directory, max_bytes=150)
+        self.assertEqual(["live.tmp"], [ name for name in os.listdir(self.directory) if name.endswith(".tmp") ])
+        doc = '{ "@": "<http://example.org/people#john>", "name": "John Lennon" }'
+        list(cache.triples(doc))
+        list(cache.triples(doc)) # the entry does not fit next to the live temporary file
+        self.assertEqual((0, 2), (cache.hits, cache.misses))
+
+
 if __name__ == "__main__":
     unittest.main()
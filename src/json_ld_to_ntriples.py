@@ -6,51 +6,141 @@ Created on Oct 15, 2010
 @author: ballen
 '''
 
-import re, json_ld_processor as jlp
+import io, json, json_ld_processor as jlp, json_ld_serializers as jls, json_ld_sharding as jlsh, json_ld_compression as jlz, json_ld_sort as jlsort
 
 def json_ld_to_ntriples(doc):
     '''
     Serializes a set of triples into N-Triples format, based on the
     deserialization of a JSON-LD document.
-    
+
     doc -- a JSON-LD document string
-    
+
     Returns: string
-    
+
     Usage:
     $ ./json_ld_to_ntriples.py ../test/json_ld_org_landing_page_example.json
     <http://example.org/people#john> <http://www.w3.org/1999/02/22-rdf-syntax-ns#type> <http://xmlns.com/foaf/0.1/Person> .
     <http://example.org/people#john> <http://xmlns.com/foaf/0.1/name> "John Lennon" .
+
+    Other output formats can be selected with --format (ntriples, nquads, turtle or binary):
+    $ ./json_ld_to_ntriples.py --format turtle ../test/json_ld_org_landing_page_example.json
+
+    N-Triples can also be partitioned by subject into shard files and a manifest:
+    $ ./json_ld_to_ntriples.py --shards 8 --directory out ../test/json_ld_org_landing_page_example.json
+
+    The elements of a large top-level array can be deserialized in parallel with --processes:
+    $ ./json_ld_to_ntriples.py --processes 8 large.json
+
+    Input compressed with gzip, bz2 or xz is detected and decompressed as it is read, and
+    output can be compressed as it is written:
+    $ ./json_ld_to_ntriples.py --output large.nt.gz --level 9 large.json.bz2
+
+    Output can be sorted by subject (S), subject and property (SP) or all three parts (SPO),
+    in bounded memory, with --sort:
+    $ ./json_ld_to_ntriples.py --sort SP --sort-buffer 1000000 --binary-runs large.json
     '''
-    ntriples = ""
-    p = jlp.Processor()
-    bnode_pattern = re.compile("^_\:\w+$")
-    for t in p.triples(doc):
-        if bnode_pattern.match(t["subj"]):
-            ntriples += t["subj"].encode('utf-8')
-        else:
-            ntriples +=  "<" + t["subj"].encode('utf-8') + ">"
-        ntriples +=  " <" + t["prop"].encode('utf-8') + ">"
-        if bnode_pattern.match(t["obj"]):
-            ntriples += ' %s' % t["obj"].encode('utf-8') + ' .\n'
-        elif t["objtype"] == "resource":
-            ntriples += " <" + t["obj"].encode('utf-8') + "> .\n"
-        else:
-            if t.has_key("lang"):
-                ntriples += ' "%s"@%s' % (t["obj"].encode('utf-8'), t["lang"].encode('utf-8')) + ' .\n'
-            elif t.has_key("datatype") and t["datatype"] != "http://www.w3.org/2001/XMLSchema#string":
-                ntriples += ' "%s"^^<%s>' % (t["obj"].encode('utf-8'), t["datatype"].encode('utf-8')) + ' .\n'
-            else:
-                ntriples += ' "%s"' % t["obj"].encode('utf-8') + ' .\n'
-    return ntriples
-        
-if __name__ == "__main__":
-    import sys
-    filename = sys.argv[1]
-    file = open(filename, 'r')
-    doc = "".join(file.read().splitlines())
-    print json_ld_to_ntriples(doc)
-    
+    output = io.BytesIO()
+    writer = jls.NTriplesWriter(output)
+    writer.write_all(jlp.Processor().triples(doc))
+    writer.close()
+    return output.getvalue()
+
+def json_ld_to_writer(doc, format="ntriples", stream=None, graph=None, processor=None, processes=None, sorter=None):
+    '''
+    Serializes the triples of a JSON-LD document to a stream using one of the
+    writers in json_ld_serializers.
+
+    doc -- a JSON-LD document string
+    format -- one of "ntriples", "nquads", "turtle" or "binary"
+    stream -- a file-like object opened for writing bytes
+    graph -- the graph name used by the "nquads" format
+    processor -- the json_ld_processor.Processor used to deserialize doc
+    processes -- if not None, the number of worker processes deserializing the chunks of a
+                 top-level array (see Processor.parallel_triples())
+    sorter -- if not None, a json_ld_sort.ExternalSorter the triples are sorted with
 
-        
+    Returns: the number of triples written.
+    '''
+    if processor is None:
+        processor = jlp.Processor()
+    if format == "nquads":
+        writer = jls.NQuadsWriter(stream, graph=graph)
+    elif format == "turtle":
+        prefixes = processor.default_context()
+        item = json.loads(doc)
+        if type(item).__name__ == 'dict' and type(item.get("#")).__name__ == 'dict':
+            prefixes.update(item["#"])
+        writer = jls.TurtleWriter(stream, prefixes=prefixes)
+    elif format in jls.WRITERS:
+        writer = jls.WRITERS[format](stream)
+    else:
+        raise Exception("Unknown output format: %s" % (format))
+    if processes is None:
+        triples = processor.triples(doc)
+    else:
+        triples = processor.parallel_triples(doc, processes=processes)
+    if sorter is not None:
+        triples = sorter.sorted(triples)
+    count = writer.write_all(triples)
+    writer.close()
+    return count
 
+if __name__ == "__main__":
+    import sys
+    from optparse import OptionParser
+    parser = OptionParser(usage="usage: %prog [options] file")
+    parser.add_option("-f", "--format", dest="format", default="ntriples", choices=sorted(jls.WRITERS.keys()),
+                      help="output format: ntriples (default), nquads, turtle or binary")
+    parser.add_option("-g", "--graph", dest="graph", default=None,
+                      help="graph name for nquads output")
+    parser.add_option("-n", "--shards", dest="shards", type="int", default=0,
+                      help="partition N-Triples output by subject into this many shard files")
+    parser.add_option("-d", "--directory", dest="directory", default=".",
+                      help="directory for shard files (default: current directory)")
+    parser.add_option("-j", "--processes", dest="processes", type="int", default=None,
+                      help="deserialize a large top-level array in this many worker processes")
+    parser.add_option("-o", "--output", dest="output", default=None,
+                      help="write to this file instead of standard output")
+    parser.add_option("-z", "--compress", dest="compression", default=None, choices=["gzip", "bz2", "xz"],
+                      help="compress the output (or shard files) with gzip, bz2 or xz; implied by an --output "
+                           "file name ending in .gz, .bz2 or .xz")
+    parser.add_option("--level", dest="level", type="int", default=6,
+                      help="compression level, from 0 (fastest) to 9 (smallest; default: 6)")
+    parser.add_option("-s", "--sort", dest="sort", default=None, choices=sorted(jlsort.ORDERS.keys()),
+                      help="sort the output by subject (S), subject and property (SP) or subject, property and object (SPO)")
+    parser.add_option("--sort-buffer", dest="sort_buffer", type="int", default=100000,
+                      help="number of triples sorted in memory before a run is spilled to a temporary file")
+    parser.add_option("--binary-runs", dest="binary_runs", action="store_true", default=False,
+                      help="spill sorted runs in the binary format, which merges faster")
+    parser.add_option("--max-shard-bytes", dest="max_bytes", type="int", default=None,
+                      help="rotate shard files once they grow past this size")
+    (options, args) = parser.parse_args()
+    if len(args) != 1:
+        parser.error("expected a single JSON-LD file")
+    if args[0] == "-":
+        doc = "".join(jlz.read_document(sys.stdin).splitlines())
+    else:
+        doc = "".join(jlz.read_document(args[0]).splitlines())
+    if options.sort:
+        sorter = jlsort.ExternalSorter(options.sort, options.sort_buffer, options.binary_runs)
+    else:
+        sorter = None
+    if options.shards:
+        writer = jlsh.ShardedNTriplesWriter(options.directory, options.shards, max_bytes=options.max_bytes,
+                                            compression=options.compression, level=options.level)
+        if options.processes is None:
+            triples = jlp.Processor().triples(doc)
+        else:
+            triples = jlp.Processor().parallel_triples(doc, processes=options.processes)
+        if sorter is not None:
+            triples = sorter.sorted(triples)
+        writer.write_all(triples)
+        writer.close()
+    else:
+        if options.output is None:
+            output = jlz.open_output(sys.stdout, options.compression, options.level)
+        else:
+            output = jlz.open_output(options.output, options.compression or jlz.format_for_path(options.output), options.level)
+        json_ld_to_writer(doc, format=options.format, stream=output, graph=options.graph, processes=options.processes, sorter=sorter)
+        if output is not sys.stdout:
+            output.close()